@@ -0,0 +1,361 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+
+Benchmarks of the analyser and generator hot paths, on fixed inputs.
+
+    python benchmarks/bench.py run --output before.json
+    ... change the code ...
+    python benchmarks/bench.py run --output after.json --compare before.json
+    python benchmarks/bench.py compare before.json after.json --threshold 0.1
+
+Every case is timed 'repeat' times over 'number' calls, as timeit does; the median time per call
+is the figure that is compared. 'compare' (and 'run --compare') exits with status 1 if any case
+got slower than the baseline by more than the threshold.
+
+Tables are built in memory (the on-disk table cache is disabled while the cases run) and caches are cleared
+before each timing, so that every case measures the computation itself.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import typing
+
+import numpy as np
+
+BENCHMARK_FORMAT_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.1  # 10% slower than the baseline is a regression
+SEED = 20210114
+
+# So that chordnovacore is importable when this file is run as a script
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PYTHON_DIR not in sys.path:
+    sys.path.insert(0, PYTHON_DIR)
+
+
+class Case(typing.NamedTuple):
+    """
+    'setup' prepares the fixed inputs and returns the callable that is timed;
+    'reset', if given, is called before each timing, outside of it
+    """
+
+    name: str
+    setup: typing.Callable[[], typing.Callable[[], typing.Any]]
+    number: int  # calls per timing
+    reset: typing.Optional[typing.Callable[[], None]] = None
+
+
+def _random_notes(rng: np.random.Generator, size: int) -> typing.List[int]:
+    return sorted(rng.choice(np.arange(48, 85), size=size, replace=False).tolist())
+
+
+def _random_chords(size: int, count: int) -> list:
+    from chordnovacore.models.cnchord import CNChord
+
+    rng = np.random.default_rng(SEED + size)
+    return [CNChord.from_notes(notes=_random_notes(rng, size)) for __ in range(count)]
+
+
+def _setup_initialize_expansion_indexes():
+    from chordnovacore.functions import initialize_expansion_indexes
+
+    return initialize_expansion_indexes
+
+
+def _setup_expansion_table():
+    from chordnovacore.functions import MAX_SUPPORTED_NUM_NOTES, ExpansionTable
+
+    def run():
+        table = ExpansionTable()
+        for _max in range(1, MAX_SUPPORTED_NUM_NOTES + 1):
+            for _min in range(1, _max + 1):
+                table.get(_min, _max)
+
+    return run
+
+
+def _setup_find_vec_pairs(ante_size: int, post_size: int):
+    def setup():
+        from chordnovacore.analyser import _find_vec
+
+        pairs = list(zip(_random_chords(ante_size, 50), _random_chords(post_size, 50)))
+
+        def run():
+            for antechord, postchord in pairs:
+                _find_vec(antechord, postchord)
+
+        return run
+
+    return setup
+
+
+def _setup_set_span():
+    from chordnovacore.analyser import set_span
+
+    pairs = list(zip(_random_chords(4, 200), _random_chords(5, 200)))
+
+    def run():
+        for antechord, postchord in pairs:
+            set_span(antechord, postchord, False)
+
+    return run
+
+
+def _setup_find_vec_substitution():
+    from chordnovacore.analyser import find_vec
+
+    pairs = list(zip(_random_chords(3, 10), _random_chords(4, 10)))
+
+    def run():
+        for antechord, postchord in pairs:
+            find_vec(antechord, postchord, False, True)
+
+    return run
+
+
+def _setup_normalize():
+    from chordnovacore.analyser import normalize
+
+    chords = _random_chords(6, 200)
+
+    def run():
+        for chord in chords:
+            normalize(chord)
+
+    return run
+
+
+def _setup_substitute():
+    from chordnovacore.analyser import substitute
+    from chordnovacore.models.cnchord import CNChord
+    from chordnovacore.models.cnchordfeature import CNChordFeature
+
+    antechord = CNChord.from_notes(notes=[60, 64, 67])
+    postchord = CNChord.from_notes(notes=[62, 65, 69])
+    min_features, max_features = CNChordFeature(), CNChordFeature()
+    max_features.sv = 6
+
+    def run():
+        substitute(antechord, postchord, min_features, max_features, CNChordFeature())
+
+    return run
+
+
+def _clear_caches():
+    from chordnovacore.analyser import clear_find_vec_cache
+    from chordnovacore.features import clear_feature_cache
+    from chordnovacore.functions import expansion_indexes
+
+    clear_find_vec_cache()
+    clear_feature_cache()
+    expansion_indexes.clear()
+
+
+CASES: typing.Tuple[Case, ...] = (
+    Case("initialize_expansion_indexes", _setup_initialize_expansion_indexes, 1),
+    Case("expansion_table", _setup_expansion_table, 1),
+    Case("_find_vec[3->3]", _setup_find_vec_pairs(3, 3), 20, _clear_caches),
+    Case("_find_vec[3->5]", _setup_find_vec_pairs(3, 5), 20, _clear_caches),
+    Case("_find_vec[5->3]", _setup_find_vec_pairs(5, 3), 20, _clear_caches),
+    Case("_find_vec[4->8]", _setup_find_vec_pairs(4, 8), 20, _clear_caches),
+    Case("_find_vec[8->12]", _setup_find_vec_pairs(8, 12), 10, _clear_caches),
+    Case("set_span", _setup_set_span, 20),
+    Case("find_vec[substitution]", _setup_find_vec_substitution, 1, _clear_caches),
+    Case("normalize", _setup_normalize, 20),
+    Case("substitute", _setup_substitute, 1, _clear_caches),
+)
+
+
+def time_case(case: Case, repeat: int = DEFAULT_REPEAT) -> typing.Dict[str, float]:
+    """
+    :param case:
+    :param repeat:
+    :return: seconds per call: min, median and mean over the 'repeat' timings
+    """
+    run = case.setup()
+    if case.reset is not None:
+        case.reset()
+    run()  # warm up
+    timings = []
+    for __ in range(repeat):
+        if case.reset is not None:
+            case.reset()
+        start = time.perf_counter()
+        for __ in range(case.number):
+            run()
+        timings.append((time.perf_counter() - start) / case.number)
+    return {
+        "number": case.number,
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def run_cases(
+    cases: typing.Iterable[Case],
+    repeat: int = DEFAULT_REPEAT,
+    log: typing.Optional[typing.TextIO] = None,
+) -> typing.Dict[str, typing.Any]:
+    """
+    :param cases:
+    :param repeat:
+    :param log: progress is written here, if given
+    :return: the results, in the JSON format read by 'compare'
+    """
+    from chordnovacore.tablecache import table_cache_dir
+
+    results = {}
+    with table_cache_dir(None):
+        for case in cases:
+            results[case.name] = time_case(case, repeat)
+            if log is not None:
+                log.write(f"{case.name}: {results[case.name]['median'] * 1e3:.3f} ms\n")
+    return {
+        "format_version": BENCHMARK_FORMAT_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cases": results,
+    }
+
+
+class Comparison(typing.NamedTuple):
+    name: str
+    baseline: float  # median seconds per call
+    current: float
+    ratio: float  # current / baseline
+    regression: bool
+
+
+def compare_results(
+    baseline: typing.Dict[str, typing.Any],
+    current: typing.Dict[str, typing.Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> typing.List[Comparison]:
+    """
+    Cases present in both results; a case regresses if its median is more than
+    'threshold' (a fraction) above the baseline's
+    :param baseline:
+    :param current:
+    :param threshold:
+    :return:
+    """
+    comparisons = []
+    for name, result in current["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        before = baseline["cases"][name]["median"]
+        after = result["median"]
+        ratio = after / before if before > 0 else float("inf")
+        comparisons.append(
+            Comparison(
+                name=name,
+                baseline=before,
+                current=after,
+                ratio=ratio,
+                regression=ratio > 1 + threshold,
+            )
+        )
+    return comparisons
+
+
+def print_comparisons(comparisons: typing.List[Comparison], threshold: float) -> int:
+    """
+    :param comparisons:
+    :param threshold:
+    :return: exit status, 1 if any case regressed
+    """
+    for comparison in comparisons:
+        status = "REGRESSION" if comparison.regression else "ok"
+        print(
+            f"{comparison.name}: {comparison.baseline * 1e3:.3f} ms -> "
+            f"{comparison.current * 1e3:.3f} ms ({comparison.ratio:.2f}x) {status}"
+        )
+    regressions = [c.name for c in comparisons if c.regression]
+    if regressions:
+        print(
+            f"{len(regressions)} case(s) slower by more than {threshold:.0%}: "
+            + ", ".join(regressions)
+        )
+        return 1
+    return 0
+
+
+def _load(path: str) -> typing.Dict[str, typing.Any]:
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)
+    if results.get("format_version") != BENCHMARK_FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has benchmark format {results.get('format_version')}, "
+            f"expected {BENCHMARK_FORMAT_VERSION}"
+        )
+    return results
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the analyser and generator hot paths"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "cases", nargs="*", help="names of the cases to run (default: all)"
+    )
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--output", help="write the results to this JSON file")
+    run_parser.add_argument("--compare", help="baseline JSON file to compare against")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare two JSON files written by 'run'"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    commands.add_parser("list", help="list the cases")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for case in CASES:
+            print(case.name)
+        return 0
+
+    if args.command == "compare":
+        comparisons = compare_results(
+            _load(args.baseline), _load(args.current), args.threshold
+        )
+        return print_comparisons(comparisons, args.threshold)
+
+    cases = CASES
+    if args.cases:
+        names = {case.name for case in CASES}
+        unknown = [name for name in args.cases if name not in names]
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(unknown)}")
+        cases = tuple(case for case in CASES if case.name in args.cases)
+    baseline = _load(args.compare) if args.compare else None
+    results = run_cases(cases, args.repeat, log=sys.stdout)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if baseline is not None:
+        return print_comparisons(
+            compare_results(baseline, results, args.threshold), args.threshold
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
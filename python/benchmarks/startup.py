@@ -0,0 +1,109 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+
+Cold-start benchmark: time to import chordnovacore modules in a fresh interpreter.
+
+    python benchmarks/startup.py --budget 0.5
+
+Each module is imported in its own subprocess, 'repeat' times, and the fastest run is reported,
+so that the result reflects the import itself rather than a busy machine.
+Fails (exit status 1) if a module exceeds the budget or loads music21 on import.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import typing
+
+DEFAULT_MODULES: typing.Tuple[str, ...] = (
+    "chordnovacore.chordprogressiongenerator",
+    "chordnovacore.analyser",
+    "chordnovacore.substitution",
+    "chordnovacore.corpus",
+    "chordnovacore.featurestore",
+)
+DEFAULT_REPEAT = 5
+DEFAULT_BUDGET = 1.0  # seconds
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "music21": "music21" in sys.modules}}))
+"""
+
+
+def measure_import(module: str) -> typing.Dict[str, typing.Any]:
+    """
+    Import 'module' in a fresh interpreter
+    :param module:
+    :return: {"seconds": import time, "music21": whether music21 got loaded}
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module)],
+        cwd=PYTHON_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(
+    modules: typing.Iterable[str] = DEFAULT_MODULES, repeat: int = DEFAULT_REPEAT
+) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    """
+    :param modules:
+    :param repeat:
+    :return: per module, the fastest import time and whether any run loaded music21
+    """
+    results = {}
+    for module in modules:
+        runs = [measure_import(module) for __ in range(repeat)]
+        results[module] = {
+            "seconds": min(r["seconds"] for r in runs),
+            "music21": any(r["music21"] for r in runs),
+        }
+    return results
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure the cold-start import time of chordnovacore"
+    )
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=DEFAULT_BUDGET,
+        help="maximum import time of each module, in seconds",
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.modules, args.repeat)
+    failed = False
+    for module, result in results.items():
+        problems = []
+        if result["seconds"] > args.budget:
+            problems.append(f"over budget of {args.budget:.3f}s")
+        if result["music21"]:
+            problems.append("loads music21")
+        failed |= bool(problems)
+        status = ", ".join(problems) if problems else "ok"
+        print(f"{module}: {result['seconds']:.3f}s ({status})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"budget": args.budget, "results": results}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,15 +6,26 @@ Port to Python by osbertngok
 
 import typing
 from datetime import datetime
-import music21
 import math
 import os
+import numpy as np
 from .models.cnchord import CNChord, OutputMode
 from .models.cnchordfeature import CNChordFeature, CNChordBigramFeature
-from .functions import expansion_indexes, intersect, get_union
+from .functions import (
+    CacheInfo,
+    LRUCache,
+    expansion_indexes,
+    intersect,
+    min_cost_expansion,
+)
+from .features import batch_span_sspan, get_span_sspan
+from .pitchclassset import C5_MIDI, get_pitch_class_set_table, pitch_classes_to_mask
+from .runstats import timed_function
+from .substitution import feature_bounds, iter_substitutes
 
 MAX_SUPPORTED_CHORD_NOTES = 12
-MAX_SUPPORTED_NUM_CHORDS_WITH_UNIQUE_PITCH_CLASS = 2 ^ MAX_SUPPORTED_CHORD_NOTES
+MAX_SUPPORTED_NUM_CHORDS_WITH_UNIQUE_PITCH_CLASS = 2**MAX_SUPPORTED_CHORD_NOTES
+DEFAULT_FIND_VEC_CACHE_SIZE = 4096
 
 
 def get_vec(antechord: CNChord, postchord: CNChord) -> typing.List[int]:
@@ -55,10 +66,8 @@ def expand(antechord: CNChord, target_size: int, index: int) -> CNChord:
     :param index:
     :return:
     """
-    notes = [
-        antechord.notes[expansion_indexes[antechord.t_size][target_size][index][i]]
-        for i in range(target_size)
-    ]
+    expansion = expansion_indexes.expansion(antechord.t_size, target_size, index)
+    notes = [antechord.notes[expansion[i]] for i in range(target_size)]
     return CNChord.from_notes(notes=notes)
 
 
@@ -70,13 +79,41 @@ def set_similarity(
     sv: int,
     period: int = 1,
 ) -> int:
+    return get_similarity(
+        t_size=max(antechord.t_size, postchord.t_size),
+        same_root=antechord.root == postchord.root,
+        in_substitution=in_substitution,
+        vl_max=vl_max,
+        sv=sv,
+        period=period,
+    )
+
+
+def get_similarity(
+    t_size: int,
+    same_root: bool,
+    in_substitution: int,
+    vl_max: int,
+    sv: int,
+    period: int = 1,
+) -> int:
+    """
+    x; see set_similarity
+    :param t_size: size of the larger chord, i.e. of both chords once aligned
+    :param same_root:
+    :param in_substitution:
+    :param vl_max:
+    :param sv:
+    :param period:
+    :return:
+    """
     temp: float = 0
     if in_substitution:
         temp = 36  # Maximum value of sv in chord substitution.
     else:
-        temp = vl_max * period * max(antechord.t_size, postchord.t_size)
-    temp = math.pow((1 - sv) / temp, period)
-    if antechord.root == postchord.root:
+        temp = vl_max * period * t_size
+    temp = math.pow(max(0.0, 1 - sv / temp), period)
+    if same_root:
         temp = math.sqrt(temp)
     return round(100 * temp)
 
@@ -84,114 +121,15 @@ def set_similarity(
 def set_span(
     antechord: CNChord, postchord: CNChord, initial: bool
 ) -> typing.Tuple[int, typing.Optional[int]]:
-    span: int = 0
-    sspan: typing.Optional[int] = None
-
-    single_chrome = []
-    for i in range(postchord.t_size):
-        single_chrome.append(6 - (5 * (postchord.notes[i] % 12) + 6) % 12)
-    copy = list(single_chrome)
-    sorted(copy)
-
-    diff1: int = 0
-    min_diff1: int = copy[postchord.t_size - 1] - copy[0]
-    bound: int = 0
-    min_bound: int = max(
-        int(math.fabs(copy[0])), int(math.fabs(copy[postchord.t_size - 1]))
-    )
-    index: int = 0
-
-    if initial:
-        for i in range(1, postchord.t_size):
-            diff1 = copy[i - 1] + 12 - copy[i]
-            if diff1 < min_diff1:
-                min_diff1 = diff1
-                min_bound = max(
-                    int(math.fabs(copy[i - 1] + 12)), int(math.fabs(copy[i]))
-                )
-                index = i
-            elif diff1 == min_diff1:
-                bound = max(int(math.fabs(copy[i - 1] + 12)), int(math.fabs(copy[i])))
-                if bound < min_bound:
-                    min_bound = bound
-                    index = i
-        span = min_diff1
-    else:
-        diff2 = 0
-        min_diff2 = 0
-        merged_single_chroma = get_union(A=single_chrome, B=copy)
-        min_diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
-        for i in range(1, postchord.t_size):
-            copy[i - 1] += 12
-            diff1 = copy[i - 1] - copy[i % postchord.t_size]
-            if diff1 < min_diff1:
-                min_diff1 = diff1
-                merged_single_chroma = get_union(A=single_chrome, B=copy)
-                min_diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
-                min_bound = max(
-                    int(math.fabs(copy[i - 1])),
-                    int(math.fabs(copy[i % postchord.t_size])),
-                )
-                index = i
-            elif diff1 == min_diff1:
-                merged_single_chroma = get_union((single_chrome, copy))
-                diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
-                if diff2 < min_diff2:
-                    min_diff2 = diff2
-                    min_bound = max(
-                        int(math.fabs(copy[i - 1])),
-                        int(
-                            math.fabs(copy[i % postchord.t_size]),
-                        ),
-                    )
-                elif diff2 == min_diff2:
-                    bound = max(
-                        int(math.fabs(copy[i - 1])),
-                        int(math.fabs(copy[i % postchord.t_size])),
-                    )
-                    if bound < min_bound:
-                        min_bound = bound
-                        index = 1
-        copy = list(single_chrome)
-        sorted(copy)
-        for i in range(postchord.t_size, 0, -1):
-            j = (i - 2 + postchord.t_size) % postchord.t_size
-            copy[i - 1] -= 12
-            diff1 = copy[j] - copy[i - 1]
-            if diff1 < min_diff1:
-                min_diff1 = diff1
-                merged_single_chroma = get_union(A=single_chrome, B=copy)
-                min_diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
-                min_bound = max(int(math.fabs(copy[j])), int(math.fabs(copy[i - 1])))
-                index = -i
-            elif diff1 == min_diff1:
-                merged_single_chroma = get_union(A=single_chrome, B=copy)
-                diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
-                if diff2 < min_diff2:
-                    min_diff2 = diff2
-                    min_bound = max(
-                        int(math.fabs(copy[j])), int(math.fabs(copy[i - 1]))
-                    )
-                    index = -i
-                elif diff2 == min_diff2:
-                    bound = max(int(math.fabs(copy[j])), int(math.fabs(copy[i - 1])))
-                    if bound < min_bound:
-                        min_bound = bound
-                        index = -i
-
-        span = min_diff1
-        sspan = min_diff2
-    copy = list(single_chrome)
-    sorted(copy)
-    if index > 0:
-        for i in range(postchord.t_size):
-            if single_chrome[i] < copy[index - 1]:
-                single_chrome[i] += 12
-    elif index < 0:
-        for i in range(postchord.t_size):
-            if single_chrome[i] >= copy[-index - 1]:
-                single_chrome[i] -= 12
-    return span, sspan
+    """
+    s and ss of the postchord, see features.get_span_sspan
+    :param antechord:
+    :param postchord:
+    :param initial: if true, sspan is not needed and None is returned
+    :return: (span, sspan)
+    """
+    span, sspan = get_span_sspan(postchord.notes)
+    return span, None if initial else sspan
 
 
 def set_param2(
@@ -214,6 +152,42 @@ def set_param2(
     :param in_substitution:
     :return:
     """
+    return get_bigram_feature(
+        antechord=antechord,
+        postchord=postchord,
+        ante_root=antechord.root,
+        post_root=postchord.root,
+        vec=vec,
+        sv=sv,
+        in_analyser=in_analyser,
+        in_substitution=in_substitution,
+    )
+
+
+@timed_function("features")
+def get_bigram_feature(
+    antechord: CNChord,
+    postchord: CNChord,
+    ante_root: int,
+    post_root: int,
+    vec: typing.List[int],
+    sv: int,
+    in_analyser: bool,
+    in_substitution: bool,
+) -> CNChordBigramFeature:
+    """
+    set_param2 with the roots given, so that the unigram features of the aligned chords,
+    whose roots are those of the chords before alignment, need not be computed
+    :param antechord: aligned antechord
+    :param postchord: aligned postchord
+    :param ante_root:
+    :param post_root:
+    :param vec:
+    :param sv:
+    :param in_analyser:
+    :param in_substitution:
+    :return:
+    """
     ascending_count = 0
     steady_count = 0
     descending_count = 0
@@ -229,7 +203,7 @@ def set_param2(
         elif vec[i] < 0:
             descending_count += 1
 
-    root_movement = (postchord.root - antechord.root + 12) % 12
+    root_movement = (post_root - ante_root + 12) % 12
     if root_movement > 6:
         root_movement = 12 - root_movement
 
@@ -248,59 +222,139 @@ def set_param2(
         vl_min = 0
 
     common_note = intersect(A=postchord.notes, B=antechord.notes, regular=True)
-    similarity = set_similarity(
-        antechord=antechord,
-        postchord=postchord,
+    similarity = get_similarity(
+        t_size=max(antechord.t_size, postchord.t_size),
+        same_root=ante_root == post_root,
         vl_max=vl_max,
         sv=sv,
         in_substitution=in_substitution,
     )
     span, sspan = set_span(antechord=antechord, postchord=postchord, initial=False)
 
+    bigram_feature = CNChordBigramFeature()
+    bigram_feature.vec = vec
+    bigram_feature.sv = sv
+    bigram_feature.ascending_count = ascending_count
+    bigram_feature.steady_count = steady_count
+    bigram_feature.descending_count = descending_count
+    bigram_feature.root_movement = root_movement
+    bigram_feature.common_note = len(common_note)
+    bigram_feature.similarity = similarity
+    bigram_feature.span = span
+    bigram_feature.sspan = sspan
+    return bigram_feature
+
+
+@timed_function("features")
+def batch_bigram_features(
+    ante_notes: np.ndarray,
+    post_notes: np.ndarray,
+    ante_root: np.ndarray,
+    post_root: np.ndarray,
+    in_analyser: bool,
+    in_substitution: bool,
+) -> typing.Dict[str, np.ndarray]:
+    """
+    get_bigram_feature of N pairs of aligned chords at once
 
+    :param ante_notes: (N, n) notes of the aligned antechords
+    :param post_notes: (N, n) notes of the aligned postchords
+    :param ante_root: (N,)
+    :param post_root: (N,)
+    :param in_analyser:
+    :param in_substitution:
+    :return: 'vec' (N, n) and every column of ProgressionAnalysis.BIGRAM_COLUMNS, (N,) each
+    """
+    ante_notes = np.asarray(ante_notes, dtype=np.int64)
+    post_notes = np.asarray(post_notes, dtype=np.int64)
+    vec = post_notes - ante_notes
+    sv = np.abs(vec).sum(axis=1).astype(np.float64)
+
+    root_movement = (np.asarray(post_root) - np.asarray(ante_root) + 12) % 12
+    root_movement = np.where(root_movement > 6, 12 - root_movement, root_movement)
+
+    if in_substitution:
+        vl_max = np.full(len(vec), 6)
+    elif in_analyser:
+        vl_max = np.maximum(np.abs(vec).max(axis=1, initial=0), 1)
+    else:
+        raise ValueError("Expect in_analyser or in_substitution, vl_max is unknown")
+
+    # Distinct notes of the postchord that are also in the antechord
+    post_sorted = np.sort(post_notes, axis=1)
+    distinct = np.ones(post_sorted.shape, dtype=bool)
+    distinct[:, 1:] = post_sorted[:, 1:] != post_sorted[:, :-1]
+    shared = (post_sorted[:, :, None] == ante_notes[:, None, :]).any(axis=2)
+    common_note = (distinct & shared).sum(axis=1)
+
+    # get_similarity with period = 1
+    if in_substitution:
+        temp = np.full(len(vec), 36.0)
+    else:
+        temp = (vl_max * vec.shape[1]).astype(np.float64)
+    similarity = np.maximum(0.0, 1 - sv / temp)
+    similarity = np.where(
+        np.asarray(ante_root) == np.asarray(post_root),
+        np.sqrt(similarity),
+        similarity,
+    )
+    similarity = np.round(100 * similarity).astype(np.int64)
+
+    span, sspan = batch_span_sspan(post_notes)
+    return {
+        "vec": vec,
+        "sv": sv,
+        "ascending_count": (vec > 0).sum(axis=1),
+        "steady_count": (vec == 0).sum(axis=1),
+        "descending_count": (vec < 0).sum(axis=1),
+        "root_movement": root_movement,
+        "common_note": common_note,
+        "similarity": similarity,
+        "span": span,
+        "sspan": sspan,
+    }
+
+
+@timed_function("alignment")
 def _find_vec(
     antechord: CNChord, postchord: CNChord
 ) -> typing.Tuple[CNChord, CNChord, typing.List[int], float]:
     """
     Align two chords so that they have the same size (same number of notes),
     among all possible solutions, arg-min sv (movement distance)
+
+    The smaller chord (refer to size) is expanded to the size of the other one,
+    as in the original C++ implementation. The optimal expansion is found by
+    min_cost_expansion in O(antechord.t_size * postchord.t_size),
+    with the same result and tie-breaking as scanning expansion_indexes.
     :param antechord:
     :param postchord:
     :return: (new_antechord, new_postchord, vec, sv):
     vec: a list of movements
     sv: sum of abs(vec)
     """
-    min_vec = []
-    min_diff = math.inf
-    min_index = 0
-    _len = 0
-
-    ret_antechord: typing.Optional[CNChord] = None
-    ret_postchord: typing.Optional[CNChord] = None
+    ante_notes = antechord.notes
+    post_notes = postchord.notes
 
     if postchord.t_size > antechord.t_size:
-        _len = math.comb(postchord.t_size - 1, antechord.t_size - 1)
-        for i in range(_len):
-            expansion = expand(antechord, postchord.t_size, i)
-            vec = get_vec(expansion, postchord)
-            sv = get_sv(vec)
-            if sv < min_diff:
-                min_vec = vec
-                min_diff = sv
-                min_index = i
-        # we now have a min_index. Let's finalize the result:
-        ret_antechord = expand(antechord, postchord.t_size, min_index)
+        expansion, _ = min_cost_expansion(source=ante_notes, target=post_notes)
+        ante_notes = [ante_notes[i] for i in expansion]
+        ret_antechord = CNChord.from_notes(notes=ante_notes)
         ret_postchord = postchord.copy()
-    elif postchord.t_size == antechord.t_size:
+    elif postchord.t_size < antechord.t_size:
+        expansion, _ = min_cost_expansion(source=post_notes, target=ante_notes)
+        post_notes = [post_notes[i] for i in expansion]
+        ret_antechord = antechord.copy()
+        ret_postchord = CNChord.from_notes(
+            notes=post_notes, ref_chord=postchord.ref_chord
+        )
+    else:
         # We don't really have a choice do we?
         ret_antechord = antechord.copy()  # Maybe maybe we should normalize here?
         ret_postchord = postchord.copy()
-        min_vec = get_vec(ret_antechord, ret_postchord)
-        min_diff = get_sv(min_vec)
-    else:
-        raise NotImplementedError(
-            "Logics for antechord.t_size > postchord.t_size is not implemented"
-        )
+
+    min_vec = [post - ante for ante, post in zip(ante_notes, post_notes)]
+    min_diff = get_sv(min_vec)
 
     return (
         ret_antechord,
@@ -310,8 +364,98 @@ def _find_vec(
     )
 
 
+class _FindVecEntry(typing.NamedTuple):
+    ante_notes: typing.List[int]  # notes of the aligned antechord
+    post_notes: typing.List[int]  # notes of the aligned postchord
+    vec: typing.List[int]
+    sv: float
+    bigram_feature: CNChordBigramFeature
+
+
+"""
+Process-wide cache of find_vec results, keyed by the notes of both chords and the two flags.
+The cached CNChordBigramFeature objects are shared and must not be modified.
+"""
+_find_vec_cache = LRUCache(maxsize=DEFAULT_FIND_VEC_CACHE_SIZE)
+
+
+def set_find_vec_cache_size(maxsize: typing.Optional[int]):
+    """
+    :param maxsize: None for unbounded, 0 to disable caching
+    :return:
+    """
+    _find_vec_cache.maxsize = maxsize
+
+
+def find_vec_cache_info() -> CacheInfo:
+    return _find_vec_cache.info()
+
+
+def clear_find_vec_cache():
+    _find_vec_cache.clear()
+
+
+@timed_function("alignment")
 def find_vec(
     antechord: CNChord, postchord: CNChord, in_analyser: bool, in_substitution: bool
+) -> typing.Tuple[CNChord, CNChord, typing.List[int], float, CNChordBigramFeature]:
+    """
+    align two chords so that they have the same size,
+    among all possible solutions, argmin sv (movement distance).
+    Results are cached, see set_find_vec_cache_size; the returned bigram_feature
+    may be shared with other calls and must not be modified.
+
+    :param antechord:
+    :param postchord:
+    :param in_analyser:
+    :param in_substitution: if true, would traverse all possible inversions within 2 octaves
+    :return: (new_antechord, new_postchord, vec, sv, bigram_features), see _find_vec_uncached
+    """
+    key = (
+        antechord.notes_key,
+        postchord.notes_key,
+        bool(in_analyser),
+        bool(in_substitution),
+    )
+
+    def compute() -> _FindVecEntry:
+        ret_antechord, ret_postchord, vec, sv, bigram_feature = _find_vec_uncached(
+            antechord, postchord, in_analyser, in_substitution
+        )
+        return _FindVecEntry(
+            ante_notes=ret_antechord.notes,
+            post_notes=ret_postchord.notes,
+            vec=vec,
+            sv=sv,
+            bigram_feature=bigram_feature,
+        )
+
+    entry: _FindVecEntry = _find_vec_cache.get_or_compute(key, compute)
+    # As in _find_vec, chords that keep their notes are copies of the input,
+    # and the postchord keeps its ref_chord, unless it is replaced by an inversion in substitution
+    if entry.ante_notes == antechord.notes:
+        ret_antechord = antechord.copy()
+    else:
+        ret_antechord = CNChord.from_notes(notes=entry.ante_notes)
+    if in_substitution:
+        ret_postchord = CNChord.from_notes(notes=entry.post_notes)
+    elif entry.post_notes == postchord.notes:
+        ret_postchord = postchord.copy()
+    else:
+        ret_postchord = CNChord.from_notes(
+            notes=entry.post_notes, ref_chord=postchord.ref_chord
+        )
+    return (
+        ret_antechord,
+        ret_postchord,
+        list(entry.vec),
+        entry.sv,
+        entry.bigram_feature,
+    )
+
+
+def _find_vec_uncached(
+    antechord: CNChord, postchord: CNChord, in_analyser: bool, in_substitution: bool
 ) -> typing.Tuple[CNChord, CNChord, typing.List[int], float, CNChordBigramFeature]:
     """
     align two chords so that they have the same size,
@@ -348,7 +492,7 @@ def find_vec(
             inversion: typing.List[int] = []
             for j in range(size):
                 inversion.append(
-                    orig_notes[(j + 1) % size] + ((j + i) // size - 1) * 12
+                    orig_notes[(j + i) % size] + ((j + i) // size - 1) * 12
                 )
             # For i = 0, the whole 'new_chord' is flipped down an octave;
             # For i = 2 * size, it is flipped up an octave.
@@ -357,7 +501,7 @@ def find_vec(
             size_ = len(vec)
             b = True
             for j in range(size_):
-                if math.fabs(vec[j] > 6):
+                if abs(vec[j]) > 6:
                     b = False
                     break
             if b and sv < min_sv:
@@ -367,7 +511,7 @@ def find_vec(
         inversion = []
         for j in range(size):
             inversion.append(
-                orig_notes[(j + 1) % size] + ((j + min_index) // size - 1) * 12
+                orig_notes[(j + min_index) % size] + ((j + min_index) // size - 1) * 12
             )
         # Re-calculate; hoping it is not that expensive
         ret_antechord, ret_postchord, vec, sv = _find_vec(
@@ -388,6 +532,109 @@ def find_vec(
     return ret_antechord, ret_postchord, vec, sv, bigram_feature
 
 
+class ProgressionAnalysis(object):
+    """
+    Result of analyse_progression for a progression of N chords, in columns.
+
+    chord_features: unigram features of the N chords
+    vec: movement vector of each of the N - 1 bigrams chords[i] -> chords[i + 1]
+    other bigram features (see BIGRAM_COLUMNS): (N - 1,) arrays, entry i for chords[i] -> chords[i + 1]
+    """
+
+    BIGRAM_COLUMNS: typing.Tuple[str, ...] = (
+        "sv",
+        "ascending_count",
+        "steady_count",
+        "descending_count",
+        "root_movement",
+        "common_note",
+        "similarity",
+        "span",
+        "sspan",
+    )
+
+    chord_features: typing.List[CNChordFeature]
+    vec: typing.List[typing.List[int]]
+    sv: np.ndarray
+    ascending_count: np.ndarray
+    steady_count: np.ndarray
+    descending_count: np.ndarray
+    root_movement: np.ndarray
+    common_note: np.ndarray
+    similarity: np.ndarray
+    span: np.ndarray
+    sspan: np.ndarray
+
+    def __init__(
+        self,
+        chord_features: typing.List[CNChordFeature],
+        vec: typing.List[typing.List[int]],
+        columns: typing.Dict[str, np.ndarray],
+    ):
+        self.chord_features = chord_features
+        self.vec = vec
+        for name in self.BIGRAM_COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self) -> int:
+        """
+        Number of bigrams
+        :return:
+        """
+        return len(self.vec)
+
+    def bigram_feature(self, index: int) -> CNChordBigramFeature:
+        bigram_feature = CNChordBigramFeature()
+        bigram_feature.vec = self.vec[index]
+        for name in self.BIGRAM_COLUMNS:
+            value = getattr(self, name)[index]
+            setattr(bigram_feature, name, float(value) if name == "sv" else int(value))
+        return bigram_feature
+
+
+def analyse_progression(chords: typing.Sequence[CNChord]) -> ProgressionAnalysis:
+    """
+    Analyse every pair of adjacent chords of a progression,
+    with the same result as find_vec(chords[i], chords[i + 1], in_analyser=True, in_substitution=False).
+
+    The unigram features of each chord are computed once and reused by both bigrams it belongs to;
+    the aligned (expanded) chords have the roots of the chords they come from,
+    so their unigram features are not computed at all.
+    :param chords:
+    :return:
+    """
+    chord_features = [chord.materialize_chord_feature() for chord in chords]
+    roots = np.array([feature.root for feature in chord_features], dtype=np.int64)
+    num_bigrams = max(0, len(chords) - 1)
+
+    # Align every pair with _find_vec, then compute the bigram features of all pairs of the same aligned size at once
+    aligned: typing.Dict[int, typing.List[typing.Tuple[int, list, list]]] = {}
+    for i in range(num_bigrams):
+        ante, post, __, __ = _find_vec(antechord=chords[i], postchord=chords[i + 1])
+        aligned.setdefault(ante.t_size, []).append((i, ante.notes, post.notes))
+
+    vec: typing.List[typing.List[int]] = [[] for __ in range(num_bigrams)]
+    columns = {
+        name: np.zeros(num_bigrams, dtype=np.float64 if name == "sv" else np.int64)
+        for name in ProgressionAnalysis.BIGRAM_COLUMNS
+    }
+    for pairs in aligned.values():
+        indexes = np.array([i for i, __, __ in pairs])
+        features = batch_bigram_features(
+            ante_notes=np.array([ante for __, ante, __ in pairs]),
+            post_notes=np.array([post for __, __, post in pairs]),
+            ante_root=roots[indexes],
+            post_root=roots[indexes + 1],
+            in_analyser=True,
+            in_substitution=False,
+        )
+        for i, row in zip(indexes, features["vec"].tolist()):
+            vec[i] = row
+        for name in ProgressionAnalysis.BIGRAM_COLUMNS:
+            columns[name][indexes] = features[name]
+    return ProgressionAnalysis(chord_features, vec, columns)
+
+
 def normalize(chord: CNChord, ref_chord: typing.Optional[CNChord] = None) -> CNChord:
     """
     Create a new but normalized CNChord, without modifying this chord
@@ -400,10 +647,7 @@ def normalize(chord: CNChord, ref_chord: typing.Optional[CNChord] = None) -> CNC
     :param chord:
     :return:
     """
-    c5midi = music21.pitch.Pitch("C5").midi  # 7n2
-    # Argument 1 on why we should use inheritance instead
-    notes = [c5midi + p for p in list(set(chord._chord.pitchClasses))]
-    sorted(notes)
+    notes = [C5_MIDI + p for p in chord.notes_key.pitch_classes]
 
     ret = CNChord.from_notes(notes=notes, ref_chord=ref_chord)
 
@@ -411,15 +655,7 @@ def normalize(chord: CNChord, ref_chord: typing.Optional[CNChord] = None) -> CNC
 
 
 def id_to_notes(id: int):
-    v = []
-    note = music21.pitch.Pitch("C5").midi
-    copy = id
-    while copy != 0:
-        if copy % 2 == 1:
-            v.append(note)
-        note += 1
-        copy //= 2
-    return v
+    return list(get_pitch_class_set_table().notes[id])
 
 
 def notes_to_id(notes: typing.List[int]) -> int:
@@ -435,11 +671,8 @@ def notes_to_id(notes: typing.List[int]) -> int:
     :return: id in the sub library
     """
 
-    # Let's normalize the notes first
-    pitchClasses = list(set([note % 12 for note in notes]))
-
-    # Sorting actually doesn't matter
-    return sum([2 ^ p for p in pitchClasses])
+    # Duplicated pitch classes set the same bit; sorting doesn't matter
+    return pitch_classes_to_mask(note % 12 for note in notes)
 
 
 def sub_library(id: int) -> typing.List[int]:
@@ -447,26 +680,28 @@ def sub_library(id: int) -> typing.List[int]:
     return id_to_notes(id)
 
 
-def substitute(
+def iter_substitute(
     antechord: CNChord,
     postchord: CNChord,
     minChordFeatures: CNChordFeature,
     maxChordFeatures: CNChordFeature,
-    radiusChordFeatures: CNChordFeature,
-    output_path: str = "./",
-    output_name: str = "test",
-    output_mode_sub: OutputMode = OutputMode.TextOnly,
-) -> typing.List[CNChord]:
+    workers: int = 1,
+) -> typing.Iterator[typing.Tuple[CNChord, CNChord, CNChordBigramFeature]]:
     """
-    Chord::substitute() in analyser.cpp
-
-    Let's drag the parameters out as a separate class
+    Streaming version of substitute: each substitute is yielded as soon as it passes the bounds,
+    in the same order as substitute returns them. Stop iterating to stop the search.
 
     :param antechord:
     :param postchord:
-    :return:
+    :param minChordFeatures: lower bounds; only the attributes that are set are checked,
+    see substitution.SUBSTITUTION_FEATURES
+    :param maxChordFeatures: upper bounds, likewise
+    :param workers: number of processes the candidates are evaluated on;
+    the result does not depend on it
+    :return: (new_antechord, new_postchord, bigram_feature):
+    the antechord aligned with the substitute of the postchord, the substitute,
+    and the features of the progression between them
     """
-    begin_sub = datetime.utcnow()
 
     """
     void Chord::set_param_center()
@@ -484,12 +719,16 @@ def substitute(
     """
 
     aligned_antechord, aligned_postchord, __, __, __ = find_vec(
-        normalized_antechord, normalized_postchord
+        normalized_antechord,
+        normalized_postchord,
+        in_analyser=True,
+        in_substitution=False,
     )
 
     """
     void Chord::set_param_range()
     """
+    lower, upper = feature_bounds(minChordFeatures, maxChordFeatures)
 
     """
     void Chord::set_sub_library()
@@ -502,15 +741,84 @@ def substitute(
     # So for now we would provide a function sub_library
     # to generate the notes on the fly
 
-    record_ante: typing.List[CNChord] = []
-    record_post: typing.List[CNChord] = []
+    id_of_reduced_post_notes = notes_to_id(normalized_postchord.notes)
+
+    # Candidates are aligned and measured in batches;
+    # CNChords are only built for those within the bounds, in the order of their ids
+    for candidate in iter_substitutes(
+        ante_notes=normalized_antechord.notes,
+        ids=(
+            i
+            for i in range(1, MAX_SUPPORTED_NUM_CHORDS_WITH_UNIQUE_PITCH_CLASS)
+            if i != id_of_reduced_post_notes
+        ),
+        lower=lower,
+        upper=upper,
+        workers=workers,
+    ):
+        new_antechord = CNChord.from_notes(notes=candidate.ante_notes)
+        new_postchord = CNChord.from_notes(
+            notes=candidate.post_notes, ref_chord=new_antechord
+        )
+        # The batch has every bigram feature already: the same values as set_param2(..., in_substitution=True)
+        bigram_feature = CNChordBigramFeature()
+        for name in (
+            "vec",
+            "sv",
+            "ascending_count",
+            "steady_count",
+            "descending_count",
+            "root_movement",
+            "common_note",
+            "similarity",
+            "span",
+            "sspan",
+        ):
+            setattr(bigram_feature, name, getattr(candidate, name))
+        new_postchord.bigram_feature = bigram_feature
+        yield new_antechord, new_postchord, new_postchord.bigram_feature
+
+
+def substitute(
+    antechord: CNChord,
+    postchord: CNChord,
+    minChordFeatures: CNChordFeature,
+    maxChordFeatures: CNChordFeature,
+    radiusChordFeatures: CNChordFeature,
+    output_path: str = "./",
+    output_name: str = "test",
+    output_mode_sub: OutputMode = OutputMode.TextOnly,
+    workers: int = 1,
+) -> typing.List[CNChord]:
+    """
+    Chord::substitute() in analyser.cpp
+
+    Let's drag the parameters out as a separate class
+
+    :param antechord:
+    :param postchord:
+    :param minChordFeatures: lower bounds; only the attributes that are set are checked,
+    see substitution.SUBSTITUTION_FEATURES
+    :param maxChordFeatures: upper bounds, likewise
+    :param workers: number of processes the candidates are evaluated on;
+    the result does not depend on it
+    :return: the substitutes of the postchord, aligned with the antechord
+    (available as their ref_chord) and carrying their bigram_feature
+    """
+    begin_sub = datetime.utcnow()
 
     name1 = os.path.join(output_path, output_name, ".txt")
     name2 = os.path.join(output_path, output_name, ".mid")
 
-    id_of_reduced_post_notes = notes_to_id(normalized_postchord.notes)
+    record_post: typing.List[CNChord] = [
+        new_postchord
+        for __, new_postchord, __ in iter_substitute(
+            antechord=antechord,
+            postchord=postchord,
+            minChordFeatures=minChordFeatures,
+            maxChordFeatures=maxChordFeatures,
+            workers=workers,
+        )
+    ]
 
-    for i in range(1, MAX_SUPPORTED_NUM_CHORDS_WITH_UNIQUE_PITCH_CLASS):
-        if i == id_of_reduced_post_notes:
-            continue
-        new_postchord(sub_library(id=i))
+    return record_post
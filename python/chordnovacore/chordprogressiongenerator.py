@@ -7,9 +7,25 @@ import typing
 
 from datetime import datetime
 
+import contextlib
 import enum
+import heapq
+import os
+import time
 from . import i18n
+from .continual import DEFAULT_CONTINUAL_WINDOW, ContinualStream
+from .dedup import (
+    DEFAULT_FALSE_POSITIVE_RATE,
+    DedupIndex,
+    set_key,
+    set_type_key,
+    vec_key,
+)
+from .features import UNIGRAM_FEATURE_FUNCTIONS
+from .functions import expansion_indexes
+from .midi import write_midi
 from .models.cnchord import CNChord
+from .runstats import RunStats, activated, profiled, timed
 
 
 class OutputMode(enum.Enum):
@@ -50,6 +66,193 @@ class IntervalData(object):
     num_max: int
 
 
+"""
+Parameters that can appear in 'sort_order' / 'sort_order_sub', and the CNChord attributes they refer to.
+Each parameter may be followed by '+' (ascending, the default) or '-' (descending),
+e.g. "x-t+s" sorts by similarity (descending), then tension, then span.
+
+Chroma (k, kk) and Q are parameters of the C++ implementation that CNChord does not compute yet
+(see set_chroma); sorting by them is rejected rather than failing halfway through a sort.
+"""
+SORT_KEYS: typing.Dict[str, str] = {
+    "t": "tension",
+    "c": "common_note",
+    "sv": "sv",
+    "n": "s_size",
+    "m": "t_size",
+    "h": "thickness",
+    "g": "g_center",
+    "r": "root",
+    "s": "span",
+    "ss": "sspan",
+    "x": "similarity",
+}
+UNSUPPORTED_SORT_KEYS: typing.Tuple[str, ...] = ("k", "kk", "Q")
+# Attributes read from CNChord.bigram_feature, i.e. only known for chords reached from a ref_chord
+BIGRAM_SORT_KEYS: typing.Tuple[str, ...] = ("common_note", "sv", "sspan", "similarity")
+
+
+def parse_sort_order(sort_order: str) -> typing.List[typing.Tuple[str, bool]]:
+    """
+    :param sort_order: e.g. "x-t+s"
+    :return: [(attribute, descending)], e.g. [("similarity", True), ("tension", False), ("span", False)]
+    """
+    keys = []
+    index = 0
+    while index < len(sort_order):
+        # Two-letter parameters (kk, sv, ss) take precedence
+        for length in (2, 1):
+            token = sort_order[index : index + length]
+            if len(token) == length and (
+                token in SORT_KEYS or token in UNSUPPORTED_SORT_KEYS
+            ):
+                break
+        else:
+            raise ValueError(
+                f"Unknown parameter '{sort_order[index]}' in sort order '{sort_order}'"
+            )
+        if token in UNSUPPORTED_SORT_KEYS:
+            raise ValueError(
+                f"Sorting by '{token}' is not supported yet, in sort order '{sort_order}'"
+            )
+        index += length
+        descending = False
+        if index < len(sort_order) and sort_order[index] in "+-":
+            descending = sort_order[index] == "-"
+            index += 1
+        keys.append((SORT_KEYS[token], descending))
+    return keys
+
+
+def enumerate_vecs(
+    notes: typing.Sequence[int],
+    moves: typing.Iterable[int],
+    lowest: int,
+    highest: int,
+    i_min: int,
+    i_max: int,
+    sv_min: int,
+    sv_max: int,
+) -> typing.Iterator[typing.List[int]]:
+    """
+    Branch-and-bound enumeration of movement vectors.
+
+    Yields every 'vec' with vec[j] in 'moves' such that, for new_notes[j] = notes[j] + vec[j]:
+        1. lowest <= new_notes[j] <= highest;
+        2. i_min <= new_notes[j] - new_notes[j - 1] <= i_max (so voices never cross if i_min >= 0);
+        3. sv_min <= sum(abs(vec)) <= sv_max.
+    Vectors are yielded in lexicographic order (vec[0] most significant, moves ascending),
+    i.e. the order of itertools.product(sorted(moves), repeat=len(notes)) filtered by the conditions above.
+
+    Voices are assigned from the lowest up; a partial vector is cut off as soon as
+    no completion can satisfy the conditions, instead of enumerating all len(moves) ** len(notes) vectors.
+    :param notes: sorted notes
+    :param moves: allowed movements of a single voice
+    :param lowest:
+    :param highest:
+    :param i_min:
+    :param i_max:
+    :param sv_min:
+    :param sv_max:
+    :return:
+    """
+    n = len(notes)
+    moves = sorted(set(moves))
+    if n == 0 or not moves:
+        return
+    min_cost = min(abs(move) for move in moves)
+    max_cost = max(abs(move) for move in moves)
+    vec = [0] * n
+
+    def extend(j: int, previous: int, sv: int) -> typing.Iterator[typing.List[int]]:
+        rest = n - 1 - j  # voices left after this one
+        for move in moves:
+            note = notes[j] + move
+            if note < lowest:
+                continue
+            if note > highest:
+                break
+            if j > 0:
+                if note - previous < i_min:
+                    continue
+                if note - previous > i_max:
+                    break
+            cost = sv + abs(move)
+            if cost + rest * min_cost > sv_max or cost + rest * max_cost < sv_min:
+                continue
+            # Each remaining voice has to be reachable from this note within the interval limits
+            if rest and (note + rest * i_min > highest or not _reachable(j, note)):
+                continue
+            vec[j] = move
+            if rest == 0:
+                yield list(vec)
+            else:
+                yield from extend(j + 1, note, cost)
+
+    def _reachable(j: int, note: int) -> bool:
+        for k in range(1, n - j):
+            if notes[j + k] + moves[-1] < note + k * i_min:
+                return False
+            if notes[j + k] + moves[0] > note + k * i_max:
+                return False
+        return True
+
+    yield from extend(0, 0, 0)
+
+
+class _SortKey(object):
+    """
+    Compares chords parameter by parameter, reading a parameter only when all previous ones are equal,
+    so that a chord which already loses on the first parameter never has its other features evaluated.
+    Unigram parameters are read one by one (see CNChord.unigram_feature), not by computing
+    all unigram features of the chord.
+    Ties are broken by the original position, which keeps the sort stable.
+    """
+
+    __slots__ = ("chord", "position", "keys", "_values")
+
+    def __init__(
+        self,
+        chord: CNChord,
+        position: int,
+        keys: typing.List[typing.Tuple[str, bool]],
+    ):
+        self.chord = chord
+        self.position = position
+        self.keys = keys
+        self._values: typing.List[typing.Any] = []
+
+    def _value(self, index: int) -> typing.Any:
+        while len(self._values) <= index:
+            name = self.keys[len(self._values)][0]
+            if name in UNIGRAM_FEATURE_FUNCTIONS:
+                self._values.append(self.chord.unigram_feature(name))
+            else:
+                self._values.append(getattr(self.chord, name))
+        return self._values[index]
+
+    def __lt__(self, other: "_SortKey") -> bool:
+        for index, (__, descending) in enumerate(self.keys):
+            a, b = self._value(index), other._value(index)
+            if a != b:
+                return a > b if descending else a < b
+        return self.position < other.position
+
+
+class _WorstFirst(object):
+    """
+    Reverses a _SortKey, so that heapq keeps the worst of the kept chords at the top
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: _SortKey):
+        self.key = key
+
+    def __lt__(self, other: "_WorstFirst") -> bool:
+        return other.key < self.key
+
+
 class ChordProgressionGenerator(object):
     """
     Implementation of Chord based on
@@ -212,26 +415,28 @@ class ChordProgressionGenerator(object):
     q_min_sub: float
     q_max_sub: float
 
-    begin: float
-    begin_progr: float
-    end: float
+    begin: float  # time.time() at the start of an instrumented run, see instrument
+    begin_progr: float  # time.time() at the start of the latest progression step
+    end: float  # time.time() at the end of an instrumented run
     begin_sub: float
     begin_loop_sub: float
     end_sub: float
 
-    exp_count: int  # expansion counter
-    progr_count: int  # progression counter
+    exp_count: int = 0  # expansion counter
+    progr_count: int = 0  # progression counter
+    stats: typing.Optional[RunStats] = None  # stats of the current run, see instrument
     c_size: int  # size of new_chords
     sub_size: int  # size of　record_ante / record_post
     set_id: int  # an integer representing 'note_set'; unique for different 'note_set's
 
     vec_id: int  # an integer representing 'vec'; unique for different 'vec's
     max_cnt: int  # total number of possible movement vectors
-    rec_id: typing.List[int]  # contains 'set_id' of all 12 transpositions of 'note_set'
-    vec_ids: typing.List[
-        int
-    ]  # contains the 'vec_id' of generated chords in a single progression
-    record: typing.List[CNChord]  # contains the generated chords in continual mode
+    rec_ids: DedupIndex  # keys (see unique_key) of the chords recorded so far
+    vec_ids: DedupIndex  # 'vec_id' of generated chords in a single progression
+    record: typing.MutableSequence[
+        CNChord
+    ]  # contains the generated chords in continual mode; only the recent ones when streaming
+    continual_stream: typing.Optional[ContinualStream] = None  # open_continual_stream
     new_chords: typing.List[
         CNChord
     ]  # contains the generated chords in a single progression
@@ -241,6 +446,38 @@ class ChordProgressionGenerator(object):
         typing.List[int]
     ]  # Contains all possible chords for substitution.
 
+    @contextlib.contextmanager
+    def instrument(
+        self, profile_path: typing.Optional[str] = None
+    ) -> typing.Iterator[RunStats]:
+        """
+        Collect the stats of a run: the body of the 'with' block.
+        Resets exp_count and progr_count, fills 'begin' and 'end', and times every stage
+        (see runstats.STAGES) in the returned RunStats, also available as 'stats' during the run.
+        The stats are also active (see runstats.activated) for the analyser, feature and substitution
+        functions called during the run.
+
+            with cpg.instrument(profile_path="run.prof") as stats:
+                ...
+            print(stats.report())
+
+        :param profile_path: if given, the run is also profiled with cProfile and the profile saved there
+        :return:
+        """
+        stats = RunStats(profile_path=profile_path)
+        self.stats = stats
+        self.begin = stats.begin
+        self.exp_count = 0
+        self.progr_count = 0
+        try:
+            with activated(stats), profiled(profile_path):
+                yield stats
+        finally:
+            stats.finish()
+            self.end = stats.end
+            stats.counters["progressions"] = self.progr_count
+            self.stats = None
+
     def set_max_count(self):
         raise NotImplementedError()
 
@@ -263,8 +500,71 @@ class ChordProgressionGenerator(object):
         """
         raise NotImplementedError()
 
-    def set_new_chords(self, cpg: "ChordProgressionGenerator"):
-        raise NotImplementedError()
+    def allowed_moves(self) -> typing.List[int]:
+        """
+        Movements a single voice may make, according to vl_min, vl_max
+        and enable_steady / enable_ascending / enable_descending
+        :return:
+        """
+        moves = []
+        if self.enable_steady:
+            moves.append(0)
+        for distance in range(max(1, self.vl_min), self.vl_max + 1):
+            if self.enable_ascending:
+                moves.append(distance)
+            if self.enable_descending:
+                moves.append(-distance)
+        return sorted(moves)
+
+    def movement_vectors(
+        self, notes: typing.List[int]
+    ) -> typing.Iterator[typing.List[int]]:
+        """
+        All movement vectors from 'notes' that respect the movement, sv, note range and interval limits,
+        see enumerate_vecs
+        :param notes:
+        :return:
+        """
+        return enumerate_vecs(
+            notes=notes,
+            moves=self.allowed_moves(),
+            lowest=self.lowest,
+            highest=self.highest,
+            i_min=self.i_min,
+            i_max=self.i_max,
+            sv_min=self.sv_min,
+            sv_max=self.sv_max,
+        )
+
+    @timed("enumeration")
+    def set_new_chords(self, chord: CNChord):
+        """
+        Expand 'chord' to every size within m_min..m_max, and move its voices by every
+        movement vector that can be valid. Partial vectors are pruned as they are built
+        (see enumerate_vecs), rather than enumerating every vector and rejecting most of them afterwards.
+        :param chord:
+        :return:
+        """
+        self.begin_progr = time.time()
+        self.progr_count += 1
+        self.new_chords = []
+        notes = chord.notes
+        exp_count = self.exp_count
+        for target_size in range(max(chord.t_size, self.m_min), self.m_max + 1):
+            for expansion in expansion_indexes.expansions(chord.t_size, target_size):
+                self.exp_count += 1
+                expanded = [notes[i] for i in expansion]
+                for vec in self.movement_vectors(expanded):
+                    self.new_chords.append(
+                        CNChord.from_notes(
+                            notes=[note + move for note, move in zip(expanded, vec)],
+                            ref_chord=chord,
+                        )
+                    )
+        self.c_size = len(self.new_chords)
+        if self.stats is not None:
+            self.stats.count("expansions", self.exp_count - exp_count)
+            self.stats.count("candidates", self.c_size)
 
     def next(self, orig_vec: typing.List[int]):
         """
@@ -333,29 +633,174 @@ class ChordProgressionGenerator(object):
     def set_name(self):
         raise NotImplementedError()
 
-    def set_vec_id(self, cpg: "ChordProgressionGenerator"):
-        raise NotImplementedError()
+    def init_dedup(
+        self,
+        max_exact_keys: typing.Optional[int] = None,
+        false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+    ):
+        """
+        Reset rec_ids and vec_ids.
+        :param max_exact_keys: None to keep every key exactly; otherwise the number of keys after which
+            an index switches to a fixed-size probabilistic filter with the given false positive rate,
+            for long continual runs
+        :param false_positive_rate:
+        :return:
+        """
+        self.rec_ids = DedupIndex(
+            max_exact_keys=max_exact_keys, false_positive_rate=false_positive_rate
+        )
+        self.vec_ids = DedupIndex(
+            max_exact_keys=max_exact_keys, false_positive_rate=false_positive_rate
+        )
+
+    def unique_key(self, chord: CNChord) -> typing.Optional[int]:
+        """
+        Key under which 'chord' counts as a duplicate according to unique_mode:
+        the pitch-class set for RemoveDup, the pitch-class set up to transposition for RemoveDupType.
+        None if duplicates are allowed.
+        :param chord:
+        :return:
+        """
+        if self.unique_mode == UniqueMode.RemoveDup:
+            return set_key(chord.notes_key)
+        if self.unique_mode == UniqueMode.RemoveDupType:
+            return set_type_key(chord.notes_key)
+        return None
 
-    def valid_vec(self, cpg: "ChordProgressionGenerator") -> bool:
-        raise NotImplementedError()
+    @timed("validity")
+    def valid_unique(self, chord: CNChord) -> bool:
+        key = self.unique_key(chord)
+        return key is None or key not in self.rec_ids
+
+    def record_unique(self, chord: CNChord):
+        key = self.unique_key(chord)
+        if key is not None:
+            self.rec_ids.add(key)
+
+    def set_vec_id(self, vec: typing.List[int]):
+        self.vec_id = vec_key(vec)
+
+    @timed("validity")
+    def valid_vec(self) -> bool:
+        return self.vec_id not in self.vec_ids
 
     def valid_sim(self, cpg: "ChordProgressionGenerator") -> bool:
         raise NotImplementedError()
 
-    def sort_results(self, chords: typing.List[CNChord], in_substitution: bool):
-        raise NotImplementedError()
+    @timed("sorting")
+    def sort_results(
+        self,
+        chords: typing.Iterable[CNChord],
+        in_substitution: bool,
+        top_k: typing.Optional[int] = None,
+    ) -> typing.List[CNChord]:
+        """
+        Sort chords by 'sort_order_sub' (in substitution) or 'sort_order', see parse_sort_order
+        :param chords:
+        :param in_substitution:
+        :param top_k: if given, only the first top_k chords are kept,
+        using a bounded heap: O(N log top_k) time and O(top_k) memory
+        :return: sorted chords; equal to the first top_k of the full sort
+        """
+        sort_order = self.sort_order_sub if in_substitution else self.sort_order
+        keys = parse_sort_order(sort_order)
+        if any(name in BIGRAM_SORT_KEYS for name, __ in keys):
+            chords = list(chords)
+            if any(chord.bigram_feature is None for chord in chords):
+                raise ValueError(
+                    f"Sort order '{sort_order}' needs bigram features, "
+                    "which some chords do not have (see analyser.set_param2)"
+                )
+        if top_k is None:
+            return [
+                key.chord
+                for key in sorted(
+                    _SortKey(chord, position, keys)
+                    for position, chord in enumerate(chords)
+                )
+            ]
+
+        if top_k <= 0:
+            return []
+        heap: typing.List[_WorstFirst] = []
+        for position, chord in enumerate(chords):
+            entry = _WorstFirst(_SortKey(chord, position, keys))
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry.key < heap[0].key:
+                heapq.heapreplace(heap, entry)
+        return [key.chord for key in sorted(entry.key for entry in heap)]
 
     def print_single(self):
         raise NotImplementedError()
 
+    def continual_window(self) -> int:
+        """
+        Number of recent chords continual mode needs: enough to look back over every similarity period
+        :return:
+        """
+        if self.enable_sim and self.sim_period:
+            return max(DEFAULT_CONTINUAL_WINDOW, max(self.sim_period) + 1)
+        return DEFAULT_CONTINUAL_WINDOW
+
+    def open_continual_stream(self) -> ContinualStream:
+        """
+        Streaming alternative to keeping every chord in 'record' until print_continual / to_midi:
+        each chord appended to the returned stream is written to
+        output_path / output_name .txt / .mid (according to output_mode) right away,
+        and 'record' becomes the window of the recent chords (see also to_midi).
+        :return:
+        """
+        base_path = os.path.join(self.output_path, self.output_name)
+        stream = ContinualStream(
+            text_path=(
+                base_path + ".txt" if self.output_mode != OutputMode.MidiOnly else None
+            ),
+            midi_path=(
+                base_path + ".mid" if self.output_mode != OutputMode.TextOnly else None
+            ),
+            window=self.continual_window(),
+        )
+        self.record = stream.recent
+        self.continual_stream = stream
+        return stream
+
     def print_continual(self):
         raise NotImplementedError()
 
     def print_end(self):
         raise NotImplementedError()
 
-    def to_midi(self):
-        raise NotImplementedError()
+    @timed("output")
+    def to_midi(self, midi_format: int = 0) -> str:
+        """
+        Write the result to output_path / output_name .mid:
+        the chords in 'record' in continual mode, otherwise each new chord preceded by its antechord.
+        In streaming continual mode (see open_continual_stream) 'record' only holds the last window:
+        the MIDI file the stream writes as chords come is not overwritten, but flushed and its path returned
+        (a Type 0 file, whatever 'midi_format').
+        :param midi_format: 0 or 1
+        :return: path of the MIDI file
+        """
+        if self.continual and self.continual_stream is not None:
+            if self.continual_stream.midi_path is None:
+                raise ValueError(
+                    "The continual stream has no MIDI output (output_mode is TextOnly) "
+                    "and 'record' only holds its last window"
+                )
+            self.continual_stream.flush()
+            return self.continual_stream.midi_path
+        if self.continual:
+            progression = [chord.notes for chord in self.record]
+        else:
+            progression = []
+            for chord in self.new_chords:
+                if chord.ref_chord is not None:
+                    progression.append(chord.ref_chord.notes)
+                progression.append(chord.notes)
+        path = os.path.join(self.output_path, self.output_name) + ".mid"
+        write_midi(path, progression, midi_format=midi_format)
+        return path
 
     def check_initial(self):
         raise NotImplementedError()
@@ -0,0 +1,106 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import collections
+import typing
+
+from .i18n import Language
+from .midi import MidiStreamWriter
+from .models.cnchord import CNChord
+
+DEFAULT_CONTINUAL_WINDOW = 16
+DEFAULT_FLUSH_INTERVAL = 64
+
+
+def format_chord(chord: CNChord, language: typing.Optional[Language] = None) -> str:
+    """
+    Text output of a chord of a continual progression:
+    its notes, then CNChord.__repr__advanced__ (if it has a bigram feature) and __repr__basic__
+    :param chord:
+    :param language: None for the current language, see i18n.get_language
+    :return:
+    """
+    output_str = f"{chord.notes}\n"
+    if chord.bigram_feature is not None:
+        output_str += chord.__repr__advanced__()
+    output_str += chord.__repr__basic__(language)
+    return output_str
+
+
+class ContinualStream(object):
+    """
+    Streaming output of continual mode.
+
+    Every chord is written to the text and / or MIDI output as soon as it is appended,
+    and only the last 'window' chords are kept in 'recent', e.g. for the similarity periods.
+    Memory therefore stays bounded however long the progression grows.
+
+    'recent' holds copies of the appended chords, owned by the stream: the chords passed in
+    are never modified. Each copy refers to the previous copy as its 'ref_chord', and the oldest
+    copy of the window refers to none, so chords that leave the window are not kept alive by it.
+    """
+
+    window: int
+    recent: typing.Deque[CNChord]
+    count: int  # number of chords appended so far
+    flush_interval: int
+    _text_file: typing.Optional[typing.TextIO]
+    midi_path: typing.Optional[str]  # the MIDI output, if any
+    _midi_writer: typing.Optional[MidiStreamWriter]
+
+    def __init__(
+        self,
+        text_path: typing.Optional[str] = None,
+        midi_path: typing.Optional[str] = None,
+        window: int = DEFAULT_CONTINUAL_WINDOW,
+        flush_interval: int = DEFAULT_FLUSH_INTERVAL,
+    ):
+        if window < 1:
+            raise ValueError(f"window must be positive, got {window}")
+        self.window = window
+        self.recent = collections.deque(maxlen=window)
+        self.count = 0
+        self.flush_interval = flush_interval
+        self._text_file = (
+            open(text_path, "w", encoding="utf-8") if text_path is not None else None
+        )
+        self.midi_path = midi_path
+        self._midi_writer = (
+            MidiStreamWriter(midi_path) if midi_path is not None else None
+        )
+
+    def append(self, chord: CNChord):
+        if self._text_file is not None:
+            self._text_file.write(format_chord(chord))
+        if self._midi_writer is not None:
+            self._midi_writer.write_chord(chord.notes)
+        own = chord.copy()
+        own.ref_chord = self.recent[-1] if self.recent else None
+        self.recent.append(own)
+        self.recent[0].ref_chord = None
+        self.count += 1
+        if self.flush_interval and self.count % self.flush_interval == 0:
+            self.flush()
+
+    def flush(self):
+        if self._text_file is not None:
+            self._text_file.flush()
+        if self._midi_writer is not None:
+            self._midi_writer.flush()
+
+    def close(self):
+        if self._text_file is not None:
+            self._text_file.close()
+            self._text_file = None
+        if self._midi_writer is not None:
+            self._midi_writer.close()
+            self._midi_writer = None
+
+    def __enter__(self) -> "ContinualStream":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,297 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import itertools
+import os
+import shutil
+import tempfile
+import typing
+import zipfile
+
+import numpy as np
+
+from .analyser import ProgressionAnalysis, analyse_progression
+from .models.cnchord import CNChord
+
+CORPUS_EXTENSIONS: typing.Tuple[str, ...] = (
+    ".mid",
+    ".midi",
+    ".xml",
+    ".musicxml",
+    ".mxl",
+)
+
+CSV_COLUMNS: typing.Tuple[str, ...] = (
+    "file",
+    "index",
+    "ante_notes",
+    "post_notes",
+    "vec",
+) + ProgressionAnalysis.BIGRAM_COLUMNS
+
+
+class CorpusResult(typing.NamedTuple):
+    """
+    Analysis of one file of the corpus; 'error' is set instead of 'analysis' if the file could not be analysed
+    """
+
+    path: str
+    notes: typing.List[typing.List[int]]  # notes of the extracted chords
+    analysis: typing.Optional[ProgressionAnalysis]
+    error: typing.Optional[str]
+
+
+def iter_corpus_files(
+    directory: str, extensions: typing.Iterable[str] = CORPUS_EXTENSIONS
+) -> typing.Iterator[str]:
+    """
+    MIDI / MusicXML files under 'directory', recursively, in sorted order
+    :param directory:
+    :param extensions:
+    :return:
+    """
+    extensions = tuple(extension.lower() for extension in extensions)
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(extensions):
+                yield os.path.join(root, filename)
+
+
+def extract_chords(path: str) -> typing.List[CNChord]:
+    """
+    Chord sequence of a score: its chordified slices, with rests dropped
+    and repeated slices (e.g. tied notes) merged
+    :param path:
+    :return:
+    """
+    import music21
+
+    score = music21.converter.parse(path)
+    chords = []
+    previous_notes = None
+    for chord in score.chordify().flatten().getElementsByClass("Chord"):
+        notes = sorted(pitch.midi for pitch in chord.pitches)
+        if not notes or notes == previous_notes:
+            continue
+        chords.append(CNChord.from_notes(notes))
+        previous_notes = notes
+    return chords
+
+
+def analyse_file(path: str) -> CorpusResult:
+    try:
+        chords = extract_chords(path)
+        return CorpusResult(
+            path=path,
+            notes=[chord.notes for chord in chords],
+            analysis=analyse_progression(chords),
+            error=None,
+        )
+    except Exception as e:
+        return CorpusResult(path=path, notes=[], analysis=None, error=repr(e))
+
+
+def iter_analyse_corpus(
+    paths: typing.Iterable[str], workers: int = 1
+) -> typing.Iterator[CorpusResult]:
+    """
+    Analyse every file of 'paths', yielding the results in the order of 'paths'.
+    With workers > 1, files are analysed on a process pool with at most 2 * workers files
+    submitted or held at a time, so only a bounded number of results is held at a time
+    and the output does not depend on the number of workers.
+    :param paths:
+    :param workers:
+    :return:
+    """
+    if workers <= 1:
+        for path in paths:
+            yield analyse_file(path)
+        return
+
+    paths = iter(paths)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        # Futures in the order of the paths; the oldest is waited for first,
+        # and a new file is submitted for every result yielded
+        pending = collections.deque(
+            executor.submit(analyse_file, path)
+            for path in itertools.islice(paths, 2 * workers)
+        )
+        while pending:
+            result = pending.popleft().result()
+            path = next(paths, None)
+            if path is not None:
+                pending.append(executor.submit(analyse_file, path))
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class CorpusWriter(object):
+    """
+    Writes the bigram features of analysed files as they come:
+    one CSV row per bigram, appended right away, and each numeric column appended to its own
+    temporary file, which are put together into a .npz on close. No column is held in memory.
+
+    The .npz holds, per bigram: 'file_index' (into 'files'), 'index' (position within its file),
+    every column of ProgressionAnalysis.BIGRAM_COLUMNS, and the movement vectors flattened into
+    'vec' with 'vec_offsets' (vectors of bigram i are vec[vec_offsets[i]:vec_offsets[i + 1]]).
+    Files that failed are listed in 'errors' with their error in 'error_messages'.
+    """
+
+    NPZ_COLUMNS: typing.Tuple[str, ...] = (
+        "file_index",
+        "index",
+        "vec",
+        "vec_offsets",
+    ) + ProgressionAnalysis.BIGRAM_COLUMNS
+
+    csv_path: str
+    npz_path: str
+    files: typing.List[str]
+    errors: typing.List[typing.Tuple[str, str]]
+    num_bigrams: int
+    _csv_file: typing.TextIO
+    _csv_writer: typing.Any
+    _column_files: typing.Dict[str, typing.BinaryIO]  # raw data of each .npz column
+    _column_sizes: typing.Dict[str, int]
+    _num_moves: int
+
+    def __init__(self, csv_path: str, npz_path: str):
+        self.csv_path = csv_path
+        self.npz_path = npz_path
+        self.files = []
+        self.errors = []
+        self.num_bigrams = 0
+        self._csv_file = open(csv_path, "w", newline="", encoding="utf-8")
+        self._csv_writer = csv.writer(self._csv_file)
+        self._csv_writer.writerow(CSV_COLUMNS)
+        self._column_files = {
+            name: tempfile.TemporaryFile() for name in self.NPZ_COLUMNS
+        }
+        self._column_sizes = {name: 0 for name in self.NPZ_COLUMNS}
+        self._num_moves = 0
+        self._append("vec_offsets", [0])
+
+    @staticmethod
+    def column_dtype(name: str) -> np.dtype:
+        return np.dtype(np.float64 if name == "sv" else np.int64)
+
+    def _append(self, name: str, values: typing.Any):
+        values = np.asarray(values, dtype=self.column_dtype(name))
+        self._column_files[name].write(values.tobytes())
+        self._column_sizes[name] += len(values)
+
+    def write(self, result: CorpusResult):
+        if result.error is not None:
+            self.errors.append((result.path, result.error))
+            return
+        analysis = result.analysis
+        file_index = len(self.files)
+        self.files.append(result.path)
+        size = len(analysis)
+        columns = [getattr(analysis, name) for name in analysis.BIGRAM_COLUMNS]
+        for i in range(size):
+            self._csv_writer.writerow(
+                [
+                    result.path,
+                    i,
+                    " ".join(map(str, result.notes[i])),
+                    " ".join(map(str, result.notes[i + 1])),
+                    " ".join(map(str, analysis.vec[i])),
+                ]
+                + [column[i].item() for column in columns]
+            )
+        self._append("file_index", np.full(size, file_index))
+        self._append("index", np.arange(size))
+        self._append("vec", [move for vec in analysis.vec for move in vec])
+        vec_offsets = self._num_moves + np.cumsum([len(vec) for vec in analysis.vec])
+        self._append("vec_offsets", vec_offsets)
+        if size:
+            self._num_moves = int(vec_offsets[-1])
+        for name, column in zip(analysis.BIGRAM_COLUMNS, columns):
+            self._append(name, column)
+        self.num_bigrams += size
+
+    def close(self):
+        if self._csv_file.closed:
+            return
+        self._csv_file.close()
+        # The layout np.savez writes: one uncompressed .npy member per array
+        with zipfile.ZipFile(self.npz_path, "w", allowZip64=True) as npz:
+            for name in self.NPZ_COLUMNS:
+                with npz.open(name + ".npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array_header_1_0(
+                        f,
+                        {
+                            "descr": np.lib.format.dtype_to_descr(
+                                self.column_dtype(name)
+                            ),
+                            "fortran_order": False,
+                            "shape": (self._column_sizes[name],),
+                        },
+                    )
+                    column_file = self._column_files[name]
+                    column_file.seek(0)
+                    shutil.copyfileobj(column_file, f)
+                    column_file.close()
+            for name, values in (
+                ("files", self.files),
+                ("errors", [path for path, __ in self.errors]),
+                ("error_messages", [error for __, error in self.errors]),
+            ):
+                with npz.open(name + ".npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(
+                        f, np.array(values, dtype=str), allow_pickle=False
+                    )
+
+    def __enter__(self) -> "CorpusWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def analyse_corpus(
+    directory: str, output_prefix: str, workers: int = 1
+) -> CorpusWriter:
+    """
+    Analyse every MIDI / MusicXML file under 'directory' and write the bigram features
+    to output_prefix .csv and .npz, see CorpusWriter
+    :param directory:
+    :param output_prefix:
+    :param workers: number of processes
+    :return: the closed writer, e.g. for its 'files', 'errors' and 'num_bigrams'
+    """
+    with CorpusWriter(output_prefix + ".csv", output_prefix + ".npz") as writer:
+        for result in iter_analyse_corpus(iter_corpus_files(directory), workers):
+            writer.write(result)
+    return writer
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Analyse the chord progressions of a directory of MIDI / MusicXML files"
+    )
+    parser.add_argument("directory")
+    parser.add_argument("output_prefix", help="writes OUTPUT_PREFIX.csv and .npz")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    writer = analyse_corpus(args.directory, args.output_prefix, args.workers)
+    print(
+        f"{len(writer.files)} files, {writer.num_bigrams} bigrams, {len(writer.errors)} errors"
+    )
+    for path, error in writer.errors:
+        print(f"{path}: {error}")
+
+
+if __name__ == "__main__":
+    main()
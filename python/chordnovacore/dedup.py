@@ -0,0 +1,225 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import hashlib
+import math
+import typing
+
+from .models.cnnotes import CNNotes
+from .pitchclassset import get_pitch_class_set_table
+
+DEFAULT_FALSE_POSITIVE_RATE = 0.001
+DEFAULT_BLOOM_CAPACITY = 1 << 20
+
+"""
+Canonical integer keys.
+A movement vector is packed into a single int, one fixed-width digit per movement
+behind a leading 1, so that vectors of different lengths never share a key.
+"""
+
+MOVE_BITS = 8
+MOVE_OFFSET = 1 << (MOVE_BITS - 1)
+
+
+def vec_key(vec: typing.Iterable[int]) -> int:
+    """
+    vec_id; key of a movement vector
+    :param vec: movements, each within [-128, 127]
+    :return:
+    """
+    key = 1
+    for move in vec:
+        if not -MOVE_OFFSET <= move < MOVE_OFFSET:
+            raise ValueError(
+                f"movement {move} is out of range [{-MOVE_OFFSET}, {MOVE_OFFSET - 1}]"
+            )
+        key = (key << MOVE_BITS) | (move + MOVE_OFFSET)
+    return key
+
+
+def set_key(notes: CNNotes) -> int:
+    """
+    set_id; key of the pitch-class set, i.e. its bitmask
+    :param notes:
+    :return:
+    """
+    return notes.pitch_class_mask
+
+
+def set_type_key(notes: CNNotes) -> int:
+    """
+    Key shared by all 12 transpositions of the pitch-class set.
+    It replaces the comparison against 'rec_id', the set_id of every transposition.
+    :param notes:
+    :return:
+    """
+    return int(get_pitch_class_set_table().transposition_class[notes.pitch_class_mask])
+
+
+class BloomFilter(object):
+    """
+    Fixed-size set of integer keys answering 'key in filter' with no false negatives.
+
+    Sized for 'capacity' keys at 'false_positive_rate':
+        num_bits = -capacity * ln(false_positive_rate) / ln(2) ^ 2
+        num_hashes = num_bits / capacity * ln(2)
+    Beyond 'capacity' keys the filter keeps working, with a growing false positive rate,
+    see estimated_false_positive_rate.
+    """
+
+    capacity: int
+    false_positive_rate: float
+    num_bits: int
+    num_hashes: int
+    count: int  # number of keys added, including keys that were already present
+    _bits: bytearray
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_BLOOM_CAPACITY,
+        false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+    ):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(
+                f"false_positive_rate must be within (0, 1), got {false_positive_rate}"
+            )
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(
+            8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: int) -> typing.Iterator[int]:
+        # Double hashing: position i = h1 + i * h2
+        digest = hashlib.blake2b(
+            key.to_bytes((key.bit_length() + 8) // 8, "little", signed=True),
+            digest_size=16,
+        ).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: int):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        for position in self._positions(key):
+            if not self._bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def estimated_false_positive_rate(self) -> float:
+        """
+        (1 - e ^ (-num_hashes * count / num_bits)) ^ num_hashes
+        :return:
+        """
+        return (
+            1 - math.exp(-self.num_hashes * self.count / self.num_bits)
+        ) ** self.num_hashes
+
+
+class DedupIndex(object):
+    """
+    Set of integer keys, used to skip chords and movement vectors that were already generated.
+
+    Keys are kept in a hash set. If 'max_exact_keys' is given, once the set would grow beyond it
+    all keys move into a BloomFilter sized for 'bloom_capacity' keys at 'false_positive_rate',
+    and the memory stays fixed from then on. A false positive makes a new key look
+    already seen, i.e. a chord is skipped although it is new; a repeated key is never let through.
+    """
+
+    max_exact_keys: typing.Optional[int]
+    bloom_capacity: int
+    false_positive_rate: float
+    _keys: typing.Optional[typing.Set[int]]
+    _bloom: typing.Optional[BloomFilter]
+
+    def __init__(
+        self,
+        max_exact_keys: typing.Optional[int] = None,
+        bloom_capacity: int = DEFAULT_BLOOM_CAPACITY,
+        false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+    ):
+        if max_exact_keys is not None and max_exact_keys < 0:
+            raise ValueError(
+                f"max_exact_keys must be None or non-negative, got {max_exact_keys}"
+            )
+        self.max_exact_keys = max_exact_keys
+        self.bloom_capacity = bloom_capacity
+        self.false_positive_rate = false_positive_rate
+        self._keys = set()
+        self._bloom = None
+
+    @property
+    def exact(self) -> bool:
+        """
+        False once the index has switched to the probabilistic filter
+        :return:
+        """
+        return self._bloom is None
+
+    def add(self, key: int):
+        if self._bloom is not None:
+            self._bloom.add(key)
+            return
+        if (
+            self.max_exact_keys is not None
+            and len(self._keys) >= self.max_exact_keys
+            and key not in self._keys
+        ):
+            self._bloom = BloomFilter(self.bloom_capacity, self.false_positive_rate)
+            for existing_key in self._keys:
+                self._bloom.add(existing_key)
+            self._bloom.add(key)
+            self._keys = None
+            return
+        self._keys.add(key)
+
+    def add_if_new(self, key: int) -> bool:
+        """
+        Add 'key'; return whether it was not in the index before
+        :param key:
+        :return:
+        """
+        if key in self:
+            return False
+        self.add(key)
+        return True
+
+    def __contains__(self, key: int) -> bool:
+        if self._bloom is not None:
+            return key in self._bloom
+        return key in self._keys
+
+    def __len__(self) -> int:
+        """
+        Number of keys; once probabilistic, the number of keys added
+        :return:
+        """
+        if self._bloom is not None:
+            return self._bloom.count
+        return len(self._keys)
+
+    def false_positive_rate_estimate(self) -> float:
+        if self._bloom is None:
+            return 0.0
+        return self._bloom.estimated_false_positive_rate()
+
+    def clear(self):
+        self._keys = set()
+        self._bloom = None
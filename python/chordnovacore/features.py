@@ -0,0 +1,417 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import typing
+
+import numpy as np
+
+from .functions import CacheInfo, LRUCache
+from .models.cnchordfeature import CNChordFeature
+from .models.cnnotes import CNNotes
+from .runstats import timed_function
+
+if typing.TYPE_CHECKING:
+    from .featurestore import FeatureStore
+
+DEFAULT_FEATURE_CACHE_SIZE = 4096
+
+"""
+Tension of an interval, indexed by its size in semitones modulo 12.
+Unison / perfect fifth < major third = perfect fourth = minor sixth < minor third = major sixth
+< major second = minor seventh < tritone < major seventh < minor second
+"""
+INTERVAL_TENSION: typing.Tuple[int, ...] = (0, 6, 3, 2, 1, 1, 4, 0, 1, 2, 3, 5)
+
+"""
+Hindemith's ranking of intervals (in semitones modulo 12) for finding the root of a chord,
+from the strongest to the weakest, together with whether the root is the lower note of the interval.
+The tritone has no root.
+"""
+ROOT_INTERVALS: typing.Tuple[typing.Tuple[int, bool], ...] = (
+    (7, True),  # perfect fifth
+    (5, False),  # perfect fourth
+    (4, True),  # major third
+    (8, False),  # minor sixth
+    (3, True),  # minor third
+    (9, False),  # major sixth
+    (2, False),  # major second
+    (10, True),  # minor seventh
+    (1, False),  # minor second
+    (11, True),  # major seventh
+)
+
+
+def get_self_diff(notes: typing.Sequence[int]) -> typing.List[int]:
+    """
+    d; intervals between adjacent notes (L -> H)
+    :param notes: sorted notes
+    :return:
+    """
+    return [notes[i + 1] - notes[i] for i in range(len(notes) - 1)]
+
+
+def get_count_vec(pitch_classes: typing.Sequence[int]) -> typing.List[int]:
+    """
+    vec; interval vector of the note set,
+    i.e. the number of interval classes 1 - 6 formed by pairs of pitch classes
+    :param pitch_classes: pitch classes without duplication
+    :return:
+    """
+    count_vec = [0] * 6
+    for i in range(len(pitch_classes)):
+        for j in range(i + 1, len(pitch_classes)):
+            interval = (pitch_classes[j] - pitch_classes[i]) % 12
+            count_vec[min(interval, 12 - interval) - 1] += 1
+    return count_vec
+
+
+def get_tension(notes: typing.Sequence[int]) -> float:
+    """
+    t; sum of INTERVAL_TENSION over all pairs of notes
+    :param notes: sorted notes
+    :return:
+    """
+    tension = 0
+    for i in range(len(notes)):
+        for j in range(i + 1, len(notes)):
+            tension += INTERVAL_TENSION[(notes[j] - notes[i]) % 12]
+    return float(tension)
+
+
+def get_thickness(notes: typing.Sequence[int]) -> float:
+    """
+    h; how densely the chord doubles its pitch classes.
+    Every pair of notes of the same pitch class contributes 1 / (number of octaves between them),
+    a unison counting as one octave.
+    :param notes: sorted notes
+    :return:
+    """
+    thickness = 0.0
+    for i in range(len(notes)):
+        for j in range(i + 1, len(notes)):
+            interval = notes[j] - notes[i]
+            if interval % 12 == 0:
+                thickness += 1.0 / max(1, interval // 12)
+    return thickness
+
+
+def get_root(notes: typing.Sequence[int]) -> int:
+    """
+    r; pitch class of the root, found with Hindemith's method:
+    the root of the strongest interval in the chord; if it appears more than once, the lowest one.
+    Chords without any rooted interval take the bass as root.
+    :param notes: sorted notes
+    :return: -1 for an empty chord, as PitchClassSetTable.root of the empty set
+    """
+    if not notes:
+        return -1
+    best_rank = len(ROOT_INTERVALS)
+    root = notes[0] % 12
+    for i in range(len(notes)):
+        for j in range(i + 1, len(notes)):
+            interval = (notes[j] - notes[i]) % 12
+            for rank in range(best_rank):
+                if ROOT_INTERVALS[rank][0] == interval:
+                    best_rank = rank
+                    root = (notes[i] if ROOT_INTERVALS[rank][1] else notes[j]) % 12
+                    break
+    return root
+
+
+def get_g_center(notes: typing.Sequence[int]) -> int:
+    """
+    g; position of the average note within the range of the chord, in %
+    :param notes: sorted notes
+    :return: 50 if the chord has no range, i.e. a single pitch or no note at all
+    """
+    if not notes or notes[-1] == notes[0]:
+        return 50
+    return round(100 * (sum(notes) / len(notes) - notes[0]) / (notes[-1] - notes[0]))
+
+
+def get_span(pitch_classes: typing.Sequence[int]) -> int:
+    """
+    s; length of the shortest arc of the circle of fifths containing all pitch classes
+    :param pitch_classes: pitch classes without duplication
+    :return: 0 for an empty set
+    """
+    return get_span_sspan(pitch_classes)[0]
+
+
+def get_single_chroma(note: int) -> int:
+    """
+    Position of the pitch class of 'note' on the circle of fifths, within -5 (Db) .. 6 (F#), C being 0
+    :param note: a note, or an integer array of notes
+    :return:
+    """
+    return 6 - (5 * (note % 12) + 6) % 12
+
+
+def get_span_sspan(notes: typing.Sequence[int]) -> typing.Tuple[int, int]:
+    """
+    span: length of the shortest arc of the circle of fifths holding every note;
+    sspan: among the shortest arcs, the smallest range on the line of fifths
+    covering both the arc and the original positions.
+
+    Candidate arcs are the unrotated positions (range o[-1] - o[0]) and, for each gap
+    between sorted positions o[i - 1] and o[i], the arc that starts at o[i],
+    i.e. 12 - (o[i] - o[i - 1]), which can be unwrapped either way:
+    upwards, covering o[0] .. o[i - 1] + 12, or downwards, covering o[i] - 12 .. o[-1].
+    This is the result of the rotations in the original C++ implementation of set_span,
+    found in a single pass over the sorted positions.
+    :param notes: notes or pitch classes
+    :return: (span, sspan), (0, 0) for an empty chord
+    """
+    if not notes:
+        return 0, 0
+    positions = sorted(get_single_chroma(note) for note in notes)
+    first, last = positions[0], positions[-1]
+    span = last - first
+    sspan = span
+    for i in range(1, len(positions)):
+        diff1 = positions[i - 1] + 12 - positions[i]
+        diff2 = min(positions[i - 1] + 12 - first, last - positions[i] + 12)
+        if diff1 < span:
+            span, sspan = diff1, diff2
+        elif diff1 == span:
+            sspan = min(sspan, diff2)
+    return span, sspan
+
+
+"""
+Batched versions of the functions above.
+Each of them takes an (N, n) integer array of N chords of n notes, every row sorted (L -> H),
+and returns an (N,) array with exactly the value the scalar function would return for each row.
+"""
+
+
+def _pair_indexes(size: int) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    All pairs (i, j), i < j, in the order of the nested loops of the scalar functions
+    :param size:
+    :return:
+    """
+    lower, upper = np.triu_indices(size, k=1)
+    return lower, upper
+
+
+def batch_tension(notes: np.ndarray) -> np.ndarray:
+    lower, upper = _pair_indexes(notes.shape[1])
+    intervals = (notes[:, upper] - notes[:, lower]) % 12
+    return np.asarray(INTERVAL_TENSION)[intervals].sum(axis=1).astype(np.float64)
+
+
+def batch_thickness(notes: np.ndarray) -> np.ndarray:
+    lower, upper = _pair_indexes(notes.shape[1])
+    intervals = notes[:, upper] - notes[:, lower]
+    weights = np.where(intervals % 12 == 0, 1.0 / np.maximum(1, intervals // 12), 0.0)
+    # Accumulate pair by pair, so that floating point rounding follows the scalar loop
+    thickness = np.zeros(notes.shape[0], dtype=np.float64)
+    for k in range(weights.shape[1]):
+        thickness += weights[:, k]
+    return thickness
+
+
+def batch_span_sspan(notes: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    get_span_sspan of each row of an (N, n) array of notes
+    :param notes:
+    :return: (span, sspan), both (N,)
+    """
+    no_candidate = np.iinfo(np.int64).max
+    positions = np.sort(get_single_chroma(notes.astype(np.int64)), axis=1)
+    first = positions[:, :1]
+    last = positions[:, -1:]
+    unrotated = (last - first)[:, 0]
+    diff1 = positions[:, :-1] + 12 - positions[:, 1:]
+    diff2 = np.minimum(positions[:, :-1] + 12 - first, last - positions[:, 1:] + 12)
+    span = np.minimum(unrotated, diff1.min(axis=1, initial=no_candidate))
+    sspan = np.minimum(
+        np.where(unrotated == span, unrotated, no_candidate),
+        np.where(diff1 == span[:, None], diff2, no_candidate).min(
+            axis=1, initial=no_candidate
+        ),
+    )
+    return span, sspan
+
+
+_ROOT_RANK = np.full(12, len(ROOT_INTERVALS), dtype=np.int8)
+_ROOT_IS_LOWER = np.zeros(12, dtype=bool)
+for _rank, (_interval, _is_lower) in enumerate(ROOT_INTERVALS):
+    _ROOT_RANK[_interval] = _rank
+    _ROOT_IS_LOWER[_interval] = _is_lower
+
+
+def batch_root(notes: np.ndarray) -> np.ndarray:
+    lower, upper = _pair_indexes(notes.shape[1])
+    root = notes[:, 0] % 12
+    if len(lower) == 0:
+        return root
+    intervals = (notes[:, upper] - notes[:, lower]) % 12
+    ranks = _ROOT_RANK[intervals]
+    # argmin returns the first pair of the strongest interval, as the scalar loop does
+    best = np.argmin(ranks, axis=1)
+    rows = np.arange(notes.shape[0])
+    best_interval = intervals[rows, best]
+    root_note = np.where(
+        _ROOT_IS_LOWER[best_interval],
+        notes[rows, lower[best]],
+        notes[rows, upper[best]],
+    )
+    return np.where(ranks[rows, best] < len(ROOT_INTERVALS), root_note % 12, root)
+
+
+def batch_g_center(notes: np.ndarray) -> np.ndarray:
+    lowest = notes[:, 0].astype(np.float64)
+    note_range = notes[:, -1] - notes[:, 0]
+    average = notes.sum(axis=1) / notes.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        g_center = np.round(100 * (average - lowest) / note_range)
+    return np.where(note_range == 0, 50, g_center).astype(np.int64)
+
+
+"""
+Optional precomputed features, see featurestore.load_feature_store
+"""
+_feature_store: typing.Optional["FeatureStore"] = None
+
+
+def set_feature_store(store: typing.Optional["FeatureStore"]):
+    """
+    :param store: None to compute every feature
+    :return:
+    """
+    global _feature_store
+    _feature_store = store
+
+
+def get_feature_store() -> typing.Optional["FeatureStore"]:
+    return _feature_store
+
+
+@timed_function("features")
+def batch_unigram_features(notes: np.ndarray) -> typing.Dict[str, np.ndarray]:
+    """
+    tension, thickness, root and g_center of (N, n) sorted notes,
+    read from the feature store where it covers the row, computed otherwise
+    :param notes:
+    :return:
+    """
+    covered = np.zeros(notes.shape[0], dtype=bool)
+    stored = None
+    if _feature_store is not None:
+        covered, stored = _feature_store.lookup_batch(notes)
+    kernels = {
+        "tension": batch_tension,
+        "thickness": batch_thickness,
+        "root": batch_root,
+        "g_center": batch_g_center,
+    }
+    if covered.all():
+        return {name: stored[name] for name in kernels}
+    missing = ~covered
+    columns = {}
+    for name, kernel in kernels.items():
+        computed = kernel(notes[missing])
+        column = np.empty(notes.shape[0], dtype=computed.dtype)
+        column[missing] = computed
+        if stored is not None:
+            column[covered] = stored[name][covered]
+        columns[name] = column
+    return columns
+
+
+@timed_function("features")
+def calculate_chord_feature(notes: CNNotes) -> CNChordFeature:
+    """
+    Unigram features of a chord, i.e. those that depend on the chord itself only
+
+    See also
+        void Chord::set_param1();
+    in original C++ implementation
+    :param notes:
+    :return:
+    """
+    pitch_classes = notes.pitch_classes
+    feature = CNChordFeature()
+    stored = _feature_store.lookup(notes.notes) if _feature_store is not None else None
+    if stored is not None:
+        for name, value in stored.items():
+            setattr(feature, name, value)
+    else:
+        feature.s_size = len(pitch_classes)
+        feature.tension = get_tension(notes)
+        feature.thickness = get_thickness(notes)
+        feature.root = get_root(notes)
+        feature.g_center = get_g_center(notes)
+        feature.span = get_span(pitch_classes)
+    feature.count_vec = get_count_vec(pitch_classes)
+    feature.self_diff = get_self_diff(notes)
+    return feature
+
+
+"""
+Process-wide cache of unigram features keyed by CNNotes.
+The cached CNChordFeature objects are shared and must not be modified.
+"""
+_feature_cache = LRUCache(maxsize=DEFAULT_FEATURE_CACHE_SIZE)
+
+
+def get_chord_feature(notes: CNNotes) -> CNChordFeature:
+    return _feature_cache.get_or_compute(notes, lambda: calculate_chord_feature(notes))
+
+
+"""
+Each unigram feature that can be computed on its own, e.g. to sort chords by one of them
+without computing the others
+"""
+UNIGRAM_FEATURE_FUNCTIONS: typing.Dict[str, typing.Callable[[CNNotes], typing.Any]] = {
+    "s_size": lambda notes: len(notes.pitch_classes),
+    "tension": get_tension,
+    "thickness": get_thickness,
+    "root": get_root,
+    "g_center": get_g_center,
+    "span": lambda notes: get_span(notes.pitch_classes),
+}
+
+"""
+Process-wide cache of single unigram features keyed by (CNNotes, name), see get_unigram_feature
+"""
+_unigram_feature_cache = LRUCache(maxsize=DEFAULT_FEATURE_CACHE_SIZE)
+
+
+def get_unigram_feature(notes: CNNotes, name: str) -> typing.Any:
+    """
+    A single unigram feature (see UNIGRAM_FEATURE_FUNCTIONS): read from the cached CNChordFeature
+    if all features of 'notes' are computed already, otherwise computed alone
+    :param notes:
+    :param name:
+    :return:
+    """
+    feature = _feature_cache.peek(notes)
+    if feature is not None:
+        return getattr(feature, name)
+    return _unigram_feature_cache.get_or_compute(
+        (notes, name), lambda: UNIGRAM_FEATURE_FUNCTIONS[name](notes)
+    )
+
+
+def set_feature_cache_size(maxsize: typing.Optional[int]):
+    """
+    :param maxsize: None for unbounded, 0 to disable caching
+    :return:
+    """
+    _feature_cache.maxsize = maxsize
+    _unigram_feature_cache.maxsize = maxsize
+
+
+def feature_cache_info() -> CacheInfo:
+    return _feature_cache.info()
+
+
+def clear_feature_cache():
+    _feature_cache.clear()
+    _unigram_feature_cache.clear()
@@ -0,0 +1,288 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import argparse
+import itertools
+import math
+import struct
+import typing
+
+import numpy as np
+
+from .features import (
+    batch_g_center,
+    batch_root,
+    batch_tension,
+    batch_thickness,
+    set_feature_store,
+)
+from .pitchclassset import NUM_PITCH_CLASSES, get_pitch_class_set_table
+
+FEATURE_STORE_MAGIC = b"CNFS"
+FEATURE_STORE_VERSION = 1
+DEFAULT_BUILD_CHUNK_SIZE = 1 << 16
+
+"""
+On-disk layout of a feature store:
+    header (HEADER_SIZE bytes): magic, version, lowest, highest, m_min, m_max, little endian
+    records: one RECORD_DTYPE per note set of m_min..m_max distinct notes within lowest..highest
+
+Records of each size follow those of the smaller sizes; within a size, a note set
+c_0 < c_1 < ... < c_{m-1} (counted from 'lowest') is at its rank in the combinatorial number system,
+sum(comb(c_i, i + 1)), so a lookup is an arithmetic computation and needs no index.
+"""
+
+HEADER_FORMAT = "<4sIiiii"
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("tension", "<f8"),
+        ("thickness", "<f8"),
+        ("s_size", "i1"),
+        ("root", "i1"),
+        ("g_center", "i1"),
+        ("span", "i1"),
+    ]
+)
+
+STORED_FEATURES: typing.Tuple[str, ...] = (
+    "s_size",
+    "tension",
+    "thickness",
+    "root",
+    "g_center",
+    "span",
+)
+
+
+class FeatureStore(object):
+    """
+    Read-only, memory-mapped unigram features of every note set of m_min..m_max distinct notes
+    within lowest..highest. The file is mapped, not read, so processes opening the same file
+    share its pages; pickling a FeatureStore only passes its path.
+    """
+
+    path: str
+    lowest: int
+    highest: int
+    m_min: int
+    m_max: int
+    records: np.ndarray
+    _offsets: typing.Dict[int, int]  # first record of each size
+    _binomial: np.ndarray  # _binomial[n, k] = comb(n, k)
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a feature store")
+        magic, version, lowest, highest, m_min, m_max = struct.unpack_from(
+            HEADER_FORMAT, header
+        )
+        if magic != FEATURE_STORE_MAGIC:
+            raise ValueError(f"{path} is not a feature store")
+        if version != FEATURE_STORE_VERSION:
+            raise ValueError(
+                f"{path} is a feature store of version {version}, expected {FEATURE_STORE_VERSION}"
+            )
+        self._set_range(lowest, highest, m_min, m_max)
+        self.records = np.memmap(
+            path,
+            dtype=RECORD_DTYPE,
+            mode="r",
+            offset=HEADER_SIZE,
+            shape=(self._offsets[m_max + 1],),
+        )
+
+    def _set_range(self, lowest: int, highest: int, m_min: int, m_max: int):
+        self.lowest = lowest
+        self.highest = highest
+        self.m_min = m_min
+        self.m_max = m_max
+        num_notes = highest - lowest + 1
+        self._binomial = np.array(
+            [[math.comb(n, k) for k in range(m_max + 1)] for n in range(num_notes + 1)],
+            dtype=np.int64,
+        )
+        self._offsets = {m_min: 0}
+        for size in range(m_min, m_max + 1):
+            self._offsets[size + 1] = self._offsets[size] + math.comb(num_notes, size)
+
+    def __reduce__(self):
+        return FeatureStore, (self.path,)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def covers(self, lowest: int, highest: int, m_min: int, m_max: int) -> bool:
+        return (
+            self.lowest <= lowest
+            and highest <= self.highest
+            and self.m_min <= m_min
+            and m_max <= self.m_max
+        )
+
+    def indexes(self, notes: np.ndarray) -> np.ndarray:
+        """
+        :param notes: (N, m) sorted notes
+        :return: (N,) record index of each row, -1 for rows the store does not cover
+            (out of range, wrong size or repeated notes)
+        """
+        notes = np.asarray(notes, dtype=np.int64)
+        size = notes.shape[1]
+        if not self.m_min <= size <= self.m_max:
+            return np.full(notes.shape[0], -1, dtype=np.int64)
+        positions = notes - self.lowest
+        covered = (positions[:, 0] >= 0) & (notes[:, -1] <= self.highest)
+        if size > 1:
+            covered &= np.all(np.diff(positions, axis=1) > 0, axis=1)
+        positions = np.where(covered[:, None], positions, 0)
+        ranks = self._binomial[positions, np.arange(1, size + 1)].sum(axis=1)
+        return np.where(covered, self._offsets[size] + ranks, -1)
+
+    def index(self, notes: typing.Sequence[int]) -> int:
+        if not notes:
+            return -1
+        return int(self.indexes(np.asarray([notes]))[0])
+
+    def lookup_batch(
+        self, notes: np.ndarray
+    ) -> typing.Tuple[np.ndarray, typing.Dict[str, np.ndarray]]:
+        """
+        :param notes: (N, m) sorted notes
+        :return: (covered, columns): covered is an (N,) mask,
+            columns[name] the stored feature of each row (meaningless where not covered)
+        """
+        indexes = self.indexes(notes)
+        covered = indexes >= 0
+        records = self.records[np.where(covered, indexes, 0)]
+        return covered, {name: records[name] for name in STORED_FEATURES}
+
+    def lookup(
+        self, notes: typing.Sequence[int]
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        :param notes: sorted notes
+        :return: the stored features, or None if the store does not cover 'notes'
+        """
+        index = self.index(notes)
+        if index < 0:
+            return None
+        record = self.records[index]
+        return {name: record[name].item() for name in STORED_FEATURES}
+
+
+def calculate_stored_features(
+    notes: np.ndarray,
+) -> typing.Dict[str, np.ndarray]:
+    """
+    The stored features of (N, m) sorted notes, with the batched kernels of features.py
+    :param notes:
+    :return:
+    """
+    table = get_pitch_class_set_table()
+    masks = np.bitwise_or.reduce(1 << (notes % NUM_PITCH_CLASSES), axis=1)
+    return {
+        "s_size": table.cardinality[masks],
+        "tension": batch_tension(notes),
+        "thickness": batch_thickness(notes),
+        "root": batch_root(notes),
+        "g_center": batch_g_center(notes),
+        "span": table.span[masks],
+    }
+
+
+def build_feature_store(
+    path: str,
+    lowest: int,
+    highest: int,
+    m_min: int,
+    m_max: int,
+    chunk_size: int = DEFAULT_BUILD_CHUNK_SIZE,
+) -> FeatureStore:
+    """
+    Precompute the features of every note set of m_min..m_max distinct notes within lowest..highest
+    into the file 'path', 'chunk_size' note sets at a time
+    :param path:
+    :param lowest:
+    :param highest:
+    :param m_min:
+    :param m_max:
+    :param chunk_size:
+    :return: the store, opened for reading
+    """
+    if not 1 <= m_min <= m_max:
+        raise ValueError(f"Expect 1 <= m_min <= m_max, got {m_min}, {m_max}")
+    if not 0 <= lowest <= highest <= 127:
+        raise ValueError(
+            f"Expect 0 <= lowest <= highest <= 127, got {lowest}, {highest}"
+        )
+    layout = FeatureStore.__new__(FeatureStore)
+    layout._set_range(lowest, highest, m_min, m_max)
+    with open(path, "wb") as f:
+        header = struct.pack(
+            HEADER_FORMAT,
+            FEATURE_STORE_MAGIC,
+            FEATURE_STORE_VERSION,
+            lowest,
+            highest,
+            m_min,
+            m_max,
+        )
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+    records = np.memmap(
+        path,
+        dtype=RECORD_DTYPE,
+        mode="r+",
+        offset=HEADER_SIZE,
+        shape=(layout._offsets[m_max + 1],),
+    )
+    for size in range(m_min, m_max + 1):
+        combinations = itertools.combinations(range(lowest, highest + 1), size)
+        while True:
+            chunk = list(itertools.islice(combinations, chunk_size))
+            if not chunk:
+                break
+            notes = np.array(chunk, dtype=np.int64)
+            indexes = layout.indexes(notes)
+            for name, column in calculate_stored_features(notes).items():
+                records[name][indexes] = column
+    records.flush()
+    del records
+    return FeatureStore(path)
+
+
+def load_feature_store(path: str) -> FeatureStore:
+    """
+    Open the feature store 'path' and make features.get_chord_feature and substitution read from it
+    :param path:
+    :return:
+    """
+    store = FeatureStore(path)
+    set_feature_store(store)
+    return store
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Precompute the unigram features of candidate chords into a feature store"
+    )
+    parser.add_argument("path")
+    parser.add_argument("--lowest", type=int, required=True)
+    parser.add_argument("--highest", type=int, required=True)
+    parser.add_argument("--m-min", type=int, required=True)
+    parser.add_argument("--m-max", type=int, required=True)
+    args = parser.parse_args(argv)
+    store = build_feature_store(
+        args.path, args.lowest, args.highest, args.m_min, args.m_max
+    )
+    print(f"{len(store)} note sets written to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
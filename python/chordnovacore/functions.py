@@ -1,7 +1,13 @@
 import typing
+import collections
 import itertools
+import math
 from math import comb, floor
 
+import numpy as np
+
+from .tablecache import get_table_cache
+
 MAX_SUPPORTED_NUM_NOTES = 15
 MAX_NUM_EXPANSIONS = comb(
     MAX_SUPPORTED_NUM_NOTES, floor((MAX_SUPPORTED_NUM_NOTES - 1) / 2.0)
@@ -36,8 +42,221 @@ expansion_indexes[3][5][5] = [0, 1, 2, 2, 2]
 However, expansion_indexes itself has nothing to do with music - 
 it is simply a cache of all possibilities of ways of choosing m_max items so that all m_min types of items are present
 in the solution.
+
+expansion_indexes is an ExpansionTable: each expansion_indexes[min][max] is a read-only int8 array
+of shape (comb(max - 1, min - 1), max), built the first time the (min, max) pair is accessed
+(or mapped from the table cache, see tablecache).
+Beyond MAX_SUPPORTED_NUM_NOTES, where the table would be too large, single expansions can still be
+unranked (ExpansionTable.unrank) and all of them iterated lazily (ExpansionTable.iter_expansions),
+in the same order.
 """
-expansion_indexes: typing.List[typing.List[typing.List[typing.List[int]]]] = []
+
+
+class ExpansionTable(object):
+    """
+    Lazily built replacement of the nested list returned by initialize_expansion_indexes.
+
+    The nested list pads every (min, max) pair to MAX_NUM_EXPANSIONS x MAX_SUPPORTED_NUM_NOTES
+    boxed ints; here we only keep one tight int8 array per (min, max) pair that has actually been used.
+    """
+
+    def __init__(self, max_num_notes: int = MAX_SUPPORTED_NUM_NOTES):
+        self.max_num_notes = max_num_notes
+        self._tables: typing.Dict[typing.Tuple[int, int], np.ndarray] = {}
+
+    def get(self, _min: int, _max: int) -> np.ndarray:
+        """
+        :param _min: size of the chord to be expanded
+        :param _max: target size
+        :return: read-only int8 array of shape (comb(_max - 1, _min - 1), _max)
+        """
+        key = (_min, _max)
+        table = self._tables.get(key)
+        if table is None:
+            if not 1 <= _min <= _max <= self.max_num_notes:
+                raise IndexError(
+                    f"expansion from {_min} to {_max} notes is not supported "
+                    f"(max_num_notes is {self.max_num_notes})"
+                )
+            cache = get_table_cache()
+            if cache is None:
+                table = build_expansion_table(_min, _max)
+            else:
+                table = cache.get_or_build(
+                    f"expansion_{_min}_{_max}",
+                    lambda: build_expansion_table(_min, _max),
+                )
+            self._tables[key] = table
+        return table
+
+    def __getitem__(self, _min: int) -> "_ExpansionTableRow":
+        return _ExpansionTableRow(self, _min)
+
+    def expansions(self, _min: int, _max: int) -> typing.Iterable[typing.Sequence[int]]:
+        """
+        All expansions from _min to _max notes: the table within max_num_notes,
+        lazily generated beyond it
+        :param _min:
+        :param _max:
+        :return:
+        """
+        if _max <= self.max_num_notes:
+            return self.get(_min, _max)
+        return self.iter_expansions(_min, _max)
+
+    def expansion(self, _min: int, _max: int, index: int) -> typing.Sequence[int]:
+        """
+        expansion_indexes[_min][_max][index], unranked beyond max_num_notes
+        :param _min:
+        :param _max:
+        :param index:
+        :return:
+        """
+        if _max <= self.max_num_notes:
+            return self.get(_min, _max)[index]
+        return self.unrank(_min, _max, index)
+
+    @staticmethod
+    def num_expansions(_min: int, _max: int) -> int:
+        if not 1 <= _min <= _max:
+            raise IndexError(f"cannot expand {_min} notes to {_max} notes")
+        return comb(_max - 1, _min - 1)
+
+    @staticmethod
+    def unrank(_min: int, _max: int, index: int) -> typing.List[int]:
+        """
+        expansion_indexes[_min][_max][index], computed in O(_max) without any table, for any size.
+
+        Row 'index' of the reversed order is the combination of rank num_expansions - 1 - index
+        (in lexicographic order) of the _min - 1 gaps chosen among the _max - 1 gaps,
+        found with the combinatorial number system: gap g is taken if the rank is below the number
+        of combinations starting with g, otherwise those combinations are skipped.
+        :param _min:
+        :param _max:
+        :param index:
+        :return:
+        """
+        num_expansions = ExpansionTable.num_expansions(_min, _max)
+        if not 0 <= index < num_expansions:
+            raise IndexError(
+                f"expansion {index} out of range for {_min} to {_max} notes ({num_expansions} expansions)"
+            )
+        rank = num_expansions - 1 - index
+        remaining = _min - 1  # gaps left to choose
+        expansion = [0] * _max
+        if remaining == 0:
+            return expansion
+        # count = comb(a, remaining - 1), the number of combinations starting with gap 'gap',
+        # where a = _max - 1 - gap is the number of gaps after it; kept up to date incrementally
+        a = _max - 2
+        count = comb(a, remaining - 1)
+        value = 0
+        for gap in range(1, _max):
+            if rank < count:
+                value += 1
+                remaining -= 1
+                if remaining == 0:
+                    for slot in range(gap, _max):
+                        expansion[slot] = value
+                    break
+                count = count * remaining // a  # comb(a - 1, remaining - 1)
+            else:
+                rank -= count
+                count = count * (a - remaining + 1) // a  # comb(a - 1, remaining - 1)
+            a -= 1
+            expansion[gap] = value
+        return expansion
+
+    @staticmethod
+    def iter_expansions(_min: int, _max: int) -> typing.Iterator[typing.List[int]]:
+        """
+        All expansions from _min to _max notes, in the order of expansion_indexes[_min][_max],
+        generated one at a time without any table, for any size.
+
+        The reversed order steps each combination of gaps to its lexicographic predecessor:
+        the last gap that can move down by one does so, and the gaps after it move up as far as possible.
+        :param _min:
+        :param _max:
+        :return:
+        """
+        ExpansionTable.num_expansions(_min, _max)  # validates the sizes
+        k = _min - 1
+        gaps = list(range(_max - k, _max))  # the last combination
+        while True:
+            expansion = [0] * _max
+            value = 0
+            for gap in gaps:
+                value += 1
+                expansion[gap] = value
+            for slot in range(1, _max):
+                expansion[slot] = max(expansion[slot], expansion[slot - 1])
+            yield expansion
+            i = k - 1
+            while i >= 0 and gaps[i] - 1 <= (gaps[i - 1] if i > 0 else 0):
+                i -= 1
+            if i < 0:
+                return
+            gaps[i] -= 1
+            for j in range(i + 1, k):
+                gaps[j] = _max - k + j
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the arrays built so far, in bytes
+        :return:
+        """
+        return sum(table.nbytes for table in self._tables.values())
+
+    def __len__(self) -> int:
+        """
+        Number of (min, max) pairs built so far
+        :return:
+        """
+        return len(self._tables)
+
+    def clear(self):
+        self._tables.clear()
+
+
+class _ExpansionTableRow(object):
+    """
+    Keeps the expansion_indexes[min][max][i] access pattern working
+    """
+
+    __slots__ = ("_table", "_min")
+
+    def __init__(self, table: ExpansionTable, _min: int):
+        self._table = table
+        self._min = _min
+
+    def __getitem__(self, _max: int) -> np.ndarray:
+        return self._table.get(self._min, _max)
+
+
+def build_expansion_table(_min: int, _max: int) -> np.ndarray:
+    """
+    Build all expansions of a chord of size '_min' to size '_max', in the same (reversed) order
+    as initialize_expansion_indexes.
+
+    Each expansion chooses _min - 1 gaps out of the _max - 1 gaps between slots;
+    slot j then takes the index of the number of chosen gaps at or before j.
+    :param _min:
+    :param _max:
+    :return:
+    """
+    gaps = np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(1, _max), _min - 1)),
+        dtype=np.int8,
+    ).reshape(comb(_max - 1, _min - 1), _min - 1)
+    slots = np.arange(_max, dtype=np.int8)
+    table = (gaps[:, :, None] <= slots[None, None, :]).sum(axis=1, dtype=np.int8)
+    table = np.ascontiguousarray(table[::-1])  # Reverse the order
+    table.setflags(write=False)
+    return table
+
+
+expansion_indexes: ExpansionTable = ExpansionTable()
 
 
 def different_name(str1: str, str2: str) -> bool:
@@ -156,6 +375,89 @@ def initialize_expansion_indexes() -> typing.List[
     return ret_expansion_indexes
 
 
+def min_cost_expansion(
+    source: typing.List[int], target: typing.List[int]
+) -> typing.Tuple[typing.List[int], int]:
+    """
+    Dynamic-programming counterpart of scanning expansion_indexes[len(source)][len(target)]:
+    among all expansions of 'source' to the size of 'target', find the one that minimizes
+    sum(abs(target[j] - source[expansion[j]])) in O(len(source) * len(target)).
+
+    The expansions in expansion_indexes are sorted in lexicographically ascending order,
+    so ties are resolved to the lexicographically smallest expansion,
+    which is the one a sequential scan with a strict comparison would keep.
+
+    :param source: m items, m <= n
+    :param target: n items
+    :return: (expansion, cost)
+    """
+    m, n = len(source), len(target)
+    if not 1 <= m <= n:
+        raise ValueError(f"cannot expand {m} items to {n} items")
+    # cost[j][i]: minimal cost of slots j..n-1 given that slot j takes source[i];
+    # slot j can take source[i] only if i <= j and the remaining slots can still reach m - 1
+    inf = math.inf
+    cost = [[inf] * m for _ in range(n)]
+    cost[n - 1][m - 1] = abs(target[n - 1] - source[m - 1])
+    for j in range(n - 2, -1, -1):
+        next_cost = cost[j + 1]
+        row = cost[j]
+        for i in range(max(0, m - n + j), min(j, m - 1) + 1):
+            best = next_cost[i]
+            if i + 1 < m and next_cost[i + 1] < best:
+                best = next_cost[i + 1]
+            row[i] = abs(target[j] - source[i]) + best
+
+    # Walk forward, staying on the same source item whenever that is still optimal
+    expansion = [0] * n
+    i = 0
+    for j in range(1, n):
+        if i + 1 < m and cost[j][i + 1] < cost[j][i]:
+            i += 1
+        expansion[j] = i
+    return expansion, cost[0][0]
+
+
+def batch_min_cost_expansion(
+    source: np.ndarray, target: np.ndarray
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched version of min_cost_expansion.
+    The leading dimensions of 'source' and 'target' are broadcast against each other,
+    e.g. one source of shape (m,) against many targets of shape (N, n).
+    :param source: (..., m)
+    :param target: (..., n), m <= n
+    :return: (expansion, cost) of shapes (..., n) and (...)
+    """
+    m, n = source.shape[-1], target.shape[-1]
+    if not 1 <= m <= n:
+        raise ValueError(f"cannot expand {m} items to {n} items")
+    source = source.astype(np.int64, copy=False)
+    target = target.astype(np.int64, copy=False)
+    lead = np.broadcast_shapes(source.shape[:-1], target.shape[:-1])
+    inf = (
+        np.iinfo(np.int64).max // 4
+    )  # large enough, yet adding two of them won't overflow
+
+    cost = np.full(lead + (n, m + 1), inf, dtype=np.int64)  # column m is a sentinel
+    cost[..., n - 1, m - 1] = np.abs(target[..., n - 1] - source[..., m - 1])
+    for j in range(n - 2, -1, -1):
+        lo, hi = max(0, m - n + j), min(j, m - 1) + 1
+        best = np.minimum(cost[..., j + 1, lo:hi], cost[..., j + 1, lo + 1 : hi + 1])
+        cost[..., j, lo:hi] = (
+            np.abs(target[..., j, np.newaxis] - source[..., lo:hi]) + best
+        )
+
+    expansion = np.zeros(lead + (n,), dtype=np.int64)
+    i = np.zeros(lead + (1,), dtype=np.int64)
+    for j in range(1, n):
+        stay = np.take_along_axis(cost[..., j, :], i, axis=-1)
+        move = np.take_along_axis(cost[..., j, :], i + 1, axis=-1)
+        i = np.where(move < stay, i + 1, i)
+        expansion[..., j] = i[..., 0]
+    return expansion, cost[..., 0, 0]
+
+
 def intersect(
     A: typing.List[int], B: typing.List[int], regular: bool
 ) -> typing.List[int]:
@@ -174,6 +476,118 @@ def get_union(A: typing.List[int], B: typing.List[int]) -> typing.List[int]:
     :param B:
     :return:
     """
-    ret = list(set.union(set(A), set(B)))
-    sorted(ret)
-    return ret
+    return sorted(set.union(set(A), set(B)))
+
+
+class CacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: typing.Optional[int]
+    currsize: int
+
+
+class LRUCache(object):
+    """
+    Bounded least-recently-used cache with hit / miss / eviction counters.
+
+    Unlike functools.lru_cache, it is keyed explicitly, can be resized at runtime
+    and counts evictions, so that its size can be tuned for a workload.
+    maxsize = None means unbounded; maxsize = 0 disables caching.
+    """
+
+    def __init__(self, maxsize: typing.Optional[int] = 128):
+        self._data: "collections.OrderedDict[typing.Hashable, typing.Any]" = (
+            collections.OrderedDict()
+        )
+        self._maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self) -> typing.Optional[int]:
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize: typing.Optional[int]):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError(f"maxsize must be None or non-negative, got {maxsize}")
+        self._maxsize = maxsize
+        self._evict()
+
+    def _evict(self):
+        if self._maxsize is None:
+            return
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """
+        The cached value of 'key', without counting a hit or a miss or refreshing the entry
+        :param key:
+        :param default:
+        :return:
+        """
+        return self._data.get(key, default)
+
+    def put(self, key: typing.Hashable, value: typing.Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._evict()
+
+    def get_or_compute(
+        self, key: typing.Hashable, compute: typing.Callable[[], typing.Any]
+    ) -> typing.Any:
+        """
+        Return the cached value of 'key', calling 'compute' and caching its result on a miss
+        :param key:
+        :param compute:
+        :return:
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            self.put(key, value)
+            return value
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            maxsize=self._maxsize,
+            currsize=len(self._data),
+        )
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters
+        :return:
+        """
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._data
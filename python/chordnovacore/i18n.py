@@ -15,6 +15,7 @@ class Statement(enum.Enum):
     INITIAL_CHORD = 1
     ANTE_CHORD = 2
     POST_CHORD = 3
+    ROOT = 4
 
 
 def set_langauge(language: Language) -> bool:
@@ -33,11 +34,13 @@ _data = {
         Statement.INITIAL_CHORD: "Initial chord",
         Statement.ANTE_CHORD: "Antechord",
         Statement.POST_CHORD: "Postchord",
+        Statement.ROOT: "Root",
     },
     Language.Chinese: {
         Statement.INITIAL_CHORD: "起始和弦",
         Statement.ANTE_CHORD: "前和弦",
         Statement.POST_CHORD: "后和弦",
+        Statement.ROOT: "根音",
     },
 }
 
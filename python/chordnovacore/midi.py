@@ -0,0 +1,266 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import struct
+import typing
+
+DEFAULT_TICKS_PER_BEAT = 480
+DEFAULT_TEMPO_BPM = 60
+DEFAULT_BEATS_PER_CHORD = 2
+DEFAULT_VELOCITY = 80
+
+"""
+Standard MIDI File (SMF) chunks and events, written directly as bytes
+"""
+
+END_OF_TRACK = b"\x00\xff\x2f\x00"  # delta time 0, meta event 0x2F
+
+
+def variable_length(value: int) -> bytes:
+    """
+    Variable-length quantity: 7 bits per byte, most significant first,
+    the high bit set on every byte but the last
+    :param value:
+    :return:
+    """
+    if value < 0:
+        raise ValueError(f"variable-length quantity must be non-negative, got {value}")
+    buffer = [value & 0x7F]
+    value >>= 7
+    while value:
+        buffer.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(buffer))
+
+
+def header_chunk(midi_format: int, num_tracks: int, ticks_per_beat: int) -> bytes:
+    return b"MThd" + struct.pack(">IHHH", 6, midi_format, num_tracks, ticks_per_beat)
+
+
+def tempo_event(bpm: float) -> bytes:
+    microseconds_per_beat = round(60_000_000 / bpm)
+    return b"\x00\xff\x51\x03" + microseconds_per_beat.to_bytes(3, "big")
+
+
+def chord_events(
+    notes: typing.Sequence[int],
+    duration: int,
+    velocity: int = DEFAULT_VELOCITY,
+    channel: int = 0,
+    delay: int = 0,
+) -> bytes:
+    """
+    Note-on of all notes after 'delay' ticks, then their note-offs 'duration' ticks later
+    :param notes:
+    :param duration: in ticks
+    :param velocity:
+    :param channel:
+    :param delay: in ticks, since the previous event
+    :return:
+    """
+    if not notes:
+        return b""
+    events = bytearray()
+    for i, note in enumerate(notes):
+        events += variable_length(delay if i == 0 else 0)
+        events += bytes((0x90 | channel, note, velocity))
+    for i, note in enumerate(notes):
+        events += variable_length(duration if i == 0 else 0)
+        events += bytes((0x80 | channel, note, 0))
+    return bytes(events)
+
+
+def track_chunk(events: bytes) -> bytes:
+    """
+    MTrk chunk of 'events', closed with an end-of-track event
+    :param events:
+    :return:
+    """
+    return (
+        b"MTrk"
+        + struct.pack(">I", len(events) + len(END_OF_TRACK))
+        + events
+        + END_OF_TRACK
+    )
+
+
+def progression_events(
+    progression: typing.Iterable[typing.Sequence[int]],
+    duration: int,
+    velocity: int = DEFAULT_VELOCITY,
+    channel: int = 0,
+) -> bytes:
+    """
+    Events of the chords of 'progression' played one after another, each for 'duration' ticks.
+    An empty chord is a rest.
+    :param progression: notes of each chord
+    :param duration: in ticks
+    :param velocity:
+    :param channel:
+    :return:
+    """
+    events = bytearray()
+    rest = 0
+    for notes in progression:
+        if not notes:
+            rest += duration
+            continue
+        events += chord_events(notes, duration, velocity, channel, delay=rest)
+        rest = 0
+    return bytes(events)
+
+
+def encode_midi(
+    progression: typing.Iterable[typing.Sequence[int]],
+    midi_format: int = 0,
+    ticks_per_beat: int = DEFAULT_TICKS_PER_BEAT,
+    bpm: float = DEFAULT_TEMPO_BPM,
+    beats_per_chord: float = DEFAULT_BEATS_PER_CHORD,
+    velocity: int = DEFAULT_VELOCITY,
+    channel: int = 0,
+) -> bytes:
+    """
+    Bytes of a MIDI file playing 'progression'.
+    Type 0 puts the tempo and the notes in a single track;
+    Type 1 puts the tempo in a conductor track followed by a track of the notes.
+    :param progression: notes of each chord
+    :param midi_format: 0 or 1
+    :param ticks_per_beat:
+    :param bpm:
+    :param beats_per_chord:
+    :param velocity:
+    :param channel:
+    :return:
+    """
+    notes = progression_events(
+        progression, round(beats_per_chord * ticks_per_beat), velocity, channel
+    )
+    if midi_format == 0:
+        return header_chunk(0, 1, ticks_per_beat) + track_chunk(
+            tempo_event(bpm) + notes
+        )
+    if midi_format == 1:
+        return (
+            header_chunk(1, 2, ticks_per_beat)
+            + track_chunk(tempo_event(bpm))
+            + track_chunk(notes)
+        )
+    raise ValueError(f"Unsupported MIDI format {midi_format}, expected 0 or 1")
+
+
+def write_midi(
+    path: str, progression: typing.Iterable[typing.Sequence[int]], **kwargs
+) -> int:
+    """
+    Write 'progression' to the MIDI file 'path'; kwargs as in encode_midi
+    :param path:
+    :param progression:
+    :param kwargs:
+    :return: number of bytes written
+    """
+    data = encode_midi(progression, **kwargs)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def write_midi_batch(
+    progressions: typing.Iterable[
+        typing.Tuple[str, typing.Iterable[typing.Sequence[int]]]
+    ],
+    **kwargs,
+) -> int:
+    """
+    Write many progressions to many files, one at a time, so only one encoded file is held in memory
+    :param progressions: (path, progression) pairs
+    :param kwargs: as in encode_midi
+    :return: number of files written
+    """
+    count = 0
+    for path, progression in progressions:
+        write_midi(path, progression, **kwargs)
+        count += 1
+    return count
+
+
+class MidiStreamWriter(object):
+    """
+    Writes a single-track (Type 0) MIDI file chord by chord, without keeping the chords in memory.
+
+    The track length in the header is only known at the end; it is patched, together with
+    a provisional end-of-track event, on every flush, so the file on disk is a valid
+    MIDI file after each flush and not just after close.
+    An empty chord is a rest, delaying the next chord, as in progression_events.
+    """
+
+    ticks_per_beat: int
+    duration: int  # ticks per chord
+    velocity: int
+    channel: int
+    num_chords: int
+    _file: typing.BinaryIO
+    _track_start: int  # file position of the first byte of the track data
+    _track_length: int  # bytes of track data written, without the end-of-track event
+    _rest: int  # ticks of the rests since the last chord, written as the delay of the next one
+
+    def __init__(
+        self,
+        path: str,
+        ticks_per_beat: int = DEFAULT_TICKS_PER_BEAT,
+        bpm: float = DEFAULT_TEMPO_BPM,
+        beats_per_chord: float = DEFAULT_BEATS_PER_CHORD,
+        velocity: int = DEFAULT_VELOCITY,
+        channel: int = 0,
+    ):
+        self.ticks_per_beat = ticks_per_beat
+        self.duration = round(beats_per_chord * ticks_per_beat)
+        self.velocity = velocity
+        self.channel = channel
+        self.num_chords = 0
+        self._file = open(path, "wb")
+        self._file.write(header_chunk(0, 1, ticks_per_beat))
+        self._file.write(b"MTrk\x00\x00\x00\x00")
+        self._track_start = self._file.tell()
+        self._track_length = 0
+        self._rest = 0
+        self._write(tempo_event(bpm))
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._track_length += len(data)
+
+    def write_chord(self, notes: typing.Sequence[int]):
+        self.num_chords += 1
+        if not notes:
+            self._rest += self.duration
+            return
+        self._write(
+            chord_events(
+                notes, self.duration, self.velocity, self.channel, delay=self._rest
+            )
+        )
+        self._rest = 0
+
+    def flush(self):
+        position = self._file.tell()
+        self._file.write(END_OF_TRACK)
+        self._file.seek(self._track_start - 4)
+        self._file.write(struct.pack(">I", self._track_length + len(END_OF_TRACK)))
+        self._file.flush()
+        # The next chord overwrites the provisional end-of-track event
+        self._file.seek(position)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "MidiStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
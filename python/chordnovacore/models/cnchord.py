@@ -6,12 +6,17 @@ Port to Python by osbertngok
 
 import typing
 import enum
-import music21
 
 from .cnchordfeature import CNChordFeature, CNChordBigramFeature
+from .cnnotes import CNNotes
+from ..features import get_chord_feature, get_unigram_feature
+from ..pitchclassset import get_pitch_class_set_table
 from ..i18n import Statement, Language, _
 from ..functions import different_name
 
+if typing.TYPE_CHECKING:
+    import music21
+
 
 class OverflowState(enum.Enum):
     NoOverflow = 0
@@ -35,40 +40,24 @@ class CNChord:
         1. Attempt to utilize music21 to avoid re-inventing the wheels
         2. It only contains model information;
            generation logics are separated into a standalone module.
+        3. Notes are held by an immutable CNNotes;
+           the music21 chord is only built when it is needed.
     """
 
     """
     Deliberately not using inheritance here but for no obvious reason
     """
-    _chord: music21.chord.Chord
+    _notes: CNNotes
     _voice_leading_max: int  # Range of Movement, refers to Chord.vlmax
 
-    s_size: int  # m; size of note_set
-    tension: float  # t
-    thickness: float  # h
-    root: int  # r
-    g_center: int  # g
-
-    span: int  # s
-    sspan: int  # ss
-    similarity: int  # x
-
     _chroma_old: float  # kk
 
     chroma: float  # k
     Q_indicator: float  # Q
-    common_note: int  # c
-    sv: int  # sv, Σvec
 
     overflow_state: OverflowState
 
     hide_octave: bool
-    name: str  # name of each note in the chord
-    name_with_octave: str  # name and octave of each note in the chord
-
-    vec: typing.List[int]  # v
-    self_diff: typing.List[int]  # d
-    count_vec: typing.List[int]  # vec
 
     """
     This is to replace prev_chroma_old
@@ -78,11 +67,22 @@ class CNChord:
     """
     We want to make evaluation lazy. Evaluation won't be triggered
     until property is accessed.
+    Unigram features (s_size, tension, thickness, root, g_center, span, count_vec, self_diff)
+    are materialized on first access, through a process-wide cache keyed by the notes.
+    """
+    _feature: typing.Optional[CNChordFeature]
+
+    """
+    Features of the progression from 'ref_chord' to this chord
+    (vec, sv, common_note, similarity, sspan), see analyser.set_param2
     """
-    _dirty: bool
+    bigram_feature: typing.Optional[CNChordBigramFeature]
 
     def __init__(self):
-        self._chord = music21.chord.Chord()
+        self._notes = CNNotes()
+        self._feature = None
+        self.bigram_feature = None
+        self.ref_chord = None
 
     @staticmethod
     def from_notes(
@@ -97,7 +97,7 @@ class CNChord:
         :return:
         """
         ret = CNChord()
-        ret._chord = music21.chord.Chord(notes)
+        ret._notes = CNNotes(notes)
         if ref_chord is not None:
             ret.ref_chord = ref_chord
         return ret
@@ -110,17 +110,35 @@ class CNChord:
         :return:
         """
         ret = CNChord()
-        ret._chord = music21.chord.Chord(self._chord.pitches)
+        ret._notes = self._notes  # immutable, so it can be shared
+        ret._feature = self._feature
+        ret.bigram_feature = self.bigram_feature
         ret.ref_chord = self.ref_chord
         return ret
 
+    @property
+    def _chord(self) -> "music21.chord.Chord":
+        """
+        The equivalent music21 chord, built on first access
+        :return:
+        """
+        return self._notes.music21_chord
+
+    @property
+    def notes_key(self) -> CNNotes:
+        """
+        Hashable, immutable view of the notes of this chord
+        :return:
+        """
+        return self._notes
+
     @property
     def set_id(self) -> int:
         """
         an integer representing 'note_set'; unique for different 'note_set's
         Assign a unique id for each pitch set (according to set theory)
         Because music21 has an implementation of forteClass already,
-        let's use that instead.
+        let's use that instead, read from the precomputed PitchClassSetTable.
 
         See also
             int& get_set_id();
@@ -128,7 +146,9 @@ class CNChord:
         :return:
         """
         # See also: https://web.mit.edu/music21/doc/moduleReference/moduleChord.html#music21.chord.Chord.chordTablesAddress
-        return self._chord.chordTablesAddress.forteClass
+        return int(
+            get_pitch_class_set_table().forte_class[self._notes.pitch_class_mask]
+        )
 
     @property
     def voice_leading_max(self) -> int:
@@ -185,8 +205,9 @@ class CNChord:
 
     def __repr__advanced__(self) -> str:
         output_str = ""
-        output_str += f"k = {self.chroma}, "
-        output_str += f"kk = {self.chroma_old - self.prev_chroma_old}, "
+        if hasattr(self, "chroma"):  # only once set_chroma has been applied
+            output_str += f"k = {self.chroma}, "
+            output_str += f"kk = {self.chroma_old - self.prev_chroma_old}, "
         output_str += f"c = {self.common_note}, "
         output_str += f"ss = {self.sspan}, "
         output_str += f"sv = {self.sv}, "
@@ -225,12 +246,9 @@ class CNChord:
     def notes(self) -> typing.List[int]:
         """
         always regarded as a sorted (L -> H) vector
-        TODO: materialize this so we do not need to call list comprehension and sorted function
         :return:
         """
-        ret = [p.midi for p in self._chord.pitches]
-        sorted(ret)
-        return ret
+        return list(self._notes.notes)
 
     @property
     def t_size(self) -> int:
@@ -238,14 +256,154 @@ class CNChord:
         n; size of notes
         :return:
         """
-        return len(self._chord.notes)
+        return len(self._notes)
+
+    @property
+    def name(self) -> str:
+        """
+        name of each note in the chord
+        :return:
+        """
+        return " ".join(p.name for p in self._chord.pitches)
+
+    @property
+    def name_with_octave(self) -> str:
+        """
+        name and octave of each note in the chord
+        :return:
+        """
+        return " ".join(p.nameWithOctave for p in self._chord.pitches)
 
     def materialize_chord_feature(self) -> CNChordFeature:
-        raise NotImplementedError()
+        """
+        See also
+            void set_param1();
+        in original C++ implementation
+        :return: unigram features of this chord; shared with other chords of the same notes,
+        so it must not be modified
+        """
+        if self._feature is None:
+            self._feature = get_chord_feature(self._notes)
+        return self._feature
+
+    def unigram_feature(self, name: str) -> typing.Any:
+        """
+        A single unigram feature, without materializing the others unless they already are,
+        see features.get_unigram_feature
+        :param name: e.g. "tension"
+        :return:
+        """
+        if self._feature is not None:
+            return getattr(self._feature, name)
+        return get_unigram_feature(self._notes, name)
+
+    @property
+    def s_size(self) -> int:
+        """
+        m; size of note_set
+        :return:
+        """
+        return self.materialize_chord_feature().s_size
+
+    @property
+    def tension(self) -> float:
+        """
+        t
+        :return:
+        """
+        return self.materialize_chord_feature().tension
+
+    @property
+    def thickness(self) -> float:
+        """
+        h
+        :return:
+        """
+        return self.materialize_chord_feature().thickness
+
+    @property
+    def root(self) -> int:
+        """
+        r
+        :return:
+        """
+        return self.materialize_chord_feature().root
+
+    @property
+    def g_center(self) -> int:
+        """
+        g
+        :return:
+        """
+        return self.materialize_chord_feature().g_center
+
+    @property
+    def span(self) -> int:
+        """
+        s
+        :return:
+        """
+        return self.materialize_chord_feature().span
+
+    @property
+    def count_vec(self) -> typing.List[int]:
+        """
+        vec
+        :return:
+        """
+        return self.materialize_chord_feature().count_vec
+
+    @property
+    def self_diff(self) -> typing.List[int]:
+        """
+        d
+        :return:
+        """
+        return self.materialize_chord_feature().self_diff
 
     def calculate_chord_bigram_feature(self) -> CNChordBigramFeature:
         raise NotImplementedError()
 
+    @property
+    def vec(self) -> typing.List[int]:
+        """
+        v
+        :return:
+        """
+        return self.bigram_feature.vec
+
+    @property
+    def sv(self) -> int:
+        """
+        sv, Σvec
+        :return:
+        """
+        return self.bigram_feature.sv
+
+    @property
+    def common_note(self) -> int:
+        """
+        c
+        :return:
+        """
+        return self.bigram_feature.common_note
+
+    @property
+    def similarity(self) -> int:
+        """
+        x
+        :return:
+        """
+        return self.bigram_feature.similarity
+
+    @property
+    def sspan(self) -> int:
+        """
+        ss
+        :return:
+        """
+        return self.bigram_feature.sspan
+
     def print_initial(self, language: Language):
         """
         c++: ChordData::printInitial(Language language)
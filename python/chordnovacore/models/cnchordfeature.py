@@ -4,11 +4,18 @@ ChordNova v3.0 [Build: 2021.1.14]
 Port to Python by osbertngok
 """
 
+import typing
+
+
 class CNChordFeature(object):
 
     sim_origin: int
     s_size: int  # m; size of note_set
     tension: float  # t
+    thickness: float  # h
+    g_center: int  # g
+    count_vec: typing.List[int]  # vec
+    self_diff: typing.List[int]  # d
     chroma: float  # k
     root: int  # r
     span: int  # s
@@ -19,4 +26,13 @@ class CNChordFeature(object):
 
 
 class CNChordBigramFeature(object):
-    common_note: int  # c
\ No newline at end of file
+    vec: typing.List[int]  # v
+    sv: int  # sv, Σvec
+    ascending_count: int
+    steady_count: int
+    descending_count: int
+    root_movement: int
+    common_note: int  # c
+    similarity: int  # x
+    span: int  # s
+    sspan: int  # ss
@@ -0,0 +1,97 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import typing
+
+
+class CNNotes(object):
+    """
+    Immutable, hashable value type holding the notes of a chord
+    as a sorted (L -> H) tuple of MIDI note numbers.
+
+    It is the lightweight core of CNChord: creating, copying, comparing and hashing it
+    never touches music21. The music21 chord is only built on first access
+    of 'music21_chord', i.e. when names or MIDI export need it.
+    """
+
+    __slots__ = ("_notes", "_hash", "_music21_chord")
+
+    _notes: typing.Tuple[int, ...]
+    _hash: int
+    _music21_chord: typing.Any  # music21.chord.Chord, built lazily
+
+    def __init__(self, notes: typing.Iterable[int] = ()):
+        _notes = tuple(sorted(int(note) for note in notes))
+        object.__setattr__(self, "_notes", _notes)
+        object.__setattr__(self, "_hash", hash(_notes))
+        object.__setattr__(self, "_music21_chord", None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @property
+    def notes(self) -> typing.Tuple[int, ...]:
+        return self._notes
+
+    @property
+    def pitch_classes(self) -> typing.Tuple[int, ...]:
+        """
+        sorted pitch classes without duplication
+        :return:
+        """
+        return tuple(sorted(set(note % 12 for note in self._notes)))
+
+    @property
+    def pitch_class_mask(self) -> int:
+        """
+        bitmask of the pitch classes, bit p being set if pitch class p is present
+        :return:
+        """
+        mask = 0
+        for note in self._notes:
+            mask |= 1 << (note % 12)
+        return mask
+
+    @property
+    def music21_chord(self):
+        """
+        The equivalent music21.chord.Chord, built on first access.
+        It is shared by all CNChords holding this CNNotes and must not be modified.
+        :return:
+        """
+        if self._music21_chord is None:
+            import music21
+
+            object.__setattr__(
+                self, "_music21_chord", music21.chord.Chord(list(self._notes))
+            )
+        return self._music21_chord
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def __iter__(self) -> typing.Iterator[int]:
+        return iter(self._notes)
+
+    def __getitem__(self, index):
+        return self._notes[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CNNotes):
+            return self._notes == other._notes
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"CNNotes({list(self._notes)})"
+
+    def __reduce__(self):
+        return CNNotes, (self._notes,)
@@ -0,0 +1,238 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import typing
+
+import numpy as np
+
+from .features import batch_root, get_span
+from .tablecache import get_table_cache
+
+NUM_PITCH_CLASSES = 12
+NUM_PITCH_CLASS_SETS = 1 << NUM_PITCH_CLASSES
+C5_MIDI = 72  # music21.pitch.Pitch("C5").midi
+
+BASE_TABLES: typing.Tuple[str, ...] = (
+    "cardinality",
+    "transposition_class",
+    "interval_vector",
+    "root",
+    "span",
+)
+FORTE_TABLES: typing.Tuple[str, ...] = ("forte_class", "inversion", "prime_form")
+
+"""
+A pitch-class set is represented by its bitmask: bit p is set if pitch class p is present.
+e.g. C E G -> 0b000010010001 = 145
+
+PitchClassSetTable holds, for all 2^12 bitmasks, the facts that only depend on the pitch-class set,
+so that looking them up is an array indexing instead of a set-theory computation.
+Entry 0 (the empty set) is kept so that the bitmask can be used as index directly; its values are all 0.
+"""
+
+
+def pitch_classes_to_mask(pitch_classes: typing.Iterable[int]) -> int:
+    mask = 0
+    for pitch_class in pitch_classes:
+        mask |= 1 << (pitch_class % NUM_PITCH_CLASSES)
+    return mask
+
+
+def mask_to_pitch_classes(mask: int) -> typing.Tuple[int, ...]:
+    return tuple(p for p in range(NUM_PITCH_CLASSES) if mask >> p & 1)
+
+
+def transpose_mask(mask: int, interval: int) -> int:
+    """
+    Rotate the bitmask so that pitch class p becomes p + interval
+    :param mask:
+    :param interval:
+    :return:
+    """
+    interval %= NUM_PITCH_CLASSES
+    full = NUM_PITCH_CLASS_SETS - 1
+    return ((mask << interval) | (mask >> (NUM_PITCH_CLASSES - interval))) & full
+
+
+class PitchClassSetTable(object):
+    """
+    All arrays are indexed by bitmask.
+
+    notes: the pitch-class set voiced from C5 upwards, as generated by sub_library
+    cardinality: number of pitch classes
+    forte_class: Forte index number within the cardinality,
+        as music21.chord.Chord.chordTablesAddress.forteClass
+    inversion: 1 (A), -1 (B) or 0 (symmetric under inversion), as in music21
+    prime_form: bitmask of the prime form
+    transposition_class: the smallest bitmask among the 12 transpositions,
+        i.e. equal for two sets if and only if one is a transposition of the other
+    interval_vector: (NUM_PITCH_CLASS_SETS, 6) interval-class vector
+    root: pitch class of the root of 'notes', see features.get_root; -1 for the empty set
+    span: span on the circle of fifths, see features.get_span
+
+    forte_class, inversion and prime_form come from music21's Forte tables; they are
+    only built (and music21 only imported) the first time one of them is accessed.
+    """
+
+    notes: typing.List[typing.Tuple[int, ...]]
+    cardinality: np.ndarray
+    transposition_class: np.ndarray
+    interval_vector: np.ndarray
+    root: np.ndarray
+    span: np.ndarray
+    _forte_class: typing.Optional[np.ndarray]
+    _inversion: typing.Optional[np.ndarray]
+    _prime_form: typing.Optional[np.ndarray]
+
+    def __init__(self):
+        self.notes = [
+            tuple(C5_MIDI + p for p in mask_to_pitch_classes(mask))
+            for mask in range(NUM_PITCH_CLASS_SETS)
+        ]
+        for name, array in _load_or_build(BASE_TABLES, self._build_base_tables).items():
+            setattr(self, name, array)
+        self._forte_class = None
+        self._inversion = None
+        self._prime_form = None
+
+    def _build_base_tables(self) -> typing.Dict[str, np.ndarray]:
+        masks = np.arange(NUM_PITCH_CLASS_SETS, dtype=np.int64)
+        cardinality = _popcount(masks).astype(np.int8)
+        rotations = np.stack([_rotate(masks, i) for i in range(NUM_PITCH_CLASSES)])
+        transposition_class = rotations.min(axis=0).astype(np.int16)
+        # Interval class i counts the pairs of pitch classes i semitones apart;
+        # the tritone pairs are found twice
+        interval_vector = np.column_stack(
+            [_popcount(masks & rotations[i]) for i in range(1, 7)]
+        ).astype(np.int8)
+        interval_vector[:, 5] //= 2
+        root = np.full(NUM_PITCH_CLASS_SETS, -1, dtype=np.int8)
+        span = np.zeros(NUM_PITCH_CLASS_SETS, dtype=np.int8)
+        for _cardinality in range(1, NUM_PITCH_CLASSES + 1):
+            group = np.flatnonzero(cardinality == _cardinality)
+            root[group] = batch_root(np.array([self.notes[i] for i in group]))
+        for mask in range(1, NUM_PITCH_CLASS_SETS):
+            span[mask] = get_span(mask_to_pitch_classes(mask))
+        return {
+            "cardinality": cardinality,
+            "transposition_class": transposition_class,
+            "interval_vector": interval_vector,
+            "root": root,
+            "span": span,
+        }
+
+    @property
+    def forte_class(self) -> np.ndarray:
+        if self._forte_class is None:
+            self._load_forte_tables()
+        return self._forte_class
+
+    @property
+    def inversion(self) -> np.ndarray:
+        if self._inversion is None:
+            self._load_forte_tables()
+        return self._inversion
+
+    @property
+    def prime_form(self) -> np.ndarray:
+        if self._prime_form is None:
+            self._load_forte_tables()
+        return self._prime_form
+
+    def _load_forte_tables(self):
+        tables = _load_or_build(FORTE_TABLES, self._build_forte_tables)
+        self._forte_class = tables["forte_class"]
+        self._inversion = tables["inversion"]
+        self._prime_form = tables["prime_form"]
+
+    @staticmethod
+    def _build_forte_tables() -> typing.Dict[str, np.ndarray]:
+        from music21.chord import tables
+
+        forte_class = np.zeros(NUM_PITCH_CLASS_SETS, dtype=np.int8)
+        inversion = np.zeros(NUM_PITCH_CLASS_SETS, dtype=np.int8)
+        prime_form = np.zeros(NUM_PITCH_CLASS_SETS, dtype=np.int16)
+        for cardinality in range(1, NUM_PITCH_CLASSES + 1):
+            for _forte_class in range(1, len(tables.FORTE[cardinality])):
+                _prime_form = tables.FORTE[cardinality][_forte_class][0]
+                prime_mask = pitch_classes_to_mask(_prime_form)
+                inverted_mask = pitch_classes_to_mask(-p for p in _prime_form)
+                transpositions = [transpose_mask(prime_mask, i) for i in range(12)]
+                inverted_transpositions = [
+                    transpose_mask(inverted_mask, i) for i in range(12)
+                ]
+                symmetric = inverted_mask in transpositions
+                for masks, _inversion in (
+                    (transpositions, 0 if symmetric else 1),
+                    (inverted_transpositions, 0 if symmetric else -1),
+                ):
+                    for mask in masks:
+                        forte_class[mask] = _forte_class
+                        inversion[mask] = _inversion
+                        prime_form[mask] = prime_mask
+        return {
+            "forte_class": forte_class,
+            "inversion": inversion,
+            "prime_form": prime_form,
+        }
+
+
+def _load_or_build(
+    names: typing.Sequence[str],
+    build: typing.Callable[[], typing.Dict[str, np.ndarray]],
+) -> typing.Dict[str, np.ndarray]:
+    """
+    The tables 'names' from the table cache, or built with 'build' if the cache is disabled
+    :param names:
+    :param build:
+    :return: read-only arrays by name
+    """
+    cache = get_table_cache()
+    if cache is not None:
+        tables = cache.get_or_build_many(
+            [f"pitch_class_set_{name}" for name in names],
+            lambda: {
+                f"pitch_class_set_{name}": array for name, array in build().items()
+            },
+        )
+        return {name: tables[f"pitch_class_set_{name}"] for name in names}
+    tables = build()
+    for array in tables.values():
+        array.setflags(write=False)
+    return tables
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    count = np.zeros(masks.shape, dtype=np.int64)
+    for p in range(NUM_PITCH_CLASSES):
+        count += (masks >> p) & 1
+    return count
+
+
+def _rotate(masks: np.ndarray, interval: int) -> np.ndarray:
+    """
+    transpose_mask of every bitmask in 'masks'
+    :param masks:
+    :param interval:
+    :return:
+    """
+    interval %= NUM_PITCH_CLASSES
+    full = NUM_PITCH_CLASS_SETS - 1
+    return ((masks << interval) | (masks >> (NUM_PITCH_CLASSES - interval))) & full
+
+
+_pitch_class_set_table: typing.Optional[PitchClassSetTable] = None
+
+
+def get_pitch_class_set_table() -> PitchClassSetTable:
+    """
+    The process-wide table, built on first use
+    :return:
+    """
+    global _pitch_class_set_table
+    if _pitch_class_set_table is None:
+        _pitch_class_set_table = PitchClassSetTable()
+    return _pitch_class_set_table
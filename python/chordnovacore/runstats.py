@@ -0,0 +1,223 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import contextlib
+import cProfile
+import functools
+import time
+import typing
+
+"""
+Stages of a generation run, in the order they happen for each progression step
+"""
+STAGES: typing.Tuple[str, ...] = (
+    "enumeration",  # candidate chords: expansions x movement vectors
+    "alignment",  # aligning chords of different sizes (find_vec)
+    "features",  # unigram / bigram features of the candidates
+    "validity",  # filtering the candidates against the parameter ranges
+    "sorting",
+    "output",  # text / MIDI output
+)
+
+
+class StageStats(object):
+    calls: int
+    seconds: (
+        float  # wall time, excluding that of other stages called from within this one
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+class RunStats(object):
+    """
+    Wall time and call count of each stage of a run, plus named counters.
+
+    Stages nest (e.g. 'features' within 'alignment', as find_vec computes bigram features);
+    time is exclusive: while a nested stage runs, the enclosing one is paused,
+    so every moment is counted by one stage only and the stages never add up to more than the run.
+    """
+
+    begin: float  # time.time() at the start of the run
+    end: typing.Optional[float]
+    stages: typing.Dict[str, StageStats]
+    counters: typing.Dict[str, int]
+    profile_path: typing.Optional[str]
+    # [stage name, perf_counter() at which it started or resumed] of the running stages, innermost last
+    _active: typing.List[typing.List[typing.Any]]
+
+    def __init__(self, profile_path: typing.Optional[str] = None):
+        self.begin = time.time()
+        self.end = None
+        self.stages = {stage: StageStats() for stage in STAGES}
+        self.counters = {}
+        self.profile_path = profile_path
+        self._active = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> typing.Iterator[None]:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        stats.calls += 1
+        start = time.perf_counter()
+        if self._active:
+            # Pause the enclosing stage
+            enclosing = self._active[-1]
+            self.stages[enclosing[0]].seconds += start - enclosing[1]
+        self._active.append([name, start])
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            __, resumed = self._active.pop()
+            stats.seconds += end - resumed
+            if self._active:
+                self._active[-1][1] = end
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        self.end = time.time()
+
+    @property
+    def seconds(self) -> float:
+        """
+        Wall time of the run so far, or of the whole run once finished
+        :return:
+        """
+        return (self.end if self.end is not None else time.time()) - self.begin
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        JSON-serializable summary
+        :return:
+        """
+        return {
+            "begin": self.begin,
+            "end": self.end,
+            "seconds": self.seconds,
+            "stages": {
+                name: {"calls": stats.calls, "seconds": stats.seconds}
+                for name, stats in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "profile_path": self.profile_path,
+        }
+
+    def report(self) -> str:
+        """
+        Human-readable summary, one line per stage and counter
+        :return:
+        """
+        total = self.seconds
+        lines = [f"total: {total:.3f}s"]
+        for name, stats in self.stages.items():
+            share = stats.seconds / total if total > 0 else 0.0
+            lines.append(
+                f"{name}: {stats.seconds:.3f}s ({share:.0%}), {stats.calls} calls"
+            )
+        for name, value in self.counters.items():
+            lines.append(f"{name}: {value}")
+        if self.profile_path is not None:
+            lines.append(f"profile: {self.profile_path}")
+        return "\n".join(lines)
+
+
+def timed(stage: str):
+    """
+    Decorator of a ChordProgressionGenerator method: time it as 'stage' in the generator's 'stats',
+    if a run is being instrumented (see ChordProgressionGenerator.instrument), otherwise just call it
+    :param stage:
+    :return:
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            stats: typing.Optional[RunStats] = self.stats
+            if stats is None:
+                return method(self, *args, **kwargs)
+            with stats.stage(stage):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+_active_stats: typing.Optional[RunStats] = None
+
+
+def get_active_stats() -> typing.Optional[RunStats]:
+    """
+    The stats of the run being instrumented in this process, if any
+    :return:
+    """
+    return _active_stats
+
+
+@contextlib.contextmanager
+def activated(stats: RunStats) -> typing.Iterator[RunStats]:
+    """
+    Make 'stats' the active stats of this process within a with block, so that the functions
+    decorated with timed_function record their stage in it
+    :param stats:
+    :return:
+    """
+    global _active_stats
+    previous = _active_stats
+    _active_stats = stats
+    try:
+        yield stats
+    finally:
+        _active_stats = previous
+
+
+def timed_function(stage: str):
+    """
+    Decorator of a module-level function: time it as 'stage' in the active stats (see activated),
+    if there are any, otherwise just call it.
+    Calls made in worker processes (e.g. substitution with workers > 1) are not recorded.
+    :param stage:
+    :return:
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stats = _active_stats
+            if stats is None:
+                return function(*args, **kwargs)
+            with stats.stage(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def profiled(path: typing.Optional[str]) -> typing.Iterator[None]:
+    """
+    Run the body under cProfile and save the profile to 'path' (readable with pstats);
+    do nothing if 'path' is None
+    :param path:
+    :return:
+    """
+    if path is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
@@ -0,0 +1,393 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import collections
+import itertools
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .features import batch_root, batch_span_sspan, batch_unigram_features
+from .functions import batch_min_cost_expansion
+from .models.cnchordfeature import CNChordFeature
+from .pitchclassset import get_pitch_class_set_table
+from .runstats import timed_function
+
+"""
+Batched evaluation of chord substitution candidates.
+
+analyser.substitute used to build, align and check one candidate at a time.
+Here all candidates of the same size are aligned with the antechord at once,
+their features are computed as one matrix (one row per candidate, one column per SUBSTITUTION_FEATURES),
+and the minChordFeatures / maxChordFeatures bounds are applied as a vectorized mask.
+Every value is the one analyser.find_vec(..., in_substitution=True) + set_param2 would give.
+"""
+
+MAX_SUBSTITUTION_MOVEMENT = (
+    6  # No voice may move further than this in chord substitution
+)
+MAX_SUBSTITUTION_SV = (
+    36  # Maximum value of sv in chord substitution, see set_similarity
+)
+
+SUBSTITUTION_FEATURES: typing.Tuple[str, ...] = (
+    "s_size",  # n
+    "tension",  # t
+    "thickness",  # h
+    "root",  # r
+    "g_center",  # g
+    "span",  # s
+    "sv",  # sv
+    "common_note",  # c
+    "similarity",  # x
+)
+
+"""
+Upper bound on the number of elements of the largest intermediate array;
+candidates are processed in chunks to stay under it.
+"""
+MAX_BATCH_ELEMENTS = 1 << 21
+
+"""
+Number of consecutive candidate ids evaluated together by iter_substitutes;
+it is also the unit of work of each process.
+"""
+DEFAULT_CHUNK_SIZE = 512
+
+
+class CandidateBatch(object):
+    """
+    Substitution candidates of the same size, aligned with the antechord.
+
+    ids: (N,) set ids (pitch-class bitmasks) of the candidates
+    ante_notes: (N, m) aligned antechords
+    post_notes: (N, m) aligned postchords
+    vecs: (N, m) movement vectors
+    features: (N, len(SUBSTITUTION_FEATURES)) feature matrix
+    """
+
+    ids: np.ndarray
+    ante_notes: np.ndarray
+    post_notes: np.ndarray
+    vecs: np.ndarray
+    features: np.ndarray
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        ante_notes: np.ndarray,
+        post_notes: np.ndarray,
+        vecs: np.ndarray,
+        features: np.ndarray,
+    ):
+        self.ids = ids
+        self.ante_notes = ante_notes
+        self.post_notes = post_notes
+        self.vecs = vecs
+        self.features = features
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def feature(self, name: str) -> np.ndarray:
+        return self.features[:, SUBSTITUTION_FEATURES.index(name)]
+
+
+def get_inversions(notes: np.ndarray) -> np.ndarray:
+    """
+    Batched version of the inversions tried by analyser.find_vec in chord substitution
+    :param notes: (N, s) sorted notes
+    :return: (N, 2s + 1, s); [:, i] is inversion i, sorted:
+    note j of inversion i is notes[(j + i) % s] + ((j + i) // s - 1) * 12
+    """
+    size = notes.shape[1]
+    i = np.arange(2 * size + 1)[:, np.newaxis]
+    j = np.arange(size)[np.newaxis, :]
+    octaves = ((j + i) // size - 1) * 12
+    rotated = notes[:, (j + i) % size]  # (N, 2s + 1, s)
+    return np.sort(rotated + octaves[np.newaxis, :, :], axis=-1)
+
+
+@timed_function("alignment")
+def align_batch(
+    ante_notes: typing.Sequence[int], post_notes: np.ndarray
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Batched version of analyser._find_vec against a fixed antechord
+    :param ante_notes: a sorted notes
+    :param post_notes: (..., s) sorted notes
+    :return: (aligned_ante, aligned_post, vecs, svs) of shapes (..., m), (..., m), (..., m), (...),
+    m = max(a, s)
+    """
+    ante = np.asarray(ante_notes, dtype=np.int64)
+    post = post_notes.astype(np.int64, copy=False)
+    a, s = len(ante), post.shape[-1]
+    if s > a:
+        expansion, __ = batch_min_cost_expansion(source=ante, target=post)
+        aligned_ante = ante[expansion]
+        aligned_post = post
+    elif s < a:
+        expansion, __ = batch_min_cost_expansion(source=post, target=ante)
+        aligned_post = np.take_along_axis(post, expansion, axis=-1)
+        aligned_ante = np.broadcast_to(ante, aligned_post.shape)
+    else:
+        aligned_post = post
+        aligned_ante = np.broadcast_to(ante, aligned_post.shape)
+    vecs = aligned_post - aligned_ante
+    return aligned_ante, aligned_post, vecs, np.abs(vecs).sum(axis=-1)
+
+
+def _evaluate_same_size(
+    ante_notes: typing.Sequence[int], ante_root: int, ids: np.ndarray
+) -> CandidateBatch:
+    table = get_pitch_class_set_table()
+    notes = np.array([table.notes[i] for i in ids], dtype=np.int32)
+    inversions = get_inversions(notes)
+
+    # Align every inversion, then keep the first one of minimal sv
+    # among those where no voice moves further than MAX_SUBSTITUTION_MOVEMENT.
+    # If there is none, inversion 0 is kept, as in analyser.find_vec
+    aligned_ante, aligned_post, vecs, svs = align_batch(ante_notes, inversions)
+    valid = np.all(np.abs(vecs) <= MAX_SUBSTITUTION_MOVEMENT, axis=-1)
+    best = np.argmin(np.where(valid, svs, np.iinfo(np.int32).max), axis=1)
+    rows = np.arange(len(ids))
+    aligned_ante = aligned_ante[rows, best]
+    aligned_post = aligned_post[rows, best]
+    vecs = vecs[rows, best]
+    svs = svs[rows, best].astype(np.float64)
+    chosen = inversions[rows, best]
+
+    unigram = batch_unigram_features(aligned_post)
+    root = unigram["root"]
+    similarity = np.maximum(0.0, 1 - svs / MAX_SUBSTITUTION_SV)
+    similarity = np.round(
+        100 * np.where(root == ante_root, np.sqrt(similarity), similarity)
+    )
+
+    columns = {
+        "s_size": table.cardinality[ids],
+        "tension": unigram["tension"],
+        "thickness": unigram["thickness"],
+        "root": root,
+        "g_center": unigram["g_center"],
+        "span": table.span[ids],
+        "sv": svs,
+        "common_note": np.isin(chosen, np.asarray(ante_notes)).sum(axis=1),
+        "similarity": similarity,
+    }
+    features = np.column_stack(
+        [np.asarray(columns[name], dtype=np.float64) for name in SUBSTITUTION_FEATURES]
+    )
+    return CandidateBatch(
+        ids=ids,
+        ante_notes=np.ascontiguousarray(aligned_ante),
+        post_notes=aligned_post,
+        vecs=vecs,
+        features=features,
+    )
+
+
+@timed_function("features")
+def evaluate_candidates(
+    ante_notes: typing.Sequence[int], ids: typing.Iterable[int]
+) -> typing.List[CandidateBatch]:
+    """
+    :param ante_notes: notes of the (normalized) antechord
+    :param ids: set ids of the candidates, see analyser.sub_library
+    :return: one CandidateBatch per candidate size; within a batch, ids keep their order
+    """
+    table = get_pitch_class_set_table()
+    ids = np.asarray(list(ids), dtype=np.int64)
+    ante_root = int(batch_root(np.asarray([ante_notes]))[0])
+    a = len(ante_notes)
+    batches = []
+    for size in np.unique(table.cardinality[ids]):
+        size = int(size)
+        group = ids[table.cardinality[ids] == size]
+        # The alignment keeps a (max(a, size), min(a, size)) table for each inversion
+        chunk = max(1, MAX_BATCH_ELEMENTS // ((2 * size + 1) * a * size))
+        parts = [
+            _evaluate_same_size(ante_notes, ante_root, group[start : start + chunk])
+            for start in range(0, len(group), chunk)
+        ]
+        batches.append(
+            CandidateBatch(
+                ids=group,
+                ante_notes=np.concatenate([part.ante_notes for part in parts]),
+                post_notes=np.concatenate([part.post_notes for part in parts]),
+                vecs=np.concatenate([part.vecs for part in parts]),
+                features=np.concatenate([part.features for part in parts]),
+            )
+        )
+    return batches
+
+
+def feature_bounds(
+    min_features: CNChordFeature, max_features: CNChordFeature
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Only the attributes set on min_features / max_features are bounds; the others are unlimited.
+    :param min_features:
+    :param max_features:
+    :return: (lower, upper), both of shape (len(SUBSTITUTION_FEATURES),)
+    """
+    lower = np.full(len(SUBSTITUTION_FEATURES), -np.inf)
+    upper = np.full(len(SUBSTITUTION_FEATURES), np.inf)
+    for bounds, features in ((lower, min_features), (upper, max_features)):
+        for name, value in vars(features).items():
+            if name not in SUBSTITUTION_FEATURES:
+                raise ValueError(
+                    f"Bounds on '{name}' are not supported in chord substitution"
+                )
+            bounds[SUBSTITUTION_FEATURES.index(name)] = value
+    return lower, upper
+
+
+def within_bounds(
+    batch: CandidateBatch, lower: np.ndarray, upper: np.ndarray
+) -> np.ndarray:
+    """
+    :param batch:
+    :param lower:
+    :param upper:
+    :return: (N,) boolean mask of the candidates whose features are all within [lower, upper]
+    """
+    return np.all((batch.features >= lower) & (batch.features <= upper), axis=1)
+
+
+class AcceptedCandidate(typing.NamedTuple):
+    """
+    A candidate within the bounds, in plain Python types so that it is cheap to pickle,
+    with every field of its CNChordBigramFeature (see analyser.set_param2) taken from the batch
+    """
+
+    id: int
+    ante_notes: typing.List[int]
+    post_notes: typing.List[int]
+    vec: typing.List[int]
+    sv: float
+    ascending_count: int
+    steady_count: int
+    descending_count: int
+    root_movement: int
+    common_note: int
+    similarity: int
+    span: int
+    sspan: int
+
+
+def _find_substitutes(
+    ante_notes: typing.Sequence[int],
+    ids: typing.Sequence[int],
+    lower: np.ndarray,
+    upper: np.ndarray,
+) -> typing.List[AcceptedCandidate]:
+    accepted = []
+    ante_root = int(batch_root(np.asarray([ante_notes]))[0])
+    for batch in evaluate_candidates(ante_notes, ids):
+        rows = np.flatnonzero(within_bounds(batch, lower, upper))
+        if len(rows) == 0:
+            continue
+        vecs = batch.vecs[rows]
+        root_movement = (batch.feature("root")[rows].astype(np.int64) - ante_root) % 12
+        __, sspans = batch_span_sspan(batch.post_notes[rows])
+        columns = zip(
+            batch.ids[rows].tolist(),
+            batch.ante_notes[rows].tolist(),
+            batch.post_notes[rows].tolist(),
+            vecs.tolist(),
+            batch.feature("sv")[rows].tolist(),
+            (vecs > 0).sum(axis=1).tolist(),
+            (vecs == 0).sum(axis=1).tolist(),
+            (vecs < 0).sum(axis=1).tolist(),
+            np.minimum(root_movement, 12 - root_movement).tolist(),
+            batch.feature("common_note")[rows].astype(np.int64).tolist(),
+            batch.feature("similarity")[rows].astype(np.int64).tolist(),
+            batch.feature("span")[rows].astype(np.int64).tolist(),
+            sspans.tolist(),
+        )
+        accepted.extend(AcceptedCandidate(*row) for row in columns)
+    # Batches are grouped by size; restore the order of the ids
+    accepted.sort(key=lambda candidate: candidate.id)
+    return accepted
+
+
+def iter_substitutes(
+    ante_notes: typing.Sequence[int],
+    ids: typing.Iterable[int],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> typing.Iterator[AcceptedCandidate]:
+    """
+    Evaluate the candidates and yield those within [lower, upper] (see feature_bounds), sorted by id.
+
+    The sorted ids are cut into chunks of 'chunk_size' consecutive ids;
+    the accepted candidates of a chunk are yielded as soon as the chunk is evaluated,
+    and the caller can stop early. With workers = 1 only one chunk of results is held at a time.
+    With workers > 1, chunks are evaluated on a process pool and still yielded in order,
+    with at most 2 * workers chunks submitted or held at a time.
+    Every candidate is evaluated independently of the others,
+    so the result is identical whatever the number of workers or the chunk size.
+    :param ante_notes: notes of the (normalized) antechord
+    :param ids: set ids of the candidates
+    :param lower:
+    :param upper:
+    :param workers: number of processes
+    :param chunk_size: number of candidates evaluated together
+    :return:
+    """
+    ante_notes = list(ante_notes)
+    ids = sorted(ids)
+    chunks = [
+        ids[start : start + chunk_size] for start in range(0, len(ids), chunk_size)
+    ]
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _find_substitutes(ante_notes, chunk, lower, upper)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # Futures in the order of the chunks; the oldest is waited for first,
+        # and a new chunk is submitted for every chunk yielded
+        chunks = iter(chunks)
+        pending = collections.deque()
+        for chunk in itertools.islice(chunks, 2 * workers):
+            pending.append(
+                executor.submit(_find_substitutes, ante_notes, chunk, lower, upper)
+            )
+        while pending:
+            accepted = pending.popleft().result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(
+                    executor.submit(_find_substitutes, ante_notes, chunk, lower, upper)
+                )
+            yield from accepted
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def find_substitutes(
+    ante_notes: typing.Sequence[int],
+    ids: typing.Iterable[int],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> typing.List[AcceptedCandidate]:
+    """
+    List version of iter_substitutes
+    :return: accepted candidates, sorted by id
+    """
+    return list(
+        iter_substitutes(
+            ante_notes, ids, lower, upper, workers=workers, chunk_size=chunk_size
+        )
+    )
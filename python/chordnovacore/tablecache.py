@@ -0,0 +1,177 @@
+"""
+ChordNova v3.0 [Build: 2021.1.14]
+(c) 2020 Wenge Chen, Ji-woon Sim.
+Port to Python by osbertngok
+"""
+
+import contextlib
+import os
+import tempfile
+import typing
+
+import numpy as np
+
+TABLE_CACHE_VERSION = 1
+# Set to an empty string to disable the cache
+TABLE_CACHE_DIR_ENV = "CHORDNOVA_TABLE_CACHE_DIR"
+TABLE_FILE_MODE = 0o644
+
+"""
+Precomputed tables (expansion indexes, pitch-class set facts) are saved as .npy files
+under <cache directory>/v<TABLE_CACHE_VERSION> the first time a process builds them.
+Later processes map these files read-only instead of building the tables again,
+so all workers of a process pool share one physical copy of their pages.
+
+Bump TABLE_CACHE_VERSION whenever the content or layout of a cached table changes.
+"""
+
+
+def default_table_cache_dir() -> str:
+    """
+    $CHORDNOVA_TABLE_CACHE_DIR, or chordnova/tables under $XDG_CACHE_HOME (default ~/.cache)
+    :return:
+    """
+    directory = os.environ.get(TABLE_CACHE_DIR_ENV)
+    if directory is not None:
+        return directory
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "chordnova", "tables")
+
+
+class TableCache(object):
+    """
+    Directory of read-only, memory-mapped tables, keyed by name.
+
+    Files are written to a temporary name and renamed into place, so processes building
+    the same table at the same time never see a partial file. Any failure to read or write
+    the directory falls back to the freshly built table: the cache never changes a result.
+    """
+
+    directory: str
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, f"v{TABLE_CACHE_VERSION}")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".npy")
+
+    def load(self, name: str) -> typing.Optional[np.ndarray]:
+        """
+        :param name:
+        :return: the cached table, mapped read-only, or None if it is not cached (or unreadable)
+        """
+        try:
+            mapped = np.load(self.path(name), mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        # A plain ndarray view of the map: indexing it does not go through np.memmap
+        return np.asarray(mapped)
+
+    def store(self, name: str, table: np.ndarray) -> bool:
+        """
+        :param name:
+        :param table:
+        :return: whether the table was written
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temporary_path = tempfile.mkstemp(
+                dir=self.directory, prefix=name, suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, np.ascontiguousarray(table), allow_pickle=False)
+                # mkstemp creates the file readable by its owner only
+                os.chmod(temporary_path, TABLE_FILE_MODE)
+                os.replace(temporary_path, self.path(name))
+            except BaseException:
+                os.unlink(temporary_path)
+                raise
+        except OSError:
+            return False
+        return True
+
+    def get_or_build(
+        self, name: str, build: typing.Callable[[], np.ndarray]
+    ) -> np.ndarray:
+        """
+        The cached table 'name', built with 'build' and cached if it is not cached yet
+        :param name:
+        :param build:
+        :return: read-only array
+        """
+        return self.get_or_build_many((name,), lambda: {name: build()})[name]
+
+    def get_or_build_many(
+        self,
+        names: typing.Sequence[str],
+        build: typing.Callable[[], typing.Dict[str, np.ndarray]],
+    ) -> typing.Dict[str, np.ndarray]:
+        """
+        Tables that are built together: all loaded if all are cached, otherwise all built with 'build'
+        and cached (a partially written set is rebuilt as a whole)
+        :param names:
+        :param build: returns the table of every name
+        :return: read-only arrays by name
+        """
+        tables = {name: self.load(name) for name in names}
+        if all(table is not None for table in tables.values()):
+            return tables
+        tables = build()
+        for name in names:
+            self.store(name, tables[name])
+            tables[name].setflags(write=False)
+        return tables
+
+    def clear(self):
+        """
+        Remove every cached table of this version
+        :return:
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith((".npy", ".tmp")):
+                os.unlink(os.path.join(self.directory, filename))
+
+
+_table_cache: typing.Optional[TableCache] = None
+_table_cache_configured = False
+
+
+def set_table_cache_dir(directory: typing.Optional[str]):
+    """
+    :param directory: None (or an empty string) to build every table in memory
+    :return:
+    """
+    global _table_cache, _table_cache_configured
+    _table_cache = TableCache(directory) if directory else None
+    _table_cache_configured = True
+
+
+@contextlib.contextmanager
+def table_cache_dir(directory: typing.Optional[str]) -> typing.Iterator[None]:
+    """
+    set_table_cache_dir(directory) within a with block; the previous setting is restored on exit
+    :param directory:
+    :return:
+    """
+    global _table_cache, _table_cache_configured
+    previous = (_table_cache, _table_cache_configured)
+    set_table_cache_dir(directory)
+    try:
+        yield
+    finally:
+        _table_cache, _table_cache_configured = previous
+
+
+def get_table_cache() -> typing.Optional[TableCache]:
+    """
+    The process-wide cache, in default_table_cache_dir unless set_table_cache_dir was called
+    :return:
+    """
+    if not _table_cache_configured:
+        set_table_cache_dir(default_table_cache_dir())
+    return _table_cache
@@ -0,0 +1,25 @@
+import os
+import shutil
+import tempfile
+
+TABLE_CACHE_DIR_ENV = "CHORDNOVA_TABLE_CACHE_DIR"
+
+_table_cache_dir = None
+_previous_table_cache_dir = None
+
+
+def pytest_configure(config):
+    # Before collection, since importing chordnovacore may already build tables:
+    # the tests (and the processes they start) cache tables in a temporary directory, not in ~/.cache
+    global _table_cache_dir, _previous_table_cache_dir
+    _table_cache_dir = tempfile.mkdtemp(prefix="chordnova-tables-")
+    _previous_table_cache_dir = os.environ.get(TABLE_CACHE_DIR_ENV)
+    os.environ[TABLE_CACHE_DIR_ENV] = _table_cache_dir
+
+
+def pytest_unconfigure(config):
+    if _previous_table_cache_dir is None:
+        os.environ.pop(TABLE_CACHE_DIR_ENV, None)
+    else:
+        os.environ[TABLE_CACHE_DIR_ENV] = _previous_table_cache_dir
+    shutil.rmtree(_table_cache_dir, ignore_errors=True)
@@ -0,0 +1,296 @@
+import math
+import random
+import unittest
+
+import numpy as np
+from chordnovacore.analyser import (
+    DEFAULT_FIND_VEC_CACHE_SIZE,
+    ProgressionAnalysis,
+    _find_vec,
+    _find_vec_uncached,
+    analyse_progression,
+    batch_bigram_features,
+    clear_find_vec_cache,
+    find_vec,
+    find_vec_cache_info,
+    get_bigram_feature,
+    set_find_vec_cache_size,
+    set_span,
+)
+from chordnovacore.features import (
+    batch_span_sspan,
+    clear_feature_cache,
+    feature_cache_info,
+    get_span_sspan,
+)
+from chordnovacore.functions import expansion_indexes
+from chordnovacore.models.cnchord import CNChord
+
+
+def reference_set_span(notes: list, initial: bool):
+    # set_span before the single-pass kernel, as ported from the C++ implementation
+    span = 0
+    sspan = None
+
+    single_chrome = []
+    for i in range(len(notes)):
+        single_chrome.append(6 - (5 * (notes[i] % 12) + 6) % 12)
+    copy = sorted(single_chrome)
+
+    diff1 = 0
+    min_diff1 = copy[len(notes) - 1] - copy[0]
+    bound = 0
+    min_bound = max(int(math.fabs(copy[0])), int(math.fabs(copy[len(notes) - 1])))
+    index = 0
+
+    if initial:
+        for i in range(1, len(notes)):
+            diff1 = copy[i - 1] + 12 - copy[i]
+            if diff1 < min_diff1:
+                min_diff1 = diff1
+                min_bound = max(
+                    int(math.fabs(copy[i - 1] + 12)), int(math.fabs(copy[i]))
+                )
+                index = i
+            elif diff1 == min_diff1:
+                bound = max(int(math.fabs(copy[i - 1] + 12)), int(math.fabs(copy[i])))
+                if bound < min_bound:
+                    min_bound = bound
+                    index = i
+        span = min_diff1
+    else:
+        diff2 = 0
+        min_diff2 = 0
+        merged_single_chroma = sorted(set(single_chrome) | set(copy))
+        min_diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
+        for i in range(1, len(notes)):
+            copy[i - 1] += 12
+            diff1 = copy[i - 1] - copy[i % len(notes)]
+            if diff1 < min_diff1:
+                min_diff1 = diff1
+                merged_single_chroma = sorted(set(single_chrome) | set(copy))
+                min_diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
+                min_bound = max(
+                    int(math.fabs(copy[i - 1])),
+                    int(math.fabs(copy[i % len(notes)])),
+                )
+                index = i
+            elif diff1 == min_diff1:
+                merged_single_chroma = sorted(set(single_chrome) | set(copy))
+                diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
+                if diff2 < min_diff2:
+                    min_diff2 = diff2
+                    min_bound = max(
+                        int(math.fabs(copy[i - 1])),
+                        int(
+                            math.fabs(copy[i % len(notes)]),
+                        ),
+                    )
+                elif diff2 == min_diff2:
+                    bound = max(
+                        int(math.fabs(copy[i - 1])),
+                        int(math.fabs(copy[i % len(notes)])),
+                    )
+                    if bound < min_bound:
+                        min_bound = bound
+                        index = 1
+        copy = sorted(single_chrome)
+        for i in range(len(notes), 0, -1):
+            j = (i - 2 + len(notes)) % len(notes)
+            copy[i - 1] -= 12
+            diff1 = copy[j] - copy[i - 1]
+            if diff1 < min_diff1:
+                min_diff1 = diff1
+                merged_single_chroma = sorted(set(single_chrome) | set(copy))
+                min_diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
+                min_bound = max(int(math.fabs(copy[j])), int(math.fabs(copy[i - 1])))
+                index = -i
+            elif diff1 == min_diff1:
+                merged_single_chroma = sorted(set(single_chrome) | set(copy))
+                diff2 = merged_single_chroma[-1] - merged_single_chroma[0]
+                if diff2 < min_diff2:
+                    min_diff2 = diff2
+                    min_bound = max(
+                        int(math.fabs(copy[j])), int(math.fabs(copy[i - 1]))
+                    )
+                    index = -i
+                elif diff2 == min_diff2:
+                    bound = max(int(math.fabs(copy[j])), int(math.fabs(copy[i - 1])))
+                    if bound < min_bound:
+                        min_bound = bound
+                        index = -i
+
+        span = min_diff1
+        sspan = min_diff2
+    copy = sorted(single_chrome)
+    if index > 0:
+        for i in range(len(notes)):
+            if single_chrome[i] < copy[index - 1]:
+                single_chrome[i] += 12
+    elif index < 0:
+        for i in range(len(notes)):
+            if single_chrome[i] >= copy[-index - 1]:
+                single_chrome[i] -= 12
+    return span, sspan
+
+
+class TestAnalyser(unittest.TestCase):
+    def assert_find_vec_equal_to_enumeration(self, ante_notes: list, post_notes: list):
+        # Sequential scan over all expansions of the smaller chord,
+        # as in the original C++ implementation
+        small, large = sorted([ante_notes, post_notes], key=len)
+        min_vec, min_diff, min_expansion = [], math.inf, []
+        for expansion in expansion_indexes[len(small)][len(large)]:
+            notes = [small[i] for i in expansion]
+            if small is ante_notes:
+                vec = [post - ante for ante, post in zip(notes, post_notes)]
+            else:
+                vec = [post - ante for ante, post in zip(ante_notes, notes)]
+            sv = sum(abs(v) for v in vec)
+            if sv < min_diff:
+                min_vec, min_diff, min_expansion = vec, sv, notes
+
+        new_antechord, new_postchord, vec, sv = _find_vec(
+            CNChord.from_notes(notes=ante_notes), CNChord.from_notes(notes=post_notes)
+        )
+        if small is ante_notes:
+            self.assertEqual(new_antechord.notes, min_expansion)
+            self.assertEqual(new_postchord.notes, post_notes)
+        else:
+            self.assertEqual(new_antechord.notes, ante_notes)
+            self.assertEqual(new_postchord.notes, min_expansion)
+        self.assertEqual(vec, min_vec)
+        self.assertEqual(sv, min_diff)
+
+    def test_find_vec(self):
+        self.assert_find_vec_equal_to_enumeration([60, 64, 67], [60, 64, 67])
+        self.assert_find_vec_equal_to_enumeration([60, 64, 67], [59, 62, 65, 67])
+        self.assert_find_vec_equal_to_enumeration([48, 60], [55, 59, 62, 65, 69])
+        self.assert_find_vec_equal_to_enumeration(
+            [48, 55, 62, 64, 67, 71, 74],
+            [50, 53, 57, 60, 62, 64, 65, 67, 69, 72, 76, 79],
+        )
+        self.assert_find_vec_equal_to_enumeration([59, 62, 65, 67], [60, 64, 67])
+        self.assert_find_vec_equal_to_enumeration([55, 59, 62, 65, 69], [48, 60])
+
+    def test_find_vec_random(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            ante_notes = sorted(rng.sample(range(48, 84), rng.randint(1, 8)))
+            post_notes = sorted(rng.sample(range(48, 84), rng.randint(1, 8)))
+            self.assert_find_vec_equal_to_enumeration(ante_notes, post_notes)
+
+    def test_analyse_progression(self):
+        rng = random.Random(0)
+        chords = [
+            CNChord.from_notes(
+                sorted(rng.randint(48, 84) for __ in range(rng.randint(1, 6)))
+            )
+            for __ in range(60)
+        ]
+        clear_feature_cache()
+        analysis = analyse_progression(chords)
+        # one unigram computation per distinct chord, none for the aligned chords
+        self.assertEqual(
+            feature_cache_info().misses, len({chord.notes_key for chord in chords})
+        )
+        self.assertEqual(len(analysis), len(chords) - 1)
+        self.assertEqual(len(analysis.chord_features), len(chords))
+        for i in range(len(chords) - 1):
+            expected = find_vec(
+                chords[i], chords[i + 1], in_analyser=True, in_substitution=False
+            )[4]
+            self.assertEqual(vars(analysis.bigram_feature(i)), vars(expected))
+            self.assertEqual(analysis.similarity[i], expected.similarity)
+
+    def test_find_vec_cache(self):
+        self.addCleanup(set_find_vec_cache_size, DEFAULT_FIND_VEC_CACHE_SIZE)
+        clear_find_vec_cache()
+        rng = random.Random(0)
+        ref_chord = CNChord.from_notes([60])
+        pairs = [
+            (
+                sorted(rng.randint(55, 79) for __ in range(rng.randint(1, 5))),
+                sorted(rng.randint(55, 79) for __ in range(rng.randint(1, 5))),
+            )
+            for __ in range(20)
+        ]
+        for __ in range(2):
+            for ante_notes, post_notes in pairs:
+                for in_substitution in (False, True):
+                    antechord = CNChord.from_notes(ante_notes)
+                    postchord = CNChord.from_notes(post_notes, ref_chord=ref_chord)
+                    expected = _find_vec_uncached(
+                        antechord, postchord, True, in_substitution
+                    )
+                    result = find_vec(antechord, postchord, True, in_substitution)
+                    self.assertEqual(result[0].notes, expected[0].notes)
+                    self.assertEqual(result[1].notes, expected[1].notes)
+                    self.assertIs(result[1].ref_chord, expected[1].ref_chord)
+                    self.assertEqual(result[2:4], expected[2:4])
+                    self.assertEqual(vars(result[4]), vars(expected[4]))
+        info = find_vec_cache_info()
+        self.assertEqual((info.hits, info.misses, info.evictions), (40, 40, 0))
+
+        set_find_vec_cache_size(10)
+        info = find_vec_cache_info()
+        self.assertEqual((info.evictions, info.currsize), (30, 10))
+
+    def test_span_sspan(self):
+        rng = random.Random(0)
+        for size in range(1, 9):
+            rows = [
+                sorted(rng.randint(36, 96) for __ in range(size)) for __ in range(300)
+            ]
+            spans, sspans = batch_span_sspan(np.array(rows))
+            for notes, span, sspan in zip(rows, spans, sspans):
+                expected = reference_set_span(notes, initial=False)
+                self.assertEqual(get_span_sspan(notes), expected)
+                self.assertEqual((span, sspan), expected)
+                chord = CNChord.from_notes(notes)
+                self.assertEqual(set_span(chord, chord, initial=False), expected)
+                self.assertEqual(
+                    set_span(chord, chord, initial=True),
+                    reference_set_span(notes, initial=True),
+                )
+
+    def test_batch_bigram_features(self):
+        rng = random.Random(0)
+        for size in range(1, 7):
+            ante = np.array(
+                [sorted(rng.randint(48, 84) for __ in range(size)) for __ in range(200)]
+            )
+            post = np.sort(ante + rng.choice([-7, -2, 0, 1, 3]), axis=1)
+            post[::3] = np.sort(
+                ante[::3] + np.array([rng.randint(-6, 6) for __ in range(size)]),
+                axis=1,
+            )
+            ante_root = np.array([rng.randint(0, 11) for __ in range(200)])
+            post_root = np.where(
+                np.arange(200) % 2 == 0, ante_root, (ante_root + 7) % 12
+            )
+            for in_analyser, in_substitution in ((True, False), (False, True)):
+                features = batch_bigram_features(
+                    ante, post, ante_root, post_root, in_analyser, in_substitution
+                )
+                for i in range(200):
+                    vec = (post[i] - ante[i]).tolist()
+                    expected = get_bigram_feature(
+                        antechord=CNChord.from_notes(ante[i].tolist()),
+                        postchord=CNChord.from_notes(post[i].tolist()),
+                        ante_root=int(ante_root[i]),
+                        post_root=int(post_root[i]),
+                        vec=vec,
+                        sv=sum(abs(move) for move in vec),
+                        in_analyser=in_analyser,
+                        in_substitution=in_substitution,
+                    )
+                    self.assertEqual(features["vec"][i].tolist(), expected.vec)
+                    for name in ProgressionAnalysis.BIGRAM_COLUMNS:
+                        self.assertEqual(
+                            features[name][i], getattr(expected, name), (i, name)
+                        )
+
+
+if __name__ == "__main__":
+    unittest.main()
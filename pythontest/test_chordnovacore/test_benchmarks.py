@@ -0,0 +1,66 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+
+import chordnovacore
+from chordnovacore.tablecache import get_table_cache
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(list(chordnovacore.__path__)[0]))
+
+
+def load_bench():
+    spec = importlib.util.spec_from_file_location(
+        "bench", os.path.join(PYTHON_DIR, "benchmarks", "bench.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.bench = load_bench()
+
+    def test_compare_results(self):
+        def results(**medians):
+            return {
+                "format_version": self.bench.BENCHMARK_FORMAT_VERSION,
+                "cases": {name: {"median": m} for name, m in medians.items()},
+            }
+
+        comparisons = self.bench.compare_results(
+            results(a=1.0, b=1.0, c=1.0), results(a=1.05, b=1.5, d=9.0), threshold=0.1
+        )
+        self.assertEqual([c.name for c in comparisons], ["a", "b"])
+        self.assertEqual([c.regression for c in comparisons], [False, True])
+        self.assertAlmostEqual(comparisons[1].ratio, 1.5)
+
+    def test_run_and_compare(self):
+        cache = get_table_cache()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            status = self.bench.main(
+                ["run", "set_span", "normalize", "--repeat", "1", "--output", path]
+            )
+            self.assertEqual(status, 0)
+            # The table cache, disabled while the cases run, is restored
+            self.assertIs(get_table_cache(), cache)
+            with open(path) as f:
+                results = json.load(f)
+            self.assertEqual(set(results["cases"]), {"set_span", "normalize"})
+            for result in results["cases"].values():
+                self.assertGreater(result["median"], 0)
+            # Against a baseline twice as fast, both cases regress
+            for result in results["cases"].values():
+                result["median"] /= 2
+            baseline = os.path.join(directory, "baseline.json")
+            with open(baseline, "w") as f:
+                json.dump(results, f)
+            self.assertEqual(self.bench.main(["compare", baseline, path]), 1)
+            self.assertEqual(self.bench.main(["compare", path, path]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,319 @@
+import collections
+import itertools
+import os
+import pstats
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
+from chordnovacore.chordprogressiongenerator import (
+    ChordProgressionGenerator,
+    UniqueMode,
+    enumerate_vecs,
+    parse_sort_order,
+)
+from chordnovacore.analyser import clear_find_vec_cache, find_vec
+from chordnovacore.features import (
+    UNIGRAM_FEATURE_FUNCTIONS,
+    clear_feature_cache,
+    feature_cache_info,
+)
+from chordnovacore.models.cnchord import CNChord
+from chordnovacore.runstats import RunStats, activated, get_active_stats, timed_function
+
+
+class FakeChord(object):
+    """
+    Stands for a CNChord; counts how many times its features are read
+    """
+
+    def __init__(self, **features):
+        self._features = features
+        self.reads = 0
+        self.bigram_feature = features
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        self.reads += 1
+        return self._features[name]
+
+    def unigram_feature(self, name):
+        return getattr(self, name)
+
+
+class TestChordProgressionGenerator(unittest.TestCase):
+    def test_parse_sort_order(self):
+        self.assertEqual(
+            parse_sort_order("x-t+sss+sv-"),
+            [
+                ("similarity", True),
+                ("tension", False),
+                ("sspan", False),
+                ("span", False),
+                ("sv", True),
+            ],
+        )
+        with self.assertRaises(ValueError):
+            parse_sort_order("tz")
+        for sort_order in ("k", "t-kk", "Q+"):
+            with self.assertRaises(ValueError):
+                parse_sort_order(sort_order)
+
+    def test_sort_results(self):
+        rng = random.Random(0)
+        chords = [
+            FakeChord(
+                similarity=rng.randint(0, 5),
+                tension=rng.randint(0, 3),
+                span=rng.randint(0, 3),
+            )
+            for __ in range(300)
+        ]
+        cpg = ChordProgressionGenerator()
+        cpg.sort_order = "x-ts-"
+        cpg.sort_order_sub = "t"
+        full = cpg.sort_results(chords, in_substitution=False)
+        self.assertEqual(
+            full,
+            sorted(
+                chords,
+                key=lambda c: (
+                    -c._features["similarity"],
+                    c._features["tension"],
+                    -c._features["span"],
+                ),
+            ),
+        )
+        for top_k in (0, 1, 7, 300, 1000):
+            self.assertEqual(
+                cpg.sort_results(chords, in_substitution=False, top_k=top_k),
+                full[:top_k],
+            )
+        self.assertEqual(
+            cpg.sort_results(chords, in_substitution=True, top_k=5),
+            sorted(chords, key=lambda c: c._features["tension"])[:5],
+        )
+
+    def test_sort_results_is_lazy(self):
+        chords = [FakeChord(similarity=100, tension=1)] + [
+            FakeChord(similarity=0, tension=i) for i in range(100)
+        ]
+        cpg = ChordProgressionGenerator()
+        cpg.sort_order = "x-t"
+        self.assertEqual(cpg.sort_results(chords, False, top_k=1), chords[:1])
+        # Losing on similarity is enough to be rejected; tension is never read
+        for chord in chords[1:]:
+            self.assertEqual(chord.reads, 1)
+
+    def test_sort_real_chords_is_lazy(self):
+        rng = random.Random(0)
+        chords = [
+            CNChord.from_notes(sorted(rng.sample(range(48, 84), rng.randint(2, 6))))
+            for __ in range(3000)
+        ]
+        expected = sorted(chords, key=lambda c: (c.tension, c.g_center))[:5]
+        clear_feature_cache()
+        chords = [CNChord.from_notes(chord.notes) for chord in chords]
+        computed = collections.Counter()
+
+        def counting(name, function):
+            def wrapper(notes):
+                computed[name] += 1
+                return function(notes)
+
+            return wrapper
+
+        cpg = ChordProgressionGenerator()
+        cpg.sort_order = "t+g"
+        with mock.patch.dict(
+            UNIGRAM_FEATURE_FUNCTIONS,
+            {
+                name: counting(name, function)
+                for name, function in UNIGRAM_FEATURE_FUNCTIONS.items()
+            },
+        ):
+            best = cpg.sort_results(chords, False, top_k=5)
+        self.assertEqual([c.notes for c in best], [c.notes for c in expected])
+        # Tension of every chord, g_center only to break ties; nothing else
+        self.assertEqual(computed["tension"], len({c.notes_key for c in chords}))
+        self.assertLess(computed["g_center"], computed["tension"])
+        self.assertEqual(set(computed), {"tension", "g_center"})
+        self.assertEqual(feature_cache_info().misses, 0)
+
+    def test_sort_without_bigram_features(self):
+        chords = [CNChord.from_notes([60, 64, 67]), CNChord.from_notes([60, 65, 69])]
+        cpg = ChordProgressionGenerator()
+        for sort_order in ("sv", "t+c", "x-", "ss"):
+            cpg.sort_order = sort_order
+            with self.assertRaises(ValueError):
+                cpg.sort_results(iter(chords), False)
+            with self.assertRaises(ValueError):
+                cpg.sort_results(chords, False, top_k=1)
+
+    def test_enumerate_vecs(self):
+        rng = random.Random(0)
+        for __ in range(200):
+            size = rng.randint(1, 4)
+            notes = sorted(rng.randint(55, 75) for __ in range(size))
+            moves = sorted(rng.sample(range(-4, 5), rng.randint(1, 9)))
+            lowest, highest = rng.randint(50, 62), rng.randint(65, 80)
+            i_min, i_max = rng.randint(0, 3), rng.randint(3, 12)
+            sv_min, sv_max = rng.randint(0, 4), rng.randint(4, 12)
+            expected = []
+            for vec in itertools.product(moves, repeat=size):
+                new_notes = [note + move for note, move in zip(notes, vec)]
+                intervals = [b - a for a, b in zip(new_notes, new_notes[1:])]
+                if (
+                    all(lowest <= note <= highest for note in new_notes)
+                    and all(i_min <= interval <= i_max for interval in intervals)
+                    and sv_min <= sum(abs(move) for move in vec) <= sv_max
+                ):
+                    expected.append(list(vec))
+            self.assertEqual(
+                list(
+                    enumerate_vecs(
+                        notes, moves, lowest, highest, i_min, i_max, sv_min, sv_max
+                    )
+                ),
+                expected,
+            )
+
+    def test_sort_real_chords(self):
+        chords = [
+            CNChord.from_notes(notes)
+            for notes in ([60, 65, 69], [59, 62, 67, 71], [60, 63, 67], [62, 65, 69])
+        ]
+        cpg = ChordProgressionGenerator()
+        cpg.sort_order = "n-t+g"
+        result = cpg.sort_results(chords, False)
+        keys = [(-chord.s_size, chord.tension, chord.g_center) for chord in result]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(cpg.sort_results(chords, False, top_k=2), result[:2])
+        cpg.sort_order = "k"
+        with self.assertRaises(ValueError):
+            cpg.sort_results(chords, False)
+
+    def test_set_new_chords(self):
+        cpg = ChordProgressionGenerator()
+        cpg.vl_min, cpg.vl_max = 0, 2
+        cpg.enable_steady = cpg.enable_ascending = cpg.enable_descending = True
+        cpg.lowest, cpg.highest = 48, 84
+        cpg.i_min, cpg.i_max = 1, 12
+        cpg.sv_min, cpg.sv_max = 1, 3
+        cpg.m_min, cpg.m_max = 3, 4
+        cpg.exp_count = 0
+        self.assertEqual(cpg.allowed_moves(), [-2, -1, 0, 1, 2])
+        chord = CNChord.from_notes([60, 64, 67])
+        cpg.set_new_chords(chord)
+        self.assertEqual(cpg.exp_count, 1 + 3)
+        self.assertEqual(cpg.c_size, len(cpg.new_chords))
+        notes = [new_chord.notes for new_chord in cpg.new_chords]
+        self.assertIn([60, 65, 69], notes)  # C major -> F major 6/4
+        self.assertIn([59, 60, 64, 67], notes)  # expansion of C, then C -> B
+        self.assertNotIn([60, 64, 67], notes)  # sv = 0
+        self.assertNotIn([60, 60, 64, 67], notes)  # interval 0
+        for new_chord in cpg.new_chords:
+            self.assertIs(new_chord.ref_chord, chord)
+
+    def test_instrument(self):
+        cpg = ChordProgressionGenerator()
+        cpg.vl_min, cpg.vl_max = 0, 2
+        cpg.enable_steady = cpg.enable_ascending = cpg.enable_descending = True
+        cpg.lowest, cpg.highest = 48, 84
+        cpg.i_min, cpg.i_max = 1, 12
+        cpg.sv_min, cpg.sv_max = 1, 3
+        cpg.m_min, cpg.m_max = 3, 4
+        cpg.sort_order = "t"
+        cpg.continual = False
+        cpg.unique_mode = UniqueMode.RemoveDup
+        cpg.init_dedup()
+        clear_find_vec_cache()
+        clear_feature_cache()
+        with tempfile.TemporaryDirectory() as directory:
+            cpg.output_path, cpg.output_name = directory, "test"
+            profile_path = os.path.join(directory, "run.prof")
+            with cpg.instrument(profile_path=profile_path) as stats:
+                self.assertIs(cpg.stats, stats)
+                for chord in (
+                    CNChord.from_notes([60, 64, 67]),
+                    CNChord.from_notes([62, 65, 69]),
+                ):
+                    cpg.set_new_chords(chord)
+                    candidates = [c for c in cpg.new_chords if cpg.valid_unique(c)]
+                    best = cpg.sort_results(candidates, False, top_k=10)
+                    find_vec(chord, best[0], True, False)
+                cpg.to_midi()
+            self.assertIsNone(cpg.stats)
+            self.assertEqual(cpg.begin, stats.begin)
+            self.assertEqual(cpg.end, stats.end)
+            self.assertLessEqual(stats.begin, stats.end)
+            self.assertEqual(stats.stages["enumeration"].calls, 2)
+            self.assertEqual(stats.stages["sorting"].calls, 2)
+            self.assertEqual(stats.stages["output"].calls, 1)
+            self.assertEqual(
+                stats.stages["validity"].calls, stats.counters["candidates"]
+            )
+            # find_vec, and _find_vec within it
+            self.assertEqual(stats.stages["alignment"].calls, 4)
+            self.assertGreater(stats.stages["alignment"].seconds, 0)
+            # unigram features of the candidates sorted by tension, bigram features of the best ones
+            self.assertGreater(stats.stages["features"].calls, 2)
+            self.assertGreater(stats.stages["features"].seconds, 0)
+            self.assertIsNone(get_active_stats())
+            self.assertGreater(stats.stages["enumeration"].seconds, 0)
+            self.assertEqual(stats.counters["expansions"], cpg.exp_count)
+            self.assertEqual(stats.counters["progressions"], 2)
+            self.assertEqual(cpg.progr_count, 2)
+            self.assertIn("enumeration", stats.report())
+            self.assertEqual(stats.as_dict()["profile_path"], profile_path)
+            profile = pstats.Stats(profile_path)
+            self.assertTrue(
+                any(name == "set_new_chords" for __, __, name in profile.stats)
+            )
+
+    def test_nested_stage(self):
+        stats = RunStats()
+        with stats.stage("validity"):
+            with stats.stage("validity"):
+                pass
+        self.assertEqual(stats.stages["validity"].calls, 2)
+
+        # Time is exclusive: the enclosing stage is paused while a nested one runs
+        stats = RunStats()
+        with stats.stage("alignment"):
+            time.sleep(0.01)
+            with stats.stage("features"):
+                time.sleep(0.05)
+                with stats.stage("alignment"):
+                    time.sleep(0.01)
+        stats.finish()
+        alignment, features = stats.stages["alignment"], stats.stages["features"]
+        self.assertEqual((alignment.calls, features.calls), (2, 1))
+        self.assertGreaterEqual(features.seconds, 0.05)
+        self.assertGreaterEqual(alignment.seconds, 0.02)
+        self.assertLess(alignment.seconds, 0.05)
+        self.assertLessEqual(alignment.seconds + features.seconds, stats.seconds)
+        stats = RunStats()
+        stats.count("candidates", 3)
+        stats.count("candidates")
+        self.assertEqual(stats.counters["candidates"], 4)
+
+    def test_timed_function(self):
+        @timed_function("features")
+        def double(x):
+            return 2 * x
+
+        self.assertEqual(double(1), 2)  # no active stats
+        stats = RunStats()
+        with activated(stats):
+            self.assertIs(get_active_stats(), stats)
+            self.assertEqual(double(2), 4)
+        self.assertIsNone(get_active_stats())
+        self.assertEqual(double(3), 6)
+        self.assertEqual(stats.stages["features"].calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import pickle
+import unittest
+from chordnovacore.analyser import normalize
+from chordnovacore.models.cnchord import CNChord
+from chordnovacore.models.cnnotes import CNNotes
+
+
+class TestCNNotes(unittest.TestCase):
+    def test_value_semantics(self):
+        a = CNNotes([67, 60, 64])
+        b = CNNotes((60, 64, 67))
+        self.assertEqual(a.notes, (60, 64, 67))
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, CNNotes([60, 64, 68]))
+        self.assertEqual(len({a, b}), 1)
+        self.assertEqual(CNNotes([60, 72, 64, 76]).pitch_classes, (0, 4))
+        self.assertEqual(pickle.loads(pickle.dumps(a)), a)
+        with self.assertRaises(AttributeError):
+            a._notes = (1,)
+
+    def test_music21_chord_is_lazy(self):
+        a = CNNotes([60, 64, 67])
+        self.assertIsNone(a._music21_chord)
+        self.assertEqual([p.midi for p in a.music21_chord.pitches], [60, 64, 67])
+        self.assertIs(a.music21_chord, a.music21_chord)
+
+    def test_cnchord(self):
+        chord = CNChord.from_notes(notes=[64, 60, 67])
+        self.assertEqual(chord.notes, [60, 64, 67])
+        self.assertEqual(chord.t_size, 3)
+        self.assertIs(chord.copy().notes_key, chord.notes_key)
+        self.assertIsNone(chord.notes_key._music21_chord)
+        self.assertEqual(chord.name_with_octave, "C4 E4 G4")
+        self.assertEqual(
+            normalize(chord=CNChord.from_notes([48, 52, 64])).notes, [72, 76]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import gc
+import os
+import tempfile
+import unittest
+import weakref
+
+import music21
+
+from chordnovacore.chordprogressiongenerator import (
+    ChordProgressionGenerator,
+    OutputMode,
+)
+from chordnovacore.models.cnchord import CNChord
+
+
+class TestContinual(unittest.TestCase):
+    def test_stream(self):
+        cpg = ChordProgressionGenerator()
+        cpg.enable_sim = True
+        cpg.sim_period = [1, 20]
+        cpg.output_mode = OutputMode.Both
+        cpg.output_name = "progression"
+        with tempfile.TemporaryDirectory() as output_path:
+            cpg.output_path = output_path
+            first = None
+            previous = None
+            with cpg.open_continual_stream() as stream:
+                self.assertEqual(stream.window, 21)
+                for i in range(200):
+                    chord = CNChord.from_notes(
+                        [60 + i % 5, 64 + i % 3, 67], ref_chord=previous
+                    )
+                    if first is None:
+                        first = weakref.ref(chord)
+                    stream.append(chord)
+                    # the stream keeps its own copies and leaves the chords passed in alone
+                    self.assertIs(chord.ref_chord, previous)
+                    self.assertIsNot(stream.recent[-1], chord)
+                    previous = chord
+                    if i == 99:
+                        # the file is valid before the stream is closed
+                        midi_file = music21.midi.MidiFile()
+                        midi_file.open(os.path.join(output_path, "progression.mid"))
+                        midi_file.read()
+                        midi_file.close()
+            del chord, previous
+            gc.collect()
+            self.assertIsNone(first())
+            self.assertEqual(len(cpg.record), 21)
+            self.assertEqual(cpg.record[-1].notes, [60 + 199 % 5, 64 + 199 % 3, 67])
+            self.assertIs(cpg.record[-1].ref_chord, cpg.record[-2])
+            self.assertIsNone(cpg.record[0].ref_chord)
+
+            with open(os.path.join(output_path, "progression.txt")) as f:
+                text = f.read()
+            self.assertEqual(text.count("t = "), 200)
+            self.assertTrue(text.startswith("[60, 64, 67]\nt = 3.0, s = 4, "))
+            self.assertIn("[64, 65, 67]\nt = ", text)
+            self.assertEqual(text.count("Root: "), 200)
+
+            score = music21.converter.parse(
+                os.path.join(output_path, "progression.mid")
+            )
+            chords = list(score.chordify().recurse().getElementsByClass("Chord"))
+            self.assertEqual(len(chords), 200)
+            self.assertEqual([p.midi for p in chords[7].pitches], [62, 65, 67])
+
+    def test_to_midi_after_stream(self):
+        cpg = ChordProgressionGenerator()
+        cpg.enable_sim = False
+        cpg.continual = True
+        cpg.output_name = "progression"
+        with tempfile.TemporaryDirectory() as output_path:
+            cpg.output_path = output_path
+            cpg.output_mode = OutputMode.MidiOnly
+            with cpg.open_continual_stream() as stream:
+                for i in range(40):
+                    stream.append(CNChord.from_notes([60 + i % 7, 67]))
+            path = os.path.join(output_path, "progression.mid")
+            with open(path, "rb") as f:
+                streamed = f.read()
+            # The window holds 16 chords; the file written by the stream keeps all 40
+            self.assertEqual(cpg.to_midi(), path)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), streamed)
+            score = music21.converter.parse(path)
+            self.assertEqual(
+                len(list(score.chordify().recurse().getElementsByClass("Chord"))), 40
+            )
+
+            # Chords appended since the last periodic flush are in the file too
+            stream = cpg.open_continual_stream()
+            for i in range(10):
+                stream.append(CNChord.from_notes([60 + i, 67 + i]))
+            score = music21.converter.parse(cpg.to_midi())
+            self.assertEqual(
+                len(list(score.chordify().recurse().getElementsByClass("Chord"))), 10
+            )
+            stream.close()
+
+            cpg.output_mode = OutputMode.TextOnly
+            cpg.open_continual_stream().close()
+            with self.assertRaises(ValueError):
+                cpg.to_midi()
+
+
+if __name__ == "__main__":
+    unittest.main()
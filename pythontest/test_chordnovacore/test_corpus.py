@@ -0,0 +1,139 @@
+import csv
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from chordnovacore.analyser import analyse_progression
+from chordnovacore.corpus import (
+    CorpusResult,
+    CorpusWriter,
+    analyse_corpus,
+    extract_chords,
+)
+from chordnovacore.midi import write_midi
+from chordnovacore.models.cnchord import CNChord
+
+PROGRESSIONS = {
+    "a.mid": [[60, 64, 67], [60, 65, 69], [59, 62, 67], [60, 64, 67]],
+    "sub/b.midi": [[48, 55, 64, 72], [50, 57, 65], [], [43, 59, 62, 65, 67]],
+    "c.mid": [[62, 65, 69], [62, 65, 69], [55, 59, 62, 65]],
+}
+
+
+class TestCorpus(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.directory.name, "sub"))
+        for name, progression in PROGRESSIONS.items():
+            write_midi(os.path.join(self.directory.name, name), progression)
+        with open(os.path.join(self.directory.name, "broken.mid"), "wb") as f:
+            f.write(b"not a midi file")
+        with open(os.path.join(self.directory.name, "notes.txt"), "w") as f:
+            f.write("ignored")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_extract_chords(self):
+        path = os.path.join(self.directory.name, "c.mid")
+        # repeated chords are merged
+        self.assertEqual(
+            [chord.notes for chord in extract_chords(path)],
+            [[62, 65, 69], [55, 59, 62, 65]],
+        )
+
+    def test_analyse_corpus(self):
+        results = {}
+        for workers in (1, 2):
+            output_prefix = os.path.join(self.directory.name, f"out{workers}")
+            writer = analyse_corpus(self.directory.name, output_prefix, workers)
+            self.assertEqual(len(writer.files), 3)
+            self.assertEqual(
+                [os.path.basename(path) for path, __ in writer.errors], ["broken.mid"]
+            )
+            self.assertEqual(writer.num_bigrams, 3 + 2 + 1)
+            with open(output_prefix + ".csv", newline="") as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(len(rows), writer.num_bigrams)
+            with np.load(output_prefix + ".npz") as npz:
+                data = {name: npz[name] for name in npz.files}
+            self.assertEqual(len(data["sv"]), writer.num_bigrams)
+            # Rows are in the order of the files, whatever the number of workers
+            results[workers] = (rows, data)
+
+            # compare one file against analyse_progression
+            file_index = [os.path.basename(path) for path in data["files"]].index(
+                "a.mid"
+            )
+            rows_a = np.flatnonzero(data["file_index"] == file_index)
+            expected = analyse_progression(
+                [CNChord.from_notes(notes) for notes in PROGRESSIONS["a.mid"]]
+            )
+            np.testing.assert_array_equal(
+                data["similarity"][rows_a], expected.similarity
+            )
+            offsets = data["vec_offsets"]
+            self.assertEqual(
+                [list(data["vec"][offsets[i] : offsets[i + 1]]) for i in rows_a],
+                expected.vec,
+            )
+        self.assertEqual(results[1][0], results[2][0])
+        self.assertEqual(set(results[1][1]), set(results[2][1]))
+        for name, column in results[1][1].items():
+            np.testing.assert_array_equal(column, results[2][1][name], name)
+        self.assertEqual(
+            [
+                os.path.relpath(row["file"], self.directory.name)
+                for row in results[1][0]
+            ],
+            ["a.mid"] * 3 + ["c.mid"] + [os.path.join("sub", "b.midi")] * 2,
+        )
+
+    def test_corpus_writer(self):
+        output_prefix = os.path.join(self.directory.name, "out")
+        progressions = [PROGRESSIONS["a.mid"], [[60, 64, 67]], PROGRESSIONS["c.mid"]]
+        with CorpusWriter(output_prefix + ".csv", output_prefix + ".npz") as writer:
+            for i, progression in enumerate(progressions):
+                chords = [CNChord.from_notes(notes) for notes in progression]
+                writer.write(
+                    CorpusResult(
+                        path=f"{i}.mid",
+                        notes=progression,
+                        analysis=analyse_progression(chords),
+                        error=None,
+                    )
+                )
+            writer.write(
+                CorpusResult(path="x.mid", notes=[], analysis=None, error="broken")
+            )
+        with np.load(output_prefix + ".npz") as npz:
+            data = {name: npz[name] for name in npz.files}
+        self.assertEqual(list(data["files"]), ["0.mid", "1.mid", "2.mid"])
+        self.assertEqual(list(data["errors"]), ["x.mid"])
+        self.assertEqual(list(data["error_messages"]), ["broken"])
+        self.assertEqual(list(data["file_index"]), [0, 0, 0, 2, 2])
+        self.assertEqual(list(data["index"]), [0, 1, 2, 0, 1])
+        self.assertEqual(list(data["vec_offsets"]), [0, 3, 6, 9, 12, 16])
+        self.assertEqual(data["sv"].dtype, np.float64)
+        self.assertEqual(data["similarity"].dtype, np.int64)
+        expected = analyse_progression(
+            [CNChord.from_notes(notes) for notes in PROGRESSIONS["c.mid"]]
+        )
+        np.testing.assert_array_equal(data["sv"][3:], expected.sv)
+        self.assertEqual(
+            list(data["vec"][9:]), [move for vec in expected.vec for move in vec]
+        )
+
+    def test_corpus_writer_empty(self):
+        output_prefix = os.path.join(self.directory.name, "empty")
+        CorpusWriter(output_prefix + ".csv", output_prefix + ".npz").close()
+        with np.load(output_prefix + ".npz") as npz:
+            self.assertEqual(list(npz["vec_offsets"]), [0])
+            self.assertEqual(len(npz["sv"]), 0)
+            self.assertEqual(len(npz["files"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
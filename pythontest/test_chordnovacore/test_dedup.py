@@ -0,0 +1,73 @@
+import random
+import unittest
+from chordnovacore.chordprogressiongenerator import (
+    ChordProgressionGenerator,
+    UniqueMode,
+)
+from chordnovacore.dedup import BloomFilter, DedupIndex, vec_key
+from chordnovacore.models.cnchord import CNChord
+
+
+class TestDedup(unittest.TestCase):
+    def test_keys(self):
+        vecs = {(0,), (0, 0), (-1, 1), (1, -1), (-128,), (127,)}
+        self.assertEqual(len({vec_key(vec) for vec in vecs}), len(vecs))
+        for vec in ([128], [0, -129]):
+            with self.assertRaises(ValueError):
+                vec_key(vec)
+
+    def test_unique_mode(self):
+        cpg = ChordProgressionGenerator()
+        cpg.init_dedup()
+        c_major = CNChord.from_notes([60, 64, 67])
+        c_major_open = CNChord.from_notes([48, 67, 76])
+        d_major = CNChord.from_notes([62, 66, 69])
+        cpg.unique_mode = UniqueMode.RemoveDup
+        cpg.record_unique(c_major)
+        self.assertFalse(cpg.valid_unique(c_major_open))
+        self.assertTrue(cpg.valid_unique(d_major))
+        cpg.init_dedup()
+        cpg.unique_mode = UniqueMode.RemoveDupType
+        cpg.record_unique(c_major)
+        self.assertFalse(cpg.valid_unique(d_major))
+        self.assertTrue(cpg.valid_unique(CNChord.from_notes([60, 63, 67])))
+        cpg.unique_mode = UniqueMode.Disabled
+        self.assertTrue(cpg.valid_unique(c_major))
+
+        cpg.set_vec_id([1, 0, -1])
+        self.assertTrue(cpg.valid_vec())
+        cpg.vec_ids.add(cpg.vec_id)
+        self.assertFalse(cpg.valid_vec())
+
+    def test_bloom_filter(self):
+        rng = random.Random(0)
+        bloom = BloomFilter(capacity=10000, false_positive_rate=0.01)
+        keys = rng.sample(range(1 << 40), 20000)
+        for key in keys[:10000]:
+            bloom.add(key)
+        for key in keys[:10000]:
+            self.assertIn(key, bloom)
+        false_positives = sum(key in bloom for key in keys[10000:])
+        self.assertLess(false_positives / 10000, 0.02)
+        self.assertAlmostEqual(bloom.estimated_false_positive_rate(), 0.01, delta=0.002)
+
+    def test_dedup_index_switches_to_bloom(self):
+        index = DedupIndex(max_exact_keys=100, bloom_capacity=1000)
+        for key in range(100):
+            self.assertTrue(index.add_if_new(key))
+        self.assertTrue(index.exact)
+        self.assertFalse(index.add_if_new(5))
+        self.assertTrue(index.exact)
+        self.assertTrue(index.add_if_new(100))
+        self.assertFalse(index.exact)
+        for key in range(101):
+            self.assertIn(key, index)
+        self.assertEqual(len(index), 101)
+        self.assertGreater(index.false_positive_rate_estimate(), 0.0)
+        index.clear()
+        self.assertTrue(index.exact)
+        self.assertNotIn(5, index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from chordnovacore.features import (
+    calculate_chord_feature,
+    clear_feature_cache,
+    feature_cache_info,
+    set_feature_cache_size,
+    DEFAULT_FEATURE_CACHE_SIZE,
+)
+from chordnovacore.models.cnchord import CNChord
+from chordnovacore.models.cnnotes import CNNotes
+
+
+class TestFeatures(unittest.TestCase):
+    def tearDown(self):
+        set_feature_cache_size(DEFAULT_FEATURE_CACHE_SIZE)
+        clear_feature_cache()
+
+    def test_calculate_chord_feature(self):
+        feature = calculate_chord_feature(CNNotes([48, 60, 64, 67, 72]))
+        self.assertEqual(feature.s_size, 3)
+        self.assertEqual(feature.tension, 6.0)
+        self.assertEqual(feature.thickness, 2.5)
+        self.assertEqual(feature.root, 0)
+        self.assertEqual(feature.g_center, 59)
+        self.assertEqual(feature.span, 4)
+        self.assertEqual(feature.count_vec, [0, 0, 1, 1, 1, 0])
+        self.assertEqual(feature.self_diff, [12, 4, 3, 5])
+
+        self.assertEqual(calculate_chord_feature(CNNotes([62, 65, 69, 72])).root, 2)
+        self.assertEqual(calculate_chord_feature(CNNotes([64, 67, 72])).root, 0)
+        self.assertEqual(calculate_chord_feature(CNNotes([60, 66])).root, 0)
+        self.assertEqual(calculate_chord_feature(CNNotes([60, 61, 66])).span, 6)
+
+        empty = calculate_chord_feature(CNNotes([]))
+        self.assertEqual(
+            (empty.s_size, empty.tension, empty.root, empty.g_center, empty.span),
+            (0, 0.0, -1, 50, 0),
+        )
+
+    def test_feature_cache(self):
+        clear_feature_cache()
+        chord = CNChord.from_notes(notes=[60, 64, 67])
+        self.assertEqual(chord.root, 0)
+        self.assertEqual(chord.span, 4)
+        self.assertEqual(CNChord.from_notes(notes=[67, 64, 60]).tension, 3.0)
+        info = feature_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+
+        set_feature_cache_size(1)
+        CNChord.from_notes(notes=[60, 63, 67]).materialize_chord_feature()
+        info = feature_cache_info()
+        self.assertEqual((info.misses, info.evictions, info.currsize), (2, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
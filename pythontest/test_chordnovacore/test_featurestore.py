@@ -0,0 +1,103 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from chordnovacore.analyser import substitute
+from chordnovacore.features import (
+    batch_unigram_features,
+    calculate_chord_feature,
+    clear_feature_cache,
+    set_feature_store,
+)
+from chordnovacore.featurestore import (
+    STORED_FEATURES,
+    FeatureStore,
+    build_feature_store,
+    load_feature_store,
+)
+from chordnovacore.models.cnchord import CNChord
+from chordnovacore.models.cnchordfeature import CNChordFeature
+from chordnovacore.models.cnnotes import CNNotes
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "features.cnfs")
+
+    def tearDown(self):
+        set_feature_store(None)
+        clear_feature_cache()
+        self.directory.cleanup()
+
+    def test_build(self):
+        store = build_feature_store(self.path, 60, 80, 2, 4, chunk_size=100)
+        self.assertEqual(len(store), 210 + 1330 + 5985)
+        rng = random.Random(0)
+        indexes = set()
+        for __ in range(500):
+            notes = sorted(rng.sample(range(60, 81), rng.randint(2, 4)))
+            expected = calculate_chord_feature(CNNotes(notes))
+            stored = store.lookup(notes)
+            for name in STORED_FEATURES:
+                self.assertEqual(stored[name], getattr(expected, name), (notes, name))
+            indexes.add((tuple(notes), store.index(notes)))
+        # note sets and records correspond one to one
+        self.assertEqual(len({index for __, index in indexes}), len(indexes))
+
+        for notes in (
+            [59, 64, 67],
+            [60, 64, 81],
+            [60, 60, 67],
+            [60],
+            [60, 62, 64, 65, 67],
+        ):
+            self.assertIsNone(store.lookup(notes))
+        self.assertTrue(store.covers(62, 79, 3, 4))
+        self.assertFalse(store.covers(62, 79, 3, 5))
+
+        reopened = pickle.loads(pickle.dumps(store))
+        self.assertEqual(reopened.lookup([60, 64, 67]), store.lookup([60, 64, 67]))
+
+        with open(os.path.join(self.directory.name, "bad"), "wb") as f:
+            f.write(b"\0" * 100)
+        with self.assertRaises(ValueError):
+            FeatureStore(os.path.join(self.directory.name, "bad"))
+
+    def test_used_by_features_and_substitute(self):
+        min_features, max_features = CNChordFeature(), CNChordFeature()
+        min_features.s_size = max_features.s_size = 3
+        max_features.sv = 4
+        antechord = CNChord.from_notes([60, 64, 67])
+        postchord = CNChord.from_notes([62, 65, 69])
+
+        def run():
+            return [
+                (chord.notes, chord.tension, chord.g_center)
+                for chord in substitute(
+                    antechord, postchord, min_features, max_features, CNChordFeature()
+                )
+            ]
+
+        expected = run()
+        build_feature_store(self.path, 48, 96, 3, 3)
+        store = load_feature_store(self.path)
+        clear_feature_cache()
+        self.assertEqual(run(), expected)
+
+        # Tamper with a record, so that reading from the store can be told apart
+        store.records = store.records.copy()
+        store.records["tension"][store.index([60, 64, 67])] = 123.0
+        clear_feature_cache()
+        self.assertEqual(CNChord.from_notes([60, 64, 67]).tension, 123.0)
+        self.assertEqual(CNChord.from_notes([60, 64, 67, 72]).tension, 5.0)
+        columns = batch_unigram_features(np.array([[60, 64, 67], [60, 60, 67]]))
+        self.assertEqual(list(columns["tension"]), [123.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
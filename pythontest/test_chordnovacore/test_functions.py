@@ -1,7 +1,14 @@
 import unittest
+from math import comb
+import numpy as np
 from chordnovacore.functions import (
     MAX_SUPPORTED_NUM_NOTES,
     MAX_NUM_EXPANSIONS,
+    ExpansionTable,
+    LRUCache,
+    batch_min_cost_expansion,
+    expansion_indexes,
+    min_cost_expansion,
     legacy_initialize_expansion_indexes,
     initialize_expansion_indexes,
 )
@@ -21,6 +28,105 @@ class TestFunctions(unittest.TestCase):
                             f"{i} {j} {k} {l}, {a[i][j][k][l]} {b[i][j][k][l]}",
                         )
 
+    def test_expansion_table(self):
+        a = initialize_expansion_indexes()
+        b = ExpansionTable()
+        self.assertEqual(b.nbytes, 0)
+        for i in range(1, MAX_SUPPORTED_NUM_NOTES + 1):
+            for j in range(i, MAX_SUPPORTED_NUM_NOTES + 1):
+                table = b[i][j]
+                self.assertEqual(table.shape, (comb(j - 1, i - 1), j))
+                for k in range(table.shape[0]):
+                    self.assertEqual(list(table[k]), a[i][j][k][:j], f"{i} {j} {k}")
+        self.assertEqual(
+            len(b), MAX_SUPPORTED_NUM_NOTES * (MAX_SUPPORTED_NUM_NOTES + 1) // 2
+        )
+        self.assertGreater(b.nbytes, 0)
+        with self.assertRaises(IndexError):
+            b[5][3]
+
+    def test_expansion_unranking(self):
+        for i in range(1, MAX_SUPPORTED_NUM_NOTES + 1):
+            for j in range(i, MAX_SUPPORTED_NUM_NOTES + 1):
+                table = expansion_indexes[i][j].tolist()
+                self.assertEqual(list(ExpansionTable.iter_expansions(i, j)), table)
+                for k in range(0, len(table), max(1, len(table) // 50)):
+                    self.assertEqual(ExpansionTable.unrank(i, j, k), table[k])
+        # Beyond the table: 10 notes to 40 notes has comb(39, 9) = 211915132 expansions
+        num_expansions = ExpansionTable.num_expansions(10, 40)
+        self.assertEqual(num_expansions, 211915132)
+        iterator = ExpansionTable.iter_expansions(10, 40)
+        for k in range(100):
+            self.assertEqual(next(iterator), ExpansionTable.unrank(10, 40, k))
+        self.assertEqual(
+            ExpansionTable.unrank(10, 40, 0), [0] * 31 + list(range(1, 10))
+        )
+        self.assertEqual(
+            ExpansionTable.unrank(10, 40, num_expansions - 1),
+            list(range(9)) + [9] * 31,
+        )
+        self.assertEqual(
+            list(expansion_indexes.expansion(2, 20, 3)), [0] * 16 + [1] * 4
+        )
+        self.assertEqual(len(list(expansion_indexes.expansions(19, 20))), 19)
+        with self.assertRaises(IndexError):
+            ExpansionTable.unrank(3, 5, 6)
+        with self.assertRaises(IndexError):
+            ExpansionTable.num_expansions(5, 3)
+
+    def test_min_cost_expansion(self):
+        for source, target in [
+            ([0], [3, 5, 8]),
+            ([0, 10], [5, 5, 5]),  # ties go to the smallest expansion
+            ([1, 4, 9], [0, 2, 4, 6, 8, 10]),
+            ([2, 3, 5, 7, 11], [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]),
+        ]:
+            costs = [
+                sum(abs(target[j] - source[e]) for j, e in enumerate(expansion))
+                for expansion in expansion_indexes[len(source)][len(target)]
+            ]
+            min_index = costs.index(min(costs))
+            expansion, cost = min_cost_expansion(source, target)
+            self.assertEqual(
+                expansion,
+                list(expansion_indexes[len(source)][len(target)][min_index]),
+            )
+            self.assertEqual(cost, costs[min_index])
+        with self.assertRaises(ValueError):
+            min_cost_expansion([1, 2, 3], [1, 2])
+
+    def test_batch_min_cost_expansion(self):
+        source = np.array([[1, 4, 9], [0, 5, 10], [2, 3, 4]])
+        target = np.array([[0, 2, 4, 6, 8, 10], [5, 5, 5, 5, 5, 5], [1, 5, 5, 6, 7, 9]])
+        expansion, cost = batch_min_cost_expansion(source, target)
+        for k in range(len(source)):
+            self.assertEqual(
+                (expansion[k].tolist(), cost[k]),
+                min_cost_expansion(source[k].tolist(), target[k].tolist()),
+            )
+        expansion, cost = batch_min_cost_expansion(source[0], target)
+        for k in range(len(target)):
+            self.assertEqual(
+                (expansion[k].tolist(), cost[k]),
+                min_cost_expansion(source[0].tolist(), target[k].tolist()),
+            )
+
+    def test_lru_cache(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)  # evicts "b"
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get_or_compute("d", lambda: 4), 4)  # evicts "a"
+        self.assertEqual(cache.get_or_compute("c", lambda: 0), 3)
+        self.assertEqual(tuple(cache.info()), (2, 2, 2, 2, 2))
+        cache.maxsize = 1
+        self.assertEqual((len(cache), cache.evictions), (1, 3))
+        cache.clear()
+        self.assertEqual(tuple(cache.info()), (0, 0, 0, 1, 0))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+import music21
+
+from chordnovacore.chordprogressiongenerator import ChordProgressionGenerator
+from chordnovacore.midi import (
+    MidiStreamWriter,
+    encode_midi,
+    variable_length,
+    write_midi,
+    write_midi_batch,
+)
+from chordnovacore.models.cnchord import CNChord
+
+
+def parse_chords(path: str):
+    score = music21.converter.parse(path)
+    return [
+        ([p.midi for p in chord.pitches], float(chord.offset))
+        for chord in score.chordify().flatten().getElementsByClass("Chord")
+    ]
+
+
+class TestMidi(unittest.TestCase):
+    def test_variable_length(self):
+        self.assertEqual(variable_length(0), b"\x00")
+        self.assertEqual(variable_length(0x7F), b"\x7f")
+        self.assertEqual(variable_length(0x80), b"\x81\x00")
+        self.assertEqual(variable_length(0x0FFFFFFF), b"\xff\xff\xff\x7f")
+        with self.assertRaises(ValueError):
+            variable_length(-1)
+
+    def test_write_midi(self):
+        progression = [[60, 64, 67], [], [59, 62, 65, 67], [60, 64, 67]]
+        with tempfile.TemporaryDirectory() as directory:
+            for midi_format in (0, 1):
+                path = os.path.join(directory, f"type{midi_format}.mid")
+                write_midi(path, progression, midi_format=midi_format)
+                with open(path, "rb") as f:
+                    self.assertEqual(f.read(14)[8:10], bytes((0, midi_format)))
+                self.assertEqual(
+                    parse_chords(path),
+                    [([60, 64, 67], 0.0), ([59, 62, 65, 67], 4.0), ([60, 64, 67], 6.0)],
+                )
+            with self.assertRaises(ValueError):
+                encode_midi(progression, midi_format=2)
+
+            paths = [os.path.join(directory, f"batch{i}.mid") for i in range(5)]
+            count = write_midi_batch(
+                ((path, [[60 + i, 67 + i]]) for i, path in enumerate(paths)),
+                midi_format=1,
+            )
+            self.assertEqual(count, 5)
+            self.assertEqual(parse_chords(paths[3]), [([63, 70], 0.0)])
+
+    def test_stream_writer(self):
+        # Rests delay the next chord, exactly as in a file written at once
+        progression = [[60, 64, 67], [], [], [59, 62, 65, 67], [], [60, 64, 67], []]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stream.mid")
+            with MidiStreamWriter(path) as writer:
+                for i, notes in enumerate(progression):
+                    writer.write_chord(notes)
+                    if i == 2:
+                        writer.flush()
+            self.assertEqual(writer.num_chords, len(progression))
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), encode_midi(progression))
+
+    def test_to_midi(self):
+        cpg = ChordProgressionGenerator()
+        cpg.continual = False
+        antechord = CNChord.from_notes([60, 64, 67])
+        cpg.new_chords = [
+            CNChord.from_notes([60, 65, 69], ref_chord=antechord),
+            CNChord.from_notes([59, 62, 67], ref_chord=antechord),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            cpg.output_path = directory
+            cpg.output_name = "result"
+            path = cpg.to_midi()
+            self.assertEqual(
+                [notes for notes, __ in parse_chords(path)],
+                [[60, 64, 67], [60, 65, 69], [60, 64, 67], [59, 62, 67]],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import music21
+from chordnovacore.analyser import id_to_notes, notes_to_id, sub_library
+from chordnovacore.models.cnchord import CNChord
+from chordnovacore.pitchclassset import (
+    NUM_PITCH_CLASS_SETS,
+    get_pitch_class_set_table,
+    pitch_classes_to_mask,
+    transpose_mask,
+)
+
+
+class TestPitchClassSet(unittest.TestCase):
+    def test_table_matches_music21(self):
+        table = get_pitch_class_set_table()
+        for mask in range(1, NUM_PITCH_CLASS_SETS, 37):
+            chord = music21.chord.Chord(list(table.notes[mask]))
+            address = chord.chordTablesAddress
+            self.assertEqual(table.cardinality[mask], address.cardinality)
+            self.assertEqual(table.forte_class[mask], address.forteClass)
+            self.assertEqual(table.inversion[mask], address.inversion)
+            self.assertEqual(
+                table.prime_form[mask], pitch_classes_to_mask(chord.primeForm)
+            )
+            self.assertEqual(
+                tuple(table.interval_vector[mask]), tuple(chord.intervalVector)
+            )
+
+    def test_transposition_class(self):
+        table = get_pitch_class_set_table()
+        c_major = pitch_classes_to_mask([0, 4, 7])
+        self.assertEqual(transpose_mask(c_major, 2), pitch_classes_to_mask([2, 6, 9]))
+        self.assertEqual(transpose_mask(c_major, 5), pitch_classes_to_mask([5, 9, 0]))
+        for i in range(12):
+            self.assertEqual(
+                table.transposition_class[transpose_mask(c_major, i)],
+                table.transposition_class[c_major],
+            )
+        self.assertNotEqual(
+            table.transposition_class[pitch_classes_to_mask([0, 3, 7])],
+            table.transposition_class[c_major],
+        )
+        self.assertEqual(table.root[c_major], 0)
+        self.assertEqual(table.root[pitch_classes_to_mask([2, 5, 9, 0])], 2)
+
+    def test_set_id(self):
+        self.assertEqual(notes_to_id([60, 64, 67, 72]), 0b000010010001)
+        self.assertEqual(id_to_notes(0b000010010001), [72, 76, 79])
+        self.assertEqual(sub_library(notes_to_id([62, 66, 69])), [74, 78, 81])
+        self.assertEqual(CNChord.from_notes(notes=[60, 64, 67]).set_id, 11)
+        self.assertEqual(CNChord.from_notes(notes=[60, 61, 62, 63]).set_id, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
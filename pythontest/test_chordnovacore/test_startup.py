@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import chordnovacore
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(list(chordnovacore.__path__)[0]))
+STARTUP_BENCHMARK = os.path.join(PYTHON_DIR, "benchmarks", "startup.py")
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_does_not_load_music21(self):
+        # Generous budget: only guards against music21 or a table build creeping back into import
+        completed = subprocess.run(
+            [sys.executable, STARTUP_BENCHMARK, "--repeat", "1", "--budget", "2.0"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stdout + completed.stderr)
+
+    def test_forte_tables_are_lazy(self):
+        code = (
+            "import sys\n"
+            "from chordnovacore.pitchclassset import get_pitch_class_set_table\n"
+            "table = get_pitch_class_set_table()\n"
+            "assert table.root[0b10010001] == 0\n"
+            "assert 'music21' not in sys.modules\n"
+            "assert table.forte_class[0b10010001] == 11\n"
+            "assert 'music21' in sys.modules\n"
+        )
+        # Without the table cache, so that the Forte tables are really built from music21
+        env = dict(os.environ, CHORDNOVA_TABLE_CACHE_DIR="")
+        subprocess.run(
+            [sys.executable, "-c", code], cwd=PYTHON_DIR, env=env, check=True
+        )
@@ -0,0 +1,217 @@
+import pickle
+import unittest
+
+import numpy as np
+from chordnovacore.analyser import (
+    find_vec,
+    iter_substitute,
+    notes_to_id,
+    set_param2,
+    sub_library,
+    substitute,
+)
+from chordnovacore.models.cnchord import CNChord
+from chordnovacore.models.cnchordfeature import CNChordFeature
+from chordnovacore.substitution import (
+    SUBSTITUTION_FEATURES,
+    evaluate_candidates,
+    feature_bounds,
+    find_substitutes,
+    get_inversions,
+    iter_substitutes,
+)
+
+
+class TestSubstitution(unittest.TestCase):
+    def assert_batch_equal_to_find_vec(self, ante_notes: list, ids: list):
+        antechord = CNChord.from_notes(notes=ante_notes)
+        for batch in evaluate_candidates(ante_notes, ids):
+            for row, i in enumerate(batch.ids):
+                new_antechord, new_postchord, vec, sv, bigram_feature = find_vec(
+                    antechord,
+                    CNChord.from_notes(notes=sub_library(int(i))),
+                    in_analyser=False,
+                    in_substitution=True,
+                )
+                self.assertEqual(batch.ante_notes[row].tolist(), new_antechord.notes)
+                self.assertEqual(batch.post_notes[row].tolist(), new_postchord.notes)
+                self.assertEqual(batch.vecs[row].tolist(), vec)
+                expected = {
+                    "s_size": new_postchord.s_size,
+                    "tension": new_postchord.tension,
+                    "thickness": new_postchord.thickness,
+                    "root": new_postchord.root,
+                    "g_center": new_postchord.g_center,
+                    "span": new_postchord.span,
+                    "sv": sv,
+                    "common_note": bigram_feature.common_note,
+                    "similarity": bigram_feature.similarity,
+                }
+                self.assertEqual(
+                    dict(zip(SUBSTITUTION_FEATURES, batch.features[row].tolist())),
+                    expected,
+                    f"{ante_notes} {i}",
+                )
+
+    def test_get_inversions(self):
+        inversions = get_inversions(np.array([[60, 64, 67]]))[0]
+        self.assertEqual(
+            inversions.tolist(),
+            [
+                [48, 52, 55],
+                [52, 55, 60],
+                [55, 60, 64],
+                [60, 64, 67],
+                [64, 67, 72],
+                [67, 72, 76],
+                [72, 76, 79],
+            ],
+        )
+
+    def test_find_vec_substitution(self):
+        # C major -> the inversion of F major closest to it, F major 6/4
+        __, postchord, vec, sv, __ = find_vec(
+            CNChord.from_notes([60, 64, 67]),
+            CNChord.from_notes([65, 69, 72]),
+            False,
+            True,
+        )
+        self.assertEqual(postchord.notes, [60, 65, 69])
+        self.assertEqual(vec, [0, 1, 2])
+        self.assertEqual(sv, 3)
+
+    def test_evaluate_candidates(self):
+        ids = list(range(1, 4096, 29))
+        self.assert_batch_equal_to_find_vec([72, 76, 79], ids)
+        self.assert_batch_equal_to_find_vec([72], ids)
+        self.assert_batch_equal_to_find_vec([72, 74, 76, 77, 79, 81, 83, 84], ids)
+
+    def test_feature_bounds(self):
+        min_features, max_features = CNChordFeature(), CNChordFeature()
+        min_features.s_size = 3
+        max_features.sv = 4
+        lower, upper = feature_bounds(min_features, max_features)
+        self.assertEqual(lower[SUBSTITUTION_FEATURES.index("s_size")], 3)
+        self.assertEqual(upper[SUBSTITUTION_FEATURES.index("sv")], 4)
+        max_features.chroma = 1.0
+        with self.assertRaises(ValueError):
+            feature_bounds(min_features, max_features)
+
+    def test_substitute(self):
+        min_features, max_features = CNChordFeature(), CNChordFeature()
+        min_features.s_size = 3
+        max_features.s_size = 3
+        max_features.sv = 3
+        antechord = CNChord.from_notes(notes=[60, 64, 67])
+        postchord = CNChord.from_notes(notes=[60, 65, 69])
+        results = substitute(
+            antechord, postchord, min_features, max_features, CNChordFeature()
+        )
+        ids = [notes_to_id(chord.notes) for chord in results]
+        self.assertGreater(len(ids), 0)
+        self.assertEqual(ids, sorted(ids))
+        self.assertNotIn(notes_to_id(postchord.notes), ids)
+        for chord in results:
+            self.assertEqual(chord.s_size, 3)
+            self.assertLessEqual(chord.sv, 3)
+            self.assertEqual(chord.bigram_feature.vec, chord.vec)
+            self.assertEqual(
+                [b - a for a, b in zip(chord.ref_chord.notes, chord.notes)], chord.vec
+            )
+
+    def test_find_substitutes_workers(self):
+        min_features, max_features = CNChordFeature(), CNChordFeature()
+        max_features.sv = 6
+        lower, upper = feature_bounds(min_features, max_features)
+        ids = range(1, 4096)
+        single = find_substitutes([72, 76, 79], ids, lower, upper, workers=1)
+        multiple = find_substitutes([72, 76, 79], ids, lower, upper, workers=3)
+        self.assertGreater(len(single), 0)
+        self.assertEqual(pickle.dumps(single), pickle.dumps(multiple))
+        chunked = find_substitutes([72, 76, 79], ids, lower, upper, chunk_size=100)
+        self.assertEqual(pickle.dumps(single), pickle.dumps(chunked))
+
+    def test_iter_substitutes(self):
+        lower, upper = feature_bounds(CNChordFeature(), CNChordFeature())
+        for workers in (1, 2):
+            iterator = iter_substitutes(
+                [72, 76, 79], range(1, 4096), lower, upper, workers=workers
+            )
+            first = [next(iterator) for __ in range(3)]
+            iterator.close()
+            self.assertEqual([candidate.id for candidate in first], [1, 2, 3])
+
+    def test_substitute_workers(self):
+        min_features, max_features = CNChordFeature(), CNChordFeature()
+        max_features.sv = 4
+        antechord = CNChord.from_notes(notes=[60, 64, 67])
+        postchord = CNChord.from_notes(notes=[62, 65, 69])
+        results = [
+            substitute(
+                antechord,
+                postchord,
+                min_features,
+                max_features,
+                CNChordFeature(),
+                workers=workers,
+            )
+            for workers in (1, 2)
+        ]
+        self.assertEqual(
+            [(c.ref_chord.notes, c.notes, vars(c.bigram_feature)) for c in results[0]],
+            [(c.ref_chord.notes, c.notes, vars(c.bigram_feature)) for c in results[1]],
+        )
+
+    def test_iter_substitute(self):
+        min_features, max_features = CNChordFeature(), CNChordFeature()
+        max_features.sv = 4
+        antechord = CNChord.from_notes(notes=[60, 64, 67])
+        postchord = CNChord.from_notes(notes=[62, 65, 69])
+        streamed = list(
+            iter_substitute(antechord, postchord, min_features, max_features)
+        )
+        results = substitute(
+            antechord, postchord, min_features, max_features, CNChordFeature()
+        )
+        self.assertEqual(
+            [new_postchord.notes for __, new_postchord, __ in streamed],
+            [chord.notes for chord in results],
+        )
+        for new_antechord, new_postchord, bigram_feature in streamed:
+            self.assertIs(new_postchord.ref_chord, new_antechord)
+            self.assertIs(new_postchord.bigram_feature, bigram_feature)
+
+    def test_substitute_bigram_features(self):
+        # Bigram features built from the batch are those set_param2 computes
+        min_features, max_features = CNChordFeature(), CNChordFeature()
+        max_features.sv = 8
+        for ante_notes, post_notes in (
+            ([60, 64, 67], [62, 65, 69]),
+            ([60, 64, 67, 70], [61, 65]),
+            ([62, 66], [60, 63, 67, 70, 74]),
+        ):
+            streamed = list(
+                iter_substitute(
+                    CNChord.from_notes(notes=ante_notes),
+                    CNChord.from_notes(notes=post_notes),
+                    min_features,
+                    max_features,
+                )
+            )
+            self.assertGreater(len(streamed), 0)
+            for new_antechord, new_postchord, bigram_feature in streamed:
+                expected = set_param2(
+                    antechord=new_antechord,
+                    postchord=new_postchord,
+                    vec=bigram_feature.vec,
+                    sv=bigram_feature.sv,
+                    in_analyser=False,
+                    in_substitution=True,
+                )
+                self.assertEqual(vars(bigram_feature), vars(expected))
+                for name, value in vars(expected).items():
+                    self.assertIs(type(getattr(bigram_feature, name)), type(value))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from chordnovacore import tablecache
+from chordnovacore.functions import ExpansionTable, build_expansion_table
+from chordnovacore.pitchclassset import BASE_TABLES, FORTE_TABLES, PitchClassSetTable
+from chordnovacore.tablecache import (
+    TableCache,
+    get_table_cache,
+    set_table_cache_dir,
+    table_cache_dir,
+)
+
+
+class TestTableCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.previous = (tablecache._table_cache, tablecache._table_cache_configured)
+        set_table_cache_dir(self.directory.name)
+
+    def tearDown(self):
+        tablecache._table_cache, tablecache._table_cache_configured = self.previous
+        self.directory.cleanup()
+
+    def test_get_or_build(self):
+        cache = get_table_cache()
+        calls = []
+
+        def build():
+            calls.append(1)
+            return np.arange(10, dtype=np.int16)
+
+        built = cache.get_or_build("table", build)
+        self.assertTrue(os.path.isfile(cache.path("table")))
+        loaded = TableCache(self.directory.name).get_or_build("table", build)
+        self.assertEqual(len(calls), 1)
+        np.testing.assert_array_equal(built, loaded)
+        self.assertEqual(loaded.dtype, np.int16)
+        self.assertFalse(loaded.flags.writeable)
+        self.assertIsInstance(loaded.base, np.memmap)
+        self.assertEqual(os.stat(cache.path("table")).st_mode & 0o777, 0o644)
+
+        # A corrupt file is rebuilt
+        with open(cache.path("table"), "wb") as f:
+            f.write(b"not a table")
+        rebuilt = cache.get_or_build("table", build)
+        self.assertEqual(len(calls), 2)
+        np.testing.assert_array_equal(rebuilt, built)
+
+        cache.clear()
+        self.assertFalse(os.path.exists(cache.path("table")))
+
+    def test_unwritable_directory(self):
+        path = os.path.join(self.directory.name, "file")
+        with open(path, "w"):
+            pass
+        cache = TableCache(path)  # its directory cannot be created
+        table = cache.get_or_build("table", lambda: np.ones(3))
+        np.testing.assert_array_equal(table, np.ones(3))
+        self.assertIsNone(cache.load("table"))
+
+    def test_disabled(self):
+        set_table_cache_dir(None)
+        self.assertIsNone(get_table_cache())
+        table = ExpansionTable().get(3, 5)
+        np.testing.assert_array_equal(table, build_expansion_table(3, 5))
+        self.assertFalse(table.flags.writeable)
+
+    def test_table_cache_dir(self):
+        cache = get_table_cache()
+        with table_cache_dir(None):
+            self.assertIsNone(get_table_cache())
+        self.assertIs(get_table_cache(), cache)
+        with self.assertRaises(RuntimeError):
+            with table_cache_dir(None):
+                raise RuntimeError
+        self.assertIs(get_table_cache(), cache)
+
+    def test_expansion_table(self):
+        built = ExpansionTable().get(4, 9)
+        mapped = ExpansionTable().get(4, 9)
+        self.assertIsInstance(mapped.base, np.memmap)
+        np.testing.assert_array_equal(built, mapped)
+        self.assertEqual(mapped.dtype, np.int8)
+
+    def test_pitch_class_set_table(self):
+        built = PitchClassSetTable()
+        built.forte_class
+        mapped = PitchClassSetTable()
+        for name in BASE_TABLES + FORTE_TABLES:
+            self.assertIsInstance(getattr(mapped, name).base, np.memmap, name)
+            np.testing.assert_array_equal(getattr(built, name), getattr(mapped, name))
+
+
+if __name__ == "__main__":
+    unittest.main()